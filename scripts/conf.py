@@ -15,3 +15,27 @@ COOKIES_DIR = BASE_DIR / "cookiesFile"
 
 # 小红书签名服务地址
 XHS_SERVER = os.getenv("XHS_SERVER", "http://127.0.0.1:11901")
+
+# 持久化上传任务队列（SQLite）
+QUEUE_DB = Path(os.getenv("UPLOAD_QUEUE_DB", str(BASE_DIR / "db" / "queue.db")))
+
+# 运行时缓存目录（Cookie 校验结果等，可随时删除）
+CACHE_DIR = Path(os.getenv("UPLOAD_CACHE_DIR", str(BASE_DIR / ".cache")))
+
+# Cookie 校验结果的有效期（秒），0 表示不缓存
+COOKIE_VERIFY_TTL = int(os.getenv("COOKIE_VERIFY_TTL", "1800"))
+
+# 账号库（SQLite，记录账号、Cookie 路径 / 内容、校验和上传时间）
+ACCOUNTS_DB = Path(os.getenv("UPLOAD_ACCOUNTS_DB", str(BASE_DIR / "db" / "accounts.db")))
+
+# 保存 storage_state 时超过该大小（字节）自动压缩，只保留平台登录需要的 Cookie 和 localStorage；0 表示不自动压缩
+STATE_COMPACT_THRESHOLD = int(os.getenv("STATE_COMPACT_THRESHOLD", str(256 * 1024)))
+
+# 上传后保存 storage_state 的延迟合并时间（秒）：同一账号连续上传时只写一次文件；0 表示每次都立即写入
+STATE_SAVE_DEBOUNCE = float(os.getenv("STATE_SAVE_DEBOUNCE", "5"))
+
+# 上传请求超过多少秒没有完成视为上传停滞，立即重新上传（大请求按最低速度估算的时间更长时以估算为准）；0 表示不检测
+UPLOAD_STALL_TIMEOUT = float(os.getenv("UPLOAD_STALL_TIMEOUT", "45"))
+
+# 页面等待超时时间的倍数（网络慢时调大），各类等待的超时见 utils/page_waits.py 中的 WAIT_PROFILES
+WAIT_TIMEOUT_SCALE = float(os.getenv("WAIT_TIMEOUT_SCALE", "1"))
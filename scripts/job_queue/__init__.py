@@ -0,0 +1,2 @@
+from .sqlite_queue import JobQueue, make_job_key
+from .worker import run_worker
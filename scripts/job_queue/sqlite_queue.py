@@ -0,0 +1,316 @@
+"""
+基于 SQLite 的持久化上传任务队列
+使用 WAL 模式，支持多进程同时读写；任务通过租约（lease）领取，
+进程崩溃后租约过期，任务会被其他 worker 重新领取；
+账号需要登录的任务挂起为 needs_auth，账号重新登录后恢复为待执行
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+
+# 任务状态
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_NEEDS_AUTH = "needs_auth"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT NOT NULL UNIQUE,
+    platform TEXT NOT NULL,
+    account TEXT NOT NULL,
+    publish_date TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_account ON jobs(platform, account, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_publish_date ON jobs(publish_date);
+"""
+
+
+def make_job_key(job: dict) -> str:
+    """
+    生成任务去重键
+
+    显式提供 key 字段时直接使用，否则根据平台、账号、视频、标题和发布时间计算哈希，
+    同一个任务重复入队不会产生重复上传
+    """
+    if job.get("key"):
+        return str(job["key"])
+    identity = [job.get(field) for field in ("platform", "account", "video", "title", "publish_date")]
+    return hashlib.sha1(json.dumps(identity, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """上传任务队列"""
+
+    def __init__(self, db_path):
+        """
+        打开（或创建）任务队列
+
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: 由我们显式控制事务（BEGIN IMMEDIATE）
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        """开启写事务（BEGIN IMMEDIATE 立即获取写锁，避免多进程同时领取同一任务）"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        if job.get("result"):
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def enqueue(self, job: dict, max_attempts: int = 3) -> int:
+        """
+        任务入队
+
+        Args:
+            job: 任务内容（与 manifest 中的一行相同）
+            max_attempts: 最大尝试次数
+
+        Returns:
+            任务 ID（重复入队时返回已有任务的 ID）
+        """
+        now = time.time()
+        job_key = make_job_key(job)
+        self.conn.execute(
+            """
+            INSERT OR IGNORE INTO jobs
+                (job_key, platform, account, publish_date, payload, max_attempts, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_key, job["platform"], job.get("account", "default"), job.get("publish_date"),
+             json.dumps(job, ensure_ascii=False), max_attempts, now, now, now),
+        )
+        row = self.conn.execute("SELECT id FROM jobs WHERE job_key = ?", (job_key,)).fetchone()
+        return row["id"]
+
+    def lease(self, owner: str, lease_seconds: float = 900) -> dict:
+        """
+        领取一个可执行的任务
+
+        可执行的任务：待执行且到达可执行时间，或租约已过期（原 worker 崩溃）。
+        同一账号已有未过期租约的任务时，该账号的其他任务不会被领取，保证同账号串行；
+        账号有挂起（needs_auth）的任务时，该账号的其他任务也不会被领取。
+
+        Args:
+            owner: worker 标识
+            lease_seconds: 租约时长（秒），执行期间需要通过 extend 续约
+
+        Returns:
+            任务 dict，没有可执行任务时返回 None
+        """
+        now = time.time()
+        self._transaction()
+        try:
+            # 租约过期且已达到最大尝试次数的任务直接标记失败
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = ?, last_error = 'lease expired', lease_owner = NULL, updated_at = ?
+                WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts
+                """,
+                (STATUS_FAILED, now, STATUS_LEASED, now),
+            )
+            row = self.conn.execute(
+                """
+                SELECT * FROM jobs AS j
+                WHERE ((j.status = ? AND j.available_at <= ?) OR (j.status = ? AND j.lease_expires < ?))
+                  AND NOT EXISTS (
+                      SELECT 1 FROM jobs AS busy
+                      WHERE busy.platform = j.platform AND busy.account = j.account
+                        AND ((busy.status = ? AND busy.lease_expires >= ?) OR busy.status = ?) AND busy.id != j.id
+                  )
+                ORDER BY j.available_at, j.id
+                LIMIT 1
+                """,
+                (STATUS_PENDING, now, STATUS_LEASED, now, STATUS_LEASED, now, STATUS_NEEDS_AUTH),
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                (STATUS_LEASED, owner, now + lease_seconds, now, row["id"]),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def extend(self, job_id: int, owner: str, lease_seconds: float = 900) -> bool:
+        """续约，返回 False 表示租约已经不属于该 worker"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (now + lease_seconds, now, job_id, STATUS_LEASED, owner),
+        )
+        return cursor.rowcount == 1
+
+    def ack(self, job_id: int, owner: str, result: dict = None) -> bool:
+        """标记任务完成"""
+        cursor = self.conn.execute(
+            """
+            UPDATE jobs SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND status = ? AND lease_owner = ?
+            """,
+            (STATUS_DONE, json.dumps(result, ensure_ascii=False) if result is not None else None,
+             time.time(), job_id, STATUS_LEASED, owner),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, owner: str, error: str, retry: bool = True, backoff: float = 60) -> str:
+        """
+        标记任务失败
+
+        Args:
+            job_id: 任务 ID
+            owner: worker 标识
+            error: 错误信息
+            retry: 是否允许重试（未超过最大尝试次数时重新进入待执行状态）
+            backoff: 重试退避基数（秒），第 n 次失败后等待 n * backoff 秒
+
+        Returns:
+            任务的新状态
+        """
+        now = time.time()
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?",
+                (job_id, STATUS_LEASED, owner),
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            if retry and row["attempts"] < row["max_attempts"]:
+                status, available_at = STATUS_PENDING, now + backoff * row["attempts"]
+            else:
+                status, available_at = STATUS_FAILED, now
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = ?, last_error = ?, available_at = ?, lease_owner = NULL,
+                    lease_expires = NULL, updated_at = ?
+                WHERE id = ?
+                """,
+                (status, error, available_at, now, job_id),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def release(self, job_id: int, owner: str) -> bool:
+        """归还租约（例如 worker 正常退出时），不计入尝试次数"""
+        cursor = self.conn.execute(
+            """
+            UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL,
+                lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND status = ? AND lease_owner = ?
+            """,
+            (STATUS_PENDING, time.time(), job_id, STATUS_LEASED, owner),
+        )
+        return cursor.rowcount == 1
+
+    def park(self, job_id: int, owner: str, error: str = None) -> bool:
+        """挂起任务等待账号登录（needs_auth），不计入尝试次数"""
+        cursor = self.conn.execute(
+            """
+            UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), last_error = ?, lease_owner = NULL,
+                lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND status = ? AND lease_owner = ?
+            """,
+            (STATUS_NEEDS_AUTH, error, time.time(), job_id, STATUS_LEASED, owner),
+        )
+        return cursor.rowcount == 1
+
+    def parked_accounts(self) -> list:
+        """有挂起任务的账号 [(platform, account, 最早挂起时间)]"""
+        rows = self.conn.execute(
+            "SELECT platform, account, MIN(updated_at) AS parked_at FROM jobs WHERE status = ? "
+            "GROUP BY platform, account ORDER BY platform, account", (STATUS_NEEDS_AUTH,)
+        ).fetchall()
+        return [(row["platform"], row["account"], row["parked_at"]) for row in rows]
+
+    def resume_account(self, platform: str, account: str) -> int:
+        """账号已重新登录：挂起的任务恢复为待执行，返回恢复的任务数"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = ?, available_at = ?, updated_at = ? "
+            "WHERE platform = ? AND account = ? AND status = ?",
+            (STATUS_PENDING, now, now, platform, account, STATUS_NEEDS_AUTH),
+        )
+        return cursor.rowcount
+
+    def get(self, job_id: int) -> dict:
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, status: str = None, platform: str = None, account: str = None,
+                  publish_before: str = None, publish_after: str = None, limit: int = 100) -> list:
+        """
+        按条件查询任务（status / platform+account / publish_date 都有索引）
+
+        Args:
+            publish_before / publish_after: 发布时间范围（格式同 publish_date：YYYY-MM-DD HH:MM:SS）
+        """
+        conditions, params = [], []
+        for column, value in (("status", status), ("platform", platform), ("account", account)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if publish_before is not None:
+            conditions.append("publish_date < ?")
+            params.append(publish_before)
+        if publish_after is not None:
+            conditions.append("publish_date >= ?")
+            params.append(publish_after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(f"SELECT * FROM jobs {where} ORDER BY id LIMIT ?", (*params, limit)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self) -> dict:
+        """各状态的任务数量"""
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def has_unfinished(self) -> bool:
+        """是否还有未完成（待执行、执行中或等待登录）的任务"""
+        row = self.conn.execute(
+            "SELECT 1 FROM jobs WHERE status IN (?, ?, ?) LIMIT 1", (STATUS_PENDING, STATUS_LEASED, STATUS_NEEDS_AUTH)
+        ).fetchone()
+        return row is not None
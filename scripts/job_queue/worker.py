@@ -0,0 +1,119 @@
+"""
+队列 worker
+以 N 个并发槽位持续从队列领取任务并执行，执行期间定期续约；
+账号需要登录的任务挂起（needs_auth），账号重新登录后（任意进程）自动恢复
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from utils.auth_parking import AuthRequiredError, auth_parking
+from utils.log import logger
+
+
+async def _heartbeat(queue, job_id: int, owner: str, lease_seconds: float):
+    """定期续约，防止长时间上传期间租约过期被其他 worker 重复领取"""
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        if not queue.extend(job_id, owner, lease_seconds):
+            logger.warning(f"[队列] 任务 {job_id} 的租约已失效")
+            return
+
+
+def _resume_parked(queue) -> int:
+    """恢复已经重新登录的账号的挂起任务，返回恢复的任务数"""
+    resumed = 0
+    for platform, account, parked_at in queue.parked_accounts():
+        if auth_parking.login_completed(platform, account, parked_at):
+            count = queue.resume_account(platform, account)
+            if count:
+                logger.info(f"[队列] {platform} 账号 {account} 已重新登录，恢复 {count} 个挂起的任务")
+            resumed += count
+    return resumed
+
+
+async def run_worker(queue, runner, slots: int = 2, lease_seconds: float = 900,
+                     poll_interval: float = 2, watch: bool = False, worker_id: str = None,
+                     auth_wait: float = None) -> dict:
+    """
+    运行 worker
+
+    Args:
+        queue: JobQueue 实例
+        runner: 执行单个任务的协程函数 runner(payload) -> bool
+        slots: 并发槽位数
+        lease_seconds: 租约时长（秒）
+        poll_interval: 没有可执行任务时的轮询间隔（秒）
+        watch: 为 True 时队列清空后继续等待新任务，否则队列中没有未完成任务时退出
+        worker_id: worker 标识（默认：主机名-进程号-随机后缀）
+        auth_wait: 非 watch 模式下，只剩挂起等待登录的任务时最多再等待多久（秒），None 表示一直等待；
+            超时后退出，挂起的任务留在队列中，下次运行 worker 时登录过的账号会恢复
+
+    Returns:
+        本次运行的统计 {done, failed, retried, parked}
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    counters = {"done": 0, "failed": 0, "retried": 0, "parked": 0}
+    logger.info(f"[队列] worker {worker_id} 启动，并发槽位 {slots}")
+
+    async def slot_loop(slot: int):
+        owner = f"{worker_id}#{slot}"
+        idle_since = None
+        while True:
+            _resume_parked(queue)
+            job = queue.lease(owner, lease_seconds)
+            if job is None:
+                if not watch:
+                    if not queue.has_unfinished():
+                        return
+                    idle_since = idle_since or time.monotonic()
+                    parked = queue.parked_accounts()
+                    if parked and auth_wait is not None and time.monotonic() - idle_since > auth_wait:
+                        accounts = ", ".join(f"{platform}:{account}" for platform, account, _ in parked)
+                        logger.warning(f"[队列] 等待登录超时，挂起的任务留在队列中: {accounts}")
+                        return
+                await asyncio.sleep(poll_interval)
+                continue
+            idle_since = None
+
+            job_id = job["id"]
+            payload = job["payload"]
+            logger.info(f"[队列] 槽位 {slot} 领取任务 {job_id}: {job['platform']}/{job['account']} "
+                        f"（第 {job['attempts']} 次尝试）")
+            heartbeat = asyncio.create_task(_heartbeat(queue, job_id, owner, lease_seconds))
+            start = time.perf_counter()
+            try:
+                ok = await runner(payload)
+            except asyncio.CancelledError:
+                queue.release(job_id, owner)
+                raise
+            except AuthRequiredError as e:
+                queue.park(job_id, owner, str(e))
+                auth_parking.mark_needs_auth(job["platform"], job["account"])
+                counters["parked"] += 1
+                logger.warning(f"[队列] 任务 {job_id} 已挂起，等待 {job['platform']} 账号 {job['account']} 登录")
+                continue
+            except Exception as e:
+                ok = False
+                error = str(e)
+                logger.exception(f"[队列] 任务 {job_id} 出错: {e}")
+            else:
+                error = None if ok else "upload returned False"
+            finally:
+                heartbeat.cancel()
+            duration = round(time.perf_counter() - start, 3)
+
+            if ok:
+                queue.ack(job_id, owner, {"duration": duration})
+                counters["done"] += 1
+                logger.success(f"[队列] 任务 {job_id} 完成（{duration}s）")
+            else:
+                status = queue.fail(job_id, owner, error)
+                counters["retried" if status == "pending" else "failed"] += 1
+                logger.error(f"[队列] 任务 {job_id} 失败（{duration}s），状态: {status}")
+
+    await asyncio.gather(*(slot_loop(slot) for slot in range(max(1, slots))))
+    logger.info(f"[队列] worker {worker_id} 退出: {counters}")
+    return counters
@@ -6,6 +6,7 @@
 import asyncio
 import argparse
 import json
+import time
 from pathlib import Path
 from datetime import datetime
 import sys
@@ -13,29 +14,116 @@ import sys
 # 添加父目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
+from conf import QUEUE_DB
+from job_queue import JobQueue, run_worker
+from utils.batch import ConcurrencyLimiter, default_results_path, load_manifest, parse_platform_limits, run_jobs
 from utils.cookie_manager import cookie_manager
+from utils.auth_parking import AuthRequiredError
+from utils.base_social_media import UPLOAD_PAGES, LoginRequiredError
+from utils.daemon import UploadDaemon
 from utils.log import logger
+from utils.page_waits import wait_recorder
+from utils.playwright_runtime import playwright_runtime
+from utils.qr_login import QR_LOGIN_FLOWS, QRLoginService
+from utils.session_refresh import session_refresher
+from utils.verify_cache import verification_cache
+from utils.warm_pool import warm_pool
 
 
-async def upload_douyin(args):
+async def run_video(video, playwright=None):
+    """
+    执行上传
+
+    传入 playwright 时直接复用该驱动（多平台/批量模式共享同一个驱动进程），
+    否则由上传器自己启动驱动
+    """
+    if playwright is not None:
+        await video.upload(playwright)
+    else:
+        await video.main()
+
+
+async def login_account(platform: str, args) -> bool:
+    """
+    账号需要登录时：命令行直接上传时打开浏览器登录；批量 / 队列 / 常驻服务中的任务（args.park_on_login）
+    抛出 AuthRequiredError，由调度方挂起任务，不在任务里等人扫码
+
+    Returns:
+        是否登录成功
+    """
+    if getattr(args, 'park_on_login', False):
+        raise AuthRequiredError(platform, args.account)
+    return await cookie_manager.login_and_save_cookie(platform, args.account)
+
+
+async def run_video_verified(video, platform: str, args, playwright=None) -> bool:
+    """
+    会话复用模式的上传：HTTP 无法判断 Cookie 是否有效时，不再单独打开浏览器校验，
+    而是由上传页本身确认登录态，确认后在同一个页面上继续上传（少一次浏览器启动和页面加载）。
+    上传页显示未登录时重新登录，然后正常上传。
+
+    Returns:
+        是否执行了上传（需要重新登录且登录失败时返回 False）
+    """
+    playwright = playwright or await playwright_runtime.get()
+    try:
+        await video.upload(playwright, verify_login=True)
+        return True
+    except LoginRequiredError:
+        logger.warning(f"[上传] {platform} 账号 {args.account} 的上传页显示未登录，需要重新登录")
+        verification_cache.invalidate(platform, args.account)
+    if not await login_account(platform, args):
+        logger.error(f"[上传] {platform} 账号 {args.account} 登录失败")
+        return False
+    await video.upload(playwright)
+    return True
+
+
+def prepare_media(args):
+    """
+    上传前统一准备媒体文件：解析为绝对路径并检查是否存在
+
+    多平台上传时只执行一次，各平台共用结果
+    """
+    video_path = Path(args.video).expanduser().resolve()
+    if not video_path.is_file():
+        raise FileNotFoundError(f"视频文件不存在: {video_path}")
+    args.video = str(video_path)
+
+    if args.thumbnail:
+        thumbnail_path = Path(args.thumbnail).expanduser().resolve()
+        if thumbnail_path.is_file():
+            args.thumbnail = str(thumbnail_path)
+        else:
+            logger.warning(f"[上传] 封面文件不存在，将自动生成封面: {thumbnail_path}")
+            args.thumbnail = None
+
+    size_mb = video_path.stat().st_size / 1024 / 1024
+    logger.info(f"[上传] 视频文件: {video_path}（{size_mb:.1f} MB）")
+    return args
+
+
+async def upload_douyin(args, playwright=None):
     """上传到抖音"""
-    from uploader.douyin_uploader.main import DouYinVideo, douyin_setup
+    from uploader.douyin_uploader.main import DouYinVideo
     
     # 检查 Cookie
     account_file = cookie_manager.get_cookie_path("douyin", args.account)
+    verify_on_page = False
     
     if not account_file.exists():
         logger.warning(f"[抖音] Cookie 文件不存在，需要登录")
-        success = await cookie_manager.login_and_save_cookie("douyin", args.account)
+        success = await login_account("douyin", args)
         if not success:
             logger.error(f"[抖音] 登录失败")
             return False
     else:
-        # 验证 Cookie
-        is_valid = await cookie_manager.verify_cookie("douyin", args.account)
-        if not is_valid:
+        # 验证 Cookie（HTTP 无法判断时不单独打开浏览器，由上传页确认登录态）
+        check = await cookie_manager.check_cookie("douyin", args.account, playwright, browser_fallback=False)
+        verify_on_page = check["method"] == "deferred"
+        if not check["valid"] and not verify_on_page:
             logger.warning(f"[抖音] Cookie 已失效，需要重新登录")
-            success = await cookie_manager.login_and_save_cookie("douyin", args.account)
+            success = await login_account("douyin", args)
             if not success:
                 logger.error(f"[抖音] 登录失败")
                 return False
@@ -61,29 +149,37 @@ async def upload_douyin(args):
     )
     
     # 执行上传
-    result = await douyin_setup(video)
-    return result
+    if verify_on_page:
+        if not await run_video_verified(video, "douyin", args, playwright):
+            return False
+    else:
+        await run_video(video, playwright)
+    # 上传成功时已保存最新的 storage_state，视为一次成功的 Cookie 校验
+    cookie_manager.mark_verified("douyin", args.account)
+    return True
 
 
-async def upload_kuaishou(args):
+async def upload_kuaishou(args, playwright=None):
     """上传到快手"""
-    from uploader.ks_uploader.main import KSVideo, ks_setup
+    from uploader.ks_uploader.main import KSVideo
     
     # 检查 Cookie
     account_file = cookie_manager.get_cookie_path("kuaishou", args.account)
+    verify_on_page = False
     
     if not account_file.exists():
         logger.warning(f"[快手] Cookie 文件不存在，需要登录")
-        success = await cookie_manager.login_and_save_cookie("kuaishou", args.account)
+        success = await login_account("kuaishou", args)
         if not success:
             logger.error(f"[快手] 登录失败")
             return False
     else:
-        # 验证 Cookie
-        is_valid = await cookie_manager.verify_cookie("kuaishou", args.account)
-        if not is_valid:
+        # 验证 Cookie（HTTP 无法判断时不单独打开浏览器，由上传页确认登录态）
+        check = await cookie_manager.check_cookie("kuaishou", args.account, playwright, browser_fallback=False)
+        verify_on_page = check["method"] == "deferred"
+        if not check["valid"] and not verify_on_page:
             logger.warning(f"[快手] Cookie 已失效，需要重新登录")
-            success = await cookie_manager.login_and_save_cookie("kuaishou", args.account)
+            success = await login_account("kuaishou", args)
             if not success:
                 logger.error(f"[快手] 登录失败")
                 return False
@@ -106,29 +202,37 @@ async def upload_kuaishou(args):
     )
     
     # 执行上传
-    result = await ks_setup(video)
-    return result
+    if verify_on_page:
+        if not await run_video_verified(video, "kuaishou", args, playwright):
+            return False
+    else:
+        await run_video(video, playwright)
+    # 上传成功时已保存最新的 storage_state，视为一次成功的 Cookie 校验
+    cookie_manager.mark_verified("kuaishou", args.account)
+    return True
 
 
-async def upload_tiktok(args):
+async def upload_tiktok(args, playwright=None):
     """上传到 TikTok"""
-    from uploader.tk_uploader.main import TiktokVideo, tiktok_setup
+    from uploader.tk_uploader.main import TiktokVideo
     
     # 检查 Cookie
     account_file = cookie_manager.get_cookie_path("tiktok", args.account)
+    verify_on_page = False
     
     if not account_file.exists():
         logger.warning(f"[TikTok] Cookie 文件不存在，需要登录")
-        success = await cookie_manager.login_and_save_cookie("tiktok", args.account)
+        success = await login_account("tiktok", args)
         if not success:
             logger.error(f"[TikTok] 登录失败")
             return False
     else:
-        # 验证 Cookie
-        is_valid = await cookie_manager.verify_cookie("tiktok", args.account)
-        if not is_valid:
+        # 验证 Cookie（HTTP 无法判断时不单独打开浏览器，由上传页确认登录态）
+        check = await cookie_manager.check_cookie("tiktok", args.account, playwright, browser_fallback=False)
+        verify_on_page = check["method"] == "deferred"
+        if not check["valid"] and not verify_on_page:
             logger.warning(f"[TikTok] Cookie 已失效，需要重新登录")
-            success = await cookie_manager.login_and_save_cookie("tiktok", args.account)
+            success = await login_account("tiktok", args)
             if not success:
                 logger.error(f"[TikTok] 登录失败")
                 return False
@@ -151,29 +255,37 @@ async def upload_tiktok(args):
     )
     
     # 执行上传
-    result = await tiktok_setup(video)
-    return result
+    if verify_on_page:
+        if not await run_video_verified(video, "tiktok", args, playwright):
+            return False
+    else:
+        await run_video(video, playwright)
+    # 上传成功时已保存最新的 storage_state，视为一次成功的 Cookie 校验
+    cookie_manager.mark_verified("tiktok", args.account)
+    return True
 
 
-async def upload_tencent(args):
+async def upload_tencent(args, playwright=None):
     """上传到视频号"""
-    from uploader.tencent_uploader.main import TencentVideo, tencent_setup
+    from uploader.tencent_uploader.main import TencentVideo
     
     # 检查 Cookie
     account_file = cookie_manager.get_cookie_path("tencent", args.account)
+    verify_on_page = False
     
     if not account_file.exists():
         logger.warning(f"[视频号] Cookie 文件不存在，需要登录")
-        success = await cookie_manager.login_and_save_cookie("tencent", args.account)
+        success = await login_account("tencent", args)
         if not success:
             logger.error(f"[视频号] 登录失败")
             return False
     else:
-        # 验证 Cookie
-        is_valid = await cookie_manager.verify_cookie("tencent", args.account)
-        if not is_valid:
+        # 验证 Cookie（HTTP 无法判断时不单独打开浏览器，由上传页确认登录态）
+        check = await cookie_manager.check_cookie("tencent", args.account, playwright, browser_fallback=False)
+        verify_on_page = check["method"] == "deferred"
+        if not check["valid"] and not verify_on_page:
             logger.warning(f"[视频号] Cookie 已失效，需要重新登录")
-            success = await cookie_manager.login_and_save_cookie("tencent", args.account)
+            success = await login_account("tencent", args)
             if not success:
                 logger.error(f"[视频号] 登录失败")
                 return False
@@ -197,29 +309,35 @@ async def upload_tencent(args):
     )
     
     # 执行上传
-    result = await tencent_setup(video)
-    return result
+    if verify_on_page:
+        if not await run_video_verified(video, "tencent", args, playwright):
+            return False
+    else:
+        await run_video(video, playwright)
+    # 上传成功时已保存最新的 storage_state，视为一次成功的 Cookie 校验
+    cookie_manager.mark_verified("tencent", args.account)
+    return True
 
 
-async def upload_xhs(args):
+async def upload_xhs(args, playwright=None):
     """上传到小红书"""
-    from uploader.xhs_uploader.main import XHSVideo, xhs_setup
+    from uploader.xhs_uploader.main import XHSVideo
     
     # 检查 Cookie
     account_file = cookie_manager.get_cookie_path("xhs", args.account)
     
     if not account_file.exists():
         logger.warning(f"[小红书] Cookie 文件不存在，需要登录")
-        success = await cookie_manager.login_and_save_cookie("xhs", args.account)
+        success = await login_account("xhs", args)
         if not success:
             logger.error(f"[小红书] 登录失败")
             return False
     else:
         # 验证 Cookie
-        is_valid = await cookie_manager.verify_cookie("xhs", args.account)
+        is_valid = await cookie_manager.verify_cookie("xhs", args.account, playwright=playwright)
         if not is_valid:
             logger.warning(f"[小红书] Cookie 已失效，需要重新登录")
-            success = await cookie_manager.login_and_save_cookie("xhs", args.account)
+            success = await login_account("xhs", args)
             if not success:
                 logger.error(f"[小红书] 登录失败")
                 return False
@@ -242,19 +360,326 @@ async def upload_xhs(args):
     )
     
     # 执行上传
-    result = await xhs_setup(video)
-    return result
+    await run_video(video, playwright)
+    # 上传成功时已保存最新的 storage_state，视为一次成功的 Cookie 校验
+    cookie_manager.mark_verified("xhs", args.account)
+    return True
+
+
+UPLOAD_FUNCS = {
+    'douyin': upload_douyin,
+    'kuaishou': upload_kuaishou,
+    'tiktok': upload_tiktok,
+    'tencent': upload_tencent,
+    'xhs': upload_xhs,
+}
+
+# --platform all 包含的平台：小红书上传器（uploader/xhs_uploader）还没有 XHSVideo，只能单独指定，不放进 all
+ALL_PLATFORMS = ['douyin', 'kuaishou', 'tiktok', 'tencent']
+
+
+def job_to_args(job: dict) -> argparse.Namespace:
+    """把 manifest 中的任务转换成与命令行参数相同结构的 Namespace"""
+    tags = job.get('tags')
+    if isinstance(tags, (list, tuple)):
+        tags = ','.join(tags)
+    return argparse.Namespace(
+        platform=job['platform'],
+        video=job['video'],
+        title=job['title'],
+        tags=tags,
+        account=job.get('account', 'default'),
+        publish_date=job.get('publish_date'),
+        thumbnail=job.get('thumbnail'),
+        product_link=job.get('product_link'),
+        product_title=job.get('product_title'),
+        category=job.get('category'),
+        park_on_login=True,
+    )
+
+
+def parse_platforms(value: str) -> list:
+    """
+    解析 --platform 参数
+
+    Args:
+        value: 单个平台、逗号分隔的多个平台，或 all
+
+    Returns:
+        去重后的平台列表
+    """
+    if value.strip() == 'all':
+        return list(ALL_PLATFORMS)
+    platforms = []
+    for platform in value.split(','):
+        platform = platform.strip()
+        if not platform or platform in platforms:
+            continue
+        if platform not in UPLOAD_FUNCS:
+            raise ValueError(f"不支持的平台: {platform}（可选: {', '.join(UPLOAD_FUNCS)}, all）")
+        platforms.append(platform)
+    return platforms
+
+
+async def upload_to_platforms(args, platforms: list) -> list:
+    """
+    把同一个视频并发上传到多个平台
+
+    所有平台共享同一个 Playwright 驱动，单个平台失败不会影响其他平台
+
+    Returns:
+        每个平台的结果 [{platform, status, error, duration}]
+    """
+    async def run_platform(platform, playwright):
+        start = time.perf_counter()
+        error = None
+        try:
+            status = "success" if await UPLOAD_FUNCS[platform](args, playwright=playwright) else "failed"
+        except Exception as e:
+            status = "error"
+            error = str(e)
+            logger.exception(f"[{platform}] 上传过程出错: {e}")
+        return {
+            "platform": platform,
+            "status": status,
+            "error": error,
+            "duration": round(time.perf_counter() - start, 3),
+        }
+
+    playwright = await playwright_runtime.get()
+    return await asyncio.gather(*(run_platform(platform, playwright) for platform in platforms))
+
+
+async def run_job(job: dict, playwright=None) -> bool:
+    """执行 manifest / 队列 / 常驻服务中的单个任务"""
+    upload_func = UPLOAD_FUNCS.get(job['platform'])
+    if upload_func is None:
+        raise ValueError(f"不支持的平台: {job['platform']}")
+    return await upload_func(prepare_media(job_to_args(job)), playwright=playwright)
+
+
+def expect_job(job: dict, playwright=None):
+    """登记即将执行的任务，启用预热池时提前为该账号打开上传页"""
+    if job['platform'] in UPLOAD_PAGES:
+        account_file = cookie_manager.get_cookie_path(job['platform'], job.get('account', 'default'))
+        warm_pool.expect(job['platform'], account_file, playwright=playwright)
+
+
+def configure_warm_pool(args):
+    """根据命令行参数启用预热池"""
+    if args.warm_pages > 0:
+        warm_pool.configure(max_pages=args.warm_pages, memory_budget_mb=args.warm_memory)
+
+
+def run_manifest(args):
+    """批量模式：并发执行 manifest 中的所有任务"""
+    jobs = load_manifest(args.manifest)
+    results_path = Path(args.results) if args.results else default_results_path(args.manifest)
+    limiter = build_limiter(args)
+    configure_warm_pool(args)
+    warn_expiring_accounts(jobs, args.expiry_hours)
+    logger.info(f"[批量] 共 {len(jobs)} 个任务，全局并发 {limiter.global_limit}，结果写入 {results_path}")
+
+    async def run_all():
+        # 所有任务共享进程级 Playwright 驱动，浏览器进程由浏览器池复用
+        playwright = await playwright_runtime.get()
+        for job in jobs:
+            expect_job(job, playwright)
+        return await run_jobs(jobs, lambda job: run_job(job, playwright=playwright), limiter, results_path,
+                              auth_wait=auth_wait_seconds(args))
+
+    results = playwright_runtime.run(run_all())
+    wait_recorder.log_summary()
+
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    print(f"\n批量上传完成: 成功 {succeeded}/{len(results)}，结果文件: {results_path}")
+    needs_auth = sorted({f"{result['platform']}:{result['account']}" for result in results
+                         if result['status'] == 'needs_auth'})
+    if needs_auth:
+        print(f"需要登录的账号（登录后重新执行即可）: {','.join(needs_auth)}")
+    if succeeded != len(results):
+        sys.exit(1)
+
+
+def auth_wait_seconds(args) -> float:
+    """--auth-wait（分钟）转换为秒，负数表示一直等待（None）"""
+    return None if args.auth_wait < 0 else args.auth_wait * 60
+
+
+def build_limiter(args) -> ConcurrencyLimiter:
+    """根据命令行参数创建并发限制器"""
+    return ConcurrencyLimiter(
+        global_limit=args.concurrency,
+        platform_limits=parse_platform_limits(args.platform_concurrency),
+        account_limit=args.account_concurrency,
+    )
+
+
+def configure_session_refresher(args):
+    """根据命令行参数配置登录态保活"""
+    session_refresher.refresh_hours = args.refresh_hours
+    session_refresher.idle_hours = args.refresh_idle_hours
+    session_refresher.concurrency = max(1, args.refresh_concurrency)
+    session_refresher.jitter = max(0, args.refresh_jitter)
+
+
+def run_daemon(args):
+    """常驻服务模式：保持 Playwright 驱动常驻，通过本地 HTTP 接收任务"""
+    configure_warm_pool(args)
+    configure_session_refresher(args)
+    daemon = UploadDaemon(run_job, UPLOAD_FUNCS, build_limiter(args), on_submit=expect_job,
+                          refresher=session_refresher, refresh_interval=args.refresh_interval * 60,
+                          auth_wait=auth_wait_seconds(args))
+    try:
+        playwright_runtime.run(daemon.serve(host=args.host, port=args.port, unix_socket=args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+def print_table(rows: list, columns: tuple):
+    """以 TSV 格式输出表格（首行为列名，布尔值输出为 true / false，空值输出为空）"""
+    def cell(value) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join(cell(row[column]) for column in columns))
+
+
+def run_cookie_report(args, platforms: list = None):
+    """离线输出所有账号登录态 Cookie 的过期情况（不请求网络）"""
+    rows = [row for row in cookie_manager.expiry_report(args.expiry_hours)
+            if platforms is None or row['platform'] in platforms]
+    print_table(rows, ("platform", "account", "status", "expires_at", "expires_in_hours", "auth_cookies"))
+    flagged = [row for row in rows if row['status'] in ('expired', 'expiring')]
+    if flagged:
+        logger.warning(f"[Cookie] {len(flagged)} 个账号已过期或将在 {args.expiry_hours} 小时内过期，需要重新登录")
+
+
+def warn_expiring_accounts(jobs: list, warn_hours: float):
+    """批量任务开始前，提示登录态已过期或即将过期的账号"""
+    for platform, account in sorted({(job['platform'], job.get('account', 'default')) for job in jobs}):
+        expiry = cookie_manager.get_cookie_expiry(platform, account, warn_hours)
+        if expiry is None:
+            continue
+        if expiry['status'] == 'expired':
+            logger.warning(f"[Cookie] {platform} 账号 {account} 的登录 Cookie 已过期，任务执行时需要重新登录")
+        elif expiry['status'] == 'expiring':
+            hours = (expiry['expires_at'] - time.time()) / 3600
+            logger.warning(f"[Cookie] {platform} 账号 {account} 的登录 Cookie 将在 {hours:.1f} 小时后过期")
+
+
+def run_verify_all(args, platforms: list = None):
+    """并发校验所有已保存的 Cookie，输出 TSV 表格（--results 指定时同时写出 JSONL）"""
+    results = playwright_runtime.run(cookie_manager.verify_all(platforms=platforms,
+                                                                concurrency=args.verify_concurrency))
+    print_table(results, ("platform", "account", "valid", "method", "latency_ms", "error"))
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    invalid = [result for result in results if not result["valid"]]
+    logger.info(f"[Cookie] 共 {len(results)} 个账号，有效 {len(results) - len(invalid)}，需要重新登录 {len(invalid)}")
+    if invalid:
+        sys.exit(1)
+
+
+def run_refresh_sessions(args, platforms: list = None):
+    """执行一轮登录态保活（适合 cron 定时执行），输出 TSV 表格"""
+    configure_session_refresher(args)
+    results = playwright_runtime.run(session_refresher.run_once(platforms=platforms))
+    print_table(results, ("platform", "account", "reason", "status", "expires_before", "expires_after",
+                          "duration", "error"))
+    failed = [result for result in results if result["status"] != "refreshed"]
+    logger.info(f"[保活] 共 {len(results)} 个账号，已刷新 {len(results) - len(failed)}，失败或需要重新登录 {len(failed)}")
+    if failed:
+        sys.exit(1)
+
+
+def run_compact_cookies(args, platforms: list = None):
+    """压缩所有账号的 Cookie 文件，输出压缩前后的大小和创建上下文耗时（TSV）"""
+    results = playwright_runtime.run(cookie_manager.compact_all(platforms, measure=not args.no_timing))
+    print_table(results, ("platform", "account", "bytes_before", "bytes_after", "cookies_before", "cookies_after",
+                          "origins_before", "origins_after", "context_ms_before", "context_ms_after", "error"))
+    saved = sum(result["bytes_before"] - result["bytes_after"] for result in results if result["bytes_before"])
+    logger.info(f"[Cookie] 共压缩 {len(results)} 个账号，减少 {saved / 1024:.0f}KB")
+
+
+def parse_login_accounts(value: str) -> list:
+    """解析 --qr-login：逗号分隔的 platform:account，或每行一个 platform:account 的文件"""
+    path = Path(value)
+    if path.is_file():
+        items = [line.strip() for line in path.read_text(encoding="utf-8").splitlines()]
+    else:
+        items = [item.strip() for item in value.split(",")]
+    accounts = []
+    for item in items:
+        if not item or item.startswith("#"):
+            continue
+        platform, _, account = item.partition(":")
+        platform = platform.strip()
+        if platform not in QR_LOGIN_FLOWS:
+            raise ValueError(f"不支持扫码登录的平台: {platform}（可选: {', '.join(QR_LOGIN_FLOWS)}）")
+        accounts.append((platform, account.strip() or "default"))
+    if not accounts:
+        raise ValueError("--qr-login 没有指定账号")
+    return list(dict.fromkeys(accounts))
+
+
+def run_qr_login(args, accounts: list):
+    """并发扫码登录一批账号：二维码推送到本地网页并保存为 PNG，扫码成功后立即保存 Cookie"""
+    service = QRLoginService(concurrency=args.login_concurrency, timeout=args.login_timeout)
+    logger.info(f"[扫码登录] 共 {len(accounts)} 个账号，同时打开 {service.concurrency} 个登录页")
+    results = playwright_runtime.run(service.serve(accounts, host=args.host, port=args.login_port))
+    print_table(results, ("platform", "account", "status", "duration", "error"))
+    saved = [result for result in results if result["status"] == "saved"]
+    logger.info(f"[扫码登录] 共 {len(results)} 个账号，登录成功 {len(saved)}")
+    if len(saved) != len(results):
+        sys.exit(1)
+
+
+def run_queue_command(args, parser):
+    """持久化队列相关命令：enqueue / worker / status"""
+    queue = JobQueue(args.queue)
+    try:
+        if args.command == 'enqueue':
+            if not args.manifest:
+                parser.error('enqueue 需要 --manifest')
+            jobs = load_manifest(args.manifest)
+            for job in jobs:
+                if job['platform'] not in UPLOAD_FUNCS:
+                    raise ValueError(f"任务 {job['id']} 的平台不支持: {job['platform']}")
+            job_ids = [queue.enqueue(job, max_attempts=args.max_attempts) for job in jobs]
+            print(f"已入队 {len(set(job_ids))} 个任务（队列: {args.queue}）")
+        elif args.command == 'worker':
+            counters = playwright_runtime.run(run_worker(queue, run_job, slots=args.slots, watch=args.watch,
+                                                         auth_wait=auth_wait_seconds(args)))
+            print(f"\nworker 结束: 完成 {counters['done']}，失败 {counters['failed']}，待重试 {counters['retried']}，"
+                  f"挂起等待登录 {counters['parked']}")
+            if counters['failed']:
+                sys.exit(1)
+        elif args.command == 'status':
+            print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+    finally:
+        queue.close()
 
 
 def main():
     parser = argparse.ArgumentParser(description='视频上传工具')
     
-    # 必需参数
-    parser.add_argument('--platform', required=True, 
-                       choices=['douyin', 'kuaishou', 'tiktok', 'tencent', 'xhs'],
-                       help='上传平台')
-    parser.add_argument('--video', required=True, help='视频文件路径')
-    parser.add_argument('--title', required=True, help='视频标题')
+    # 子命令（不填则按参数直接上传）
+    parser.add_argument('command', nargs='?', choices=['enqueue', 'worker', 'status', 'daemon'],
+                       help='enqueue 把 manifest 任务加入队列，worker 执行队列任务，status 查看队列状态，daemon 启动常驻服务')
+    
+    # 单个任务参数（批量模式下由 manifest 提供）
+    parser.add_argument('--platform',
+                       help=f'上传平台（{", ".join(UPLOAD_FUNCS)}），多个平台用逗号分隔，all 表示 {", ".join(ALL_PLATFORMS)}')
+    parser.add_argument('--video', help='视频文件路径')
+    parser.add_argument('--title', help='视频标题')
     
     # 可选参数
     parser.add_argument('--tags', help='标签（逗号分隔）')
@@ -265,55 +690,170 @@ def main():
     parser.add_argument('--product-title', help='商品标题（抖音）')
     parser.add_argument('--category', help='分类（视频号）')
     
+    # 批量模式
+    parser.add_argument('--manifest', help='批量任务文件（JSONL，每行一个任务）')
+    parser.add_argument('--results', help='批量结果文件（默认：<manifest>.results.jsonl）')
+    parser.add_argument('--concurrency', type=int, default=3, help='批量模式全局并发数')
+    parser.add_argument('--platform-concurrency', help='每个平台的并发数，如 douyin=2,tiktok=1')
+    parser.add_argument('--account-concurrency', type=int, default=1, help='每个账号的并发数（默认 1，同账号串行）')
+    parser.add_argument('--auth-wait', type=float, default=30,
+                       help='批量 / 队列 / 常驻服务中账号需要登录时，任务挂起等待登录的分钟数（默认 30，负数表示一直等待）')
+    
+    # 预热池
+    parser.add_argument('--warm-pages', type=int, default=0,
+                       help='批量 / 常驻服务模式下最多保持的预热上传页数（默认 0，不预热）')
+    parser.add_argument('--warm-memory', type=int, default=2048, help='预热页面的内存预算（MB）')
+    
+    # 持久化队列
+    parser.add_argument('--queue', default=str(QUEUE_DB), help='任务队列数据库路径')
+    parser.add_argument('--slots', type=int, default=2, help='worker 并发槽位数')
+    parser.add_argument('--watch', action='store_true', help='worker 在队列清空后继续等待新任务')
+    parser.add_argument('--max-attempts', type=int, default=3, help='入队任务的最大尝试次数')
+    
+    # 常驻服务
+    parser.add_argument('--host', default='127.0.0.1', help='常驻服务监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='常驻服务监听端口')
+    parser.add_argument('--socket', help='常驻服务 Unix socket 路径（指定后不监听 TCP）')
+    parser.add_argument('--refresh-interval', type=float, default=0,
+                       help='常驻服务后台登录态保活的间隔（分钟，默认 0，不保活）')
+    
+    # 登录态保活
+    parser.add_argument('--refresh-sessions', action='store_true',
+                       help='为即将过期或长时间未使用的账号执行一轮登录态保活（可用 --platform 限定平台）')
+    parser.add_argument('--refresh-hours', type=float, default=48, help='登录 Cookie 在多少小时内过期的账号需要保活')
+    parser.add_argument('--refresh-idle-hours', type=float, default=72,
+                       help='Cookie 文件超过多少小时未更新的账号也需要保活')
+    parser.add_argument('--refresh-concurrency', type=int, default=2, help='同时保活的账号数')
+    parser.add_argument('--refresh-jitter', type=float, default=30, help='每个账号开始前随机等待的最长秒数')
+    
     # Cookie 管理
     parser.add_argument('--login', action='store_true', help='强制重新登录')
     parser.add_argument('--verify-cookie', action='store_true', help='仅验证 Cookie 有效性')
     parser.add_argument('--list-cookies', action='store_true', help='列出所有已保存的 Cookie')
+    parser.add_argument('--migrate-accounts', action='store_true',
+                       help='把 cookiesFile、db/database.db 和 accounts.ini 中的账号导入账号库（也用于导入手动添加的 Cookie 文件）')
+    parser.add_argument('--qr-login', metavar='ACCOUNTS',
+                       help='并发扫码登录一批账号：逗号分隔的 platform:account，或每行一个的文件')
+    parser.add_argument('--login-port', type=int, default=8766, help='扫码页面端口（0 表示不启动页面，只保存二维码图片）')
+    parser.add_argument('--login-concurrency', type=int, default=8, help='--qr-login 同时打开的登录页数量')
+    parser.add_argument('--login-timeout', type=float, default=200, help='--qr-login 每个账号等待扫码的秒数')
+    parser.add_argument('--verify-all', action='store_true',
+                       help='并发校验所有已保存的 Cookie 并输出表格（可用 --platform 限定平台）')
+    parser.add_argument('--verify-concurrency', type=int, default=8, help='--verify-all 同时进行的浏览器校验数')
+    parser.add_argument('--cookie-report', action='store_true',
+                       help='离线输出所有账号登录态 Cookie 的过期时间（不启动浏览器、不请求网络）')
+    parser.add_argument('--expiry-hours', type=float, default=24,
+                       help='距离过期不足多少小时视为即将过期（--cookie-report 和批量模式的提前提醒）')
+    parser.add_argument('--compact-cookies', action='store_true',
+                       help='压缩所有账号的 Cookie 文件，只保留登录需要的 Cookie 和 localStorage（可用 --platform 限定平台）')
+    parser.add_argument('--no-timing', action='store_true', help='--compact-cookies 不测量创建浏览器上下文的耗时')
+    parser.add_argument('--verify-ttl', type=int,
+                       help=f'Cookie 校验结果缓存有效期（秒，默认 {verification_cache.ttl}，0 表示每次都校验）')
     
     args = parser.parse_args()
     
+    if args.verify_ttl is not None:
+        verification_cache.ttl = args.verify_ttl
+    
     # Cookie 管理命令
+    if args.migrate_accounts:
+        counts = cookie_manager.migrate_accounts()
+        print(f"已导入: Cookie 文件 {counts['cookies_file']}，user_info {counts['user_info']}，"
+              f"accounts.ini {counts['accounts_ini']}")
+        return
+    
     if args.list_cookies:
-        cookies = cookie_manager.list_cookies()
+        accounts = cookie_manager.list_accounts()
         print("\n已保存的 Cookie:")
-        for platform, accounts in cookies.items():
+        for platform in sorted({account['platform'] for account in accounts}):
             print(f"\n{platform}:")
             for account in accounts:
-                print(f"  - {account}")
+                if account['platform'] == platform:
+                    print(f"  - {account['account']}（{account['status']}）")
         return
     
-    if args.verify_cookie:
-        result = asyncio.run(cookie_manager.verify_cookie(args.platform, args.account))
-        if result:
-            print(f"✅ {args.platform} 账号 {args.account} 的 Cookie 有效")
+    if args.qr_login:
+        try:
+            accounts = parse_login_accounts(args.qr_login)
+        except ValueError as e:
+            parser.error(str(e))
+        run_qr_login(args, accounts)
+        return
+    
+    if args.verify_all or args.cookie_report or args.refresh_sessions or args.compact_cookies:
+        try:
+            platforms = parse_platforms(args.platform) if args.platform else None
+        except ValueError as e:
+            parser.error(str(e))
+        if args.cookie_report:
+            run_cookie_report(args, platforms)
+        elif args.refresh_sessions:
+            run_refresh_sessions(args, platforms)
+        elif args.compact_cookies:
+            run_compact_cookies(args, platforms)
         else:
-            print(f"❌ {args.platform} 账号 {args.account} 的 Cookie 无效或不存在")
+            run_verify_all(args, platforms)
+        return
+    
+    if args.command == 'daemon':
+        run_daemon(args)
+        return
+    
+    if args.command:
+        run_queue_command(args, parser)
+        return
+    
+    if args.manifest:
+        run_manifest(args)
+        return
+    
+    if not args.platform:
+        parser.error('缺少 --platform')
+    try:
+        platforms = parse_platforms(args.platform)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.verify_cookie:
+        async def verify_platforms():
+            return [await cookie_manager.verify_cookie(platform, args.account, use_cache=False)
+                    for platform in platforms]
+
+        for platform, result in zip(platforms, playwright_runtime.run(verify_platforms())):
+            if result:
+                print(f"✅ {platform} 账号 {args.account} 的 Cookie 有效")
+            else:
+                print(f"❌ {platform} 账号 {args.account} 的 Cookie 无效或不存在")
         return
     
     if args.login:
-        result = asyncio.run(cookie_manager.login_and_save_cookie(args.platform, args.account))
-        if result:
-            print(f"✅ {args.platform} 账号 {args.account} 登录成功")
-        else:
-            print(f"❌ {args.platform} 账号 {args.account} 登录失败")
+        async def login_platforms():
+            return [await cookie_manager.login_and_save_cookie(platform, args.account) for platform in platforms]
+
+        for platform, result in zip(platforms, playwright_runtime.run(login_platforms())):
+            if result:
+                print(f"✅ {platform} 账号 {args.account} 登录成功")
+            else:
+                print(f"❌ {platform} 账号 {args.account} 登录失败")
         return
     
     # 上传视频
-    upload_funcs = {
-        'douyin': upload_douyin,
-        'kuaishou': upload_kuaishou,
-        'tiktok': upload_tiktok,
-        'tencent': upload_tencent,
-        'xhs': upload_xhs,
-    }
-    
-    upload_func = upload_funcs.get(args.platform)
-    if upload_func is None:
-        print(f"❌ 不支持的平台: {args.platform}")
-        return
+    if not args.video or not args.title:
+        parser.error('上传视频需要 --video 和 --title')
     
     try:
-        result = asyncio.run(upload_func(args))
+        prepare_media(args)
+        if len(platforms) > 1:
+            results = playwright_runtime.run(upload_to_platforms(args, platforms))
+            print("\n各平台上传结果:")
+            for item in results:
+                mark = "✅" if item['status'] == 'success' else "❌"
+                error = f"  {item['error']}" if item['error'] else ""
+                print(f"  {mark} {item['platform']:<10} {item['status']:<8} {item['duration']:>8.1f}s{error}")
+            if any(item['status'] != 'success' for item in results):
+                sys.exit(1)
+            return
+        result = playwright_runtime.run(UPLOAD_FUNCS[platforms[0]](args))
         if result:
             print(f"\n✅ 视频上传成功！")
         else:
@@ -325,6 +865,5 @@ def main():
         traceback.print_exc()
         sys.exit(1)
 
-
 if __name__ == "__main__":
     main()
@@ -5,14 +5,15 @@
 import asyncio
 from pathlib import Path
 from datetime import datetime
-from playwright.async_api import async_playwright
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
 from utils.cookie_manager import cookie_manager
-from utils.base_social_media import set_init_script
+from utils.base_social_media import upload_page_logged_in
 from utils.log import logger
+from utils.playwright_runtime import playwright_runtime, shared_playwright
 from utils.files_times import get_absolute_path
+from utils.verify_cache import verification_cache
 
 
 class DouyinUploader:
@@ -29,6 +30,38 @@ class DouyinUploader:
         self.account_name = account_name
         self.upload_url = "https://creator.douyin.com/creator-micro/content/upload"
     
+    async def login(self) -> bool:
+        """打开浏览器扫码登录并保存 Cookie"""
+        success = await cookie_manager.login_and_save_cookie(self.platform, self.account_name)
+        if not success:
+            logger.error(f"[抖音] 登录失败")
+        return success
+    
+    async def open_upload_page(self, playwright):
+        """
+        加载 Cookie 打开上传页，并在该页面上确认登录态
+        
+        Returns:
+            (browser, context, page)；页面显示未登录时关闭浏览器并返回 None
+        """
+        browser = await playwright.chromium.launch(headless=False)
+        try:
+            context = await cookie_manager.load_cookie(browser, self.platform, self.account_name)
+            page = await context.new_page()
+            await page.goto(self.upload_url)
+            logger.info(f"[抖音] 已打开上传页面")
+            await page.wait_for_url(self.upload_url, timeout=10000)
+            logged_in = await upload_page_logged_in(page, self.platform)
+        except BaseException:
+            await browser.close()
+            raise
+        if not logged_in:
+            logger.warning(f"[抖音] 上传页显示未登录，需要重新登录")
+            verification_cache.invalidate(self.platform, self.account_name)
+            await browser.close()
+            return None
+        return browser, context, page
+    
     async def upload(
         self,
         video_path: str,
@@ -62,43 +95,31 @@ class DouyinUploader:
         """
         logger.info(f"[抖音] 开始上传视频: {title}")
         
-        # 检查 Cookie 是否存在和有效
+        # 检查 Cookie 是否存在和有效（HTTP 快速校验；无法判断时不单独打开浏览器，由上传页确认登录态）
         cookie_valid = False
         if cookie_manager.cookie_exists(self.platform, self.account_name):
             logger.info(f"[抖音] 检查 Cookie 有效性...")
-            cookie_valid = await cookie_manager.verify_cookie(self.platform, self.account_name)
+            check = await cookie_manager.check_cookie(self.platform, self.account_name, browser_fallback=False)
+            cookie_valid = check["valid"] or check["method"] == "deferred"
         
         # 如果 Cookie 无效，需要登录
         if not cookie_valid:
             logger.warning(f"[抖音] Cookie 无效或不存在，需要登录")
-            success = await cookie_manager.login_and_save_cookie(self.platform, self.account_name)
-            if not success:
-                logger.error(f"[抖音] 登录失败")
+            if not await self.login():
                 return False
         
-        # 开始上传
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=False)
-            
-            # 加载 Cookie
-            context = await cookie_manager.load_cookie(browser, self.platform, self.account_name)
-            page = await context.new_page()
+        # 开始上传：确认登录态的页面直接用于上传
+        async with shared_playwright() as playwright:
+            session = await self.open_upload_page(playwright)
+            if session is None:
+                if not await self.login():
+                    return False
+                session = await self.open_upload_page(playwright)
+                if session is None:
+                    return False
+            browser, context, page = session
             
             try:
-                # 访问上传页面
-                await page.goto(self.upload_url)
-                logger.info(f"[抖音] 已打开上传页面")
-                
-                # 等待页面加载
-                await page.wait_for_url(self.upload_url, timeout=10000)
-                
-                # 检查是否需要重新登录
-                if await page.get_by_text('扫码登录').count() or await page.get_by_text('手机号登录').count():
-                    logger.error(f"[抖音] 需要重新登录")
-                    await context.close()
-                    await browser.close()
-                    return False
-                
                 # 上传视频文件
                 logger.info(f"[抖音] 上传视频文件...")
                 video_abs_path = get_absolute_path(video_path, "video_uploader")
@@ -287,4 +308,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    playwright_runtime.run(main())
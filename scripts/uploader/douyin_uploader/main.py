@@ -1,26 +1,37 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright, Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Playwright, Page
 import os
 import asyncio
 
 from conf import LOCAL_CHROME_PATH
-from utils.base_social_media import set_init_script
+from utils.state_persistence import save_storage_state
+from utils.base_social_media import SOCIAL_MEDIA_DOUYIN, goto_upload_page
 from utils.log import douyin_logger
 from utils.browser_setup import get_browser_context, handle_permissions_dialog, wait_for_video_preview
+from utils.playwright_runtime import shared_playwright
+from utils.locator_race import first_visible
+from utils.page_waits import PageWaits
+from utils.text_entry import TextEntry
+from utils.upload_pipeline import UploadPipeline
+from utils.upload_progress import track_upload
+from utils.upload_status import wait_for_upload
+from utils.warm_pool import upload_context, warm_pool
 from utils.video_utils import capture_thumbnail_from_video, select_platform_generated_cover
 
+waits = PageWaits(SOCIAL_MEDIA_DOUYIN, douyin_logger)
+text_entry = TextEntry(SOCIAL_MEDIA_DOUYIN, douyin_logger)
+
+# 选择视频后跳转的发布页面（新旧两个版本）
+PUBLISH_PAGE_URLS = {
+    "https://creator.douyin.com/creator-micro/content/publish?enter_from=publish_page": "version_1",
+    "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page": "version_2",
+}
 
 async def cookie_auth(account_file):
-    async with async_playwright() as playwright:
-        browser, context = await get_browser_context(
-            playwright=playwright,
-            account_file=account_file,
-            headless=True,
-            locale="zh-CN",
-            use_chrome=True
-        )
+    async with shared_playwright() as playwright, \
+            upload_context(playwright, SOCIAL_MEDIA_DOUYIN, account_file, headless=True) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -29,8 +40,6 @@ async def cookie_auth(account_file):
             await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
         except:
             print("[+] 等待5秒 cookie 失效")
-            await context.close()
-            await browser.close()
             return False
         # 2024.06.17 抖音创作者中心改版
         if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
@@ -52,7 +61,7 @@ async def douyin_setup(account_file, handle=False):
 
 
 async def douyin_cookie_gen(account_file):
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         browser, context = await get_browser_context(
             playwright=playwright,
             account_file=account_file,
@@ -65,7 +74,9 @@ async def douyin_cookie_gen(account_file):
         await page.goto("https://creator.douyin.com/")
         await page.pause()
         # 点击调试器的继续，保存cookie
-        await context.storage_state(path=account_file)
+        await save_storage_state(context, account_file)
+        await context.close()
+        await browser.close()
 
 
 class DouYinVideo(object):
@@ -86,69 +97,67 @@ class DouYinVideo(object):
         label_element = page.locator("[class^='radio']:has-text('定时发布')")
         # 在选中的 label 元素下点击 checkbox
         await label_element.click()
-        await asyncio.sleep(1)
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M")
 
-        await asyncio.sleep(1)
-        await page.locator('.semi-input[placeholder="日期和时间"]').click()
+        date_input = page.locator('.semi-input[placeholder="日期和时间"]')
+        await waits.locator(date_input, name="定时发布时间输入框")
+        await date_input.click()
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
 
-        await asyncio.sleep(1)
+        await waits.function(page, "([selector, value]) => document.querySelector(selector)?.value === value",
+                             ['.semi-input[placeholder="日期和时间"]', publish_date_hour],
+                             name="定时发布时间生效", required=False)
 
     async def handle_upload_error(self, page):
         douyin_logger.info('视频出错了，重新上传中')
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用完整配置的浏览器上下文
-        browser, context = await get_browser_context(
-            playwright=playwright,
-            account_file=self.account_file,
-            headless=False,
-            locale="zh-CN",
-            use_chrome=True
-        )
+    async def upload(self, playwright: Playwright, verify_login: bool = False) -> None:
+        # 从预热池获取页面（已预热时页面已经停在上传页，浏览器来自浏览器池）
+        async with warm_pool.page(playwright, SOCIAL_MEDIA_DOUYIN, self.account_file,
+                                  verify_login=verify_login) as page:
+            await self.upload_on_page(page)
 
-        # 创建一个新的页面
-        page = await context.new_page()
-        
+    async def upload_on_page(self, page: Page) -> None:
+        context = page.context
         # 处理权限弹窗
         await handle_permissions_dialog(page)
         # 访问指定的 URL
-        await page.goto("https://creator.douyin.com/creator-micro/content/upload")
+        await goto_upload_page(page, SOCIAL_MEDIA_DOUYIN)
         douyin_logger.info(f'[+]正在上传-------{self.title}.mp4')
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         douyin_logger.info(f'[-] 正在打开主页...')
         await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload")
         # 点击 "上传视频" 按钮
+        await track_upload(page, SOCIAL_MEDIA_DOUYIN, self.file_path, log=douyin_logger)
         await page.locator("div[class^='container'] input").set_input_files(self.file_path)
 
         # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
-        while True:
-            try:
-                # 尝试等待第一个 URL
-                await page.wait_for_url(
-                    "https://creator.douyin.com/creator-micro/content/publish?enter_from=publish_page", timeout=3000)
-                douyin_logger.info("[+] 成功进入version_1发布页面!")
-                break  # 成功进入页面后跳出循环
-            except Exception:
-                try:
-                    # 如果第一个 URL 超时，再尝试等待第二个 URL
-                    await page.wait_for_url(
-                        "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page",
-                        timeout=3000)
-                    douyin_logger.info("[+] 成功进入version_2发布页面!")
+        await waits.url(page, lambda url: url in PUBLISH_PAGE_URLS, name="发布页面")
+        douyin_logger.info(f"[+] 成功进入{PUBLISH_PAGE_URLS.get(page.url, '')}发布页面!")
+        # 标题、话题、商品、定时等在视频上传的同时填写，封面依赖上传完成后的视频预览
+        pipeline = UploadPipeline(SOCIAL_MEDIA_DOUYIN, douyin_logger)
+        pipeline.add("metadata", self.fill_title_and_tags)
+        pipeline.add("upload", lambda page: self.wait_for_video_uploaded(page, pipeline), ui=False)
+        if self.productLink and self.productTitle:
+            pipeline.add("product", self.set_product)
+        pipeline.add("options", self.set_publish_options)
+        if self.publish_date != 0:
+            pipeline.add("schedule", lambda page: self.set_schedule_time_douyin(page, self.publish_date))
+        pipeline.add("cover", lambda page: self.set_thumbnail_with_validation(page, self.thumbnail_path),
+                     after=["upload"])
+        pipeline.add("publish", self.click_publish, after="*")
+        await pipeline.run(page)
 
-                    break  # 成功进入页面后跳出循环
-                except:
-                    print("  [-] 超时未进入视频发布页面，重新尝试...")
-                    await asyncio.sleep(0.5)  # 等待 0.5 秒后重新尝试
+        await save_storage_state(context, self.account_file, debounce=True)  # 保存cookie
+        douyin_logger.success('  [-]cookie更新完毕！')
+    
+    async def fill_title_and_tags(self, page: Page):
         # 填充标题和话题
         # 检查是否存在包含输入框的元素
         # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
         douyin_logger.info(f'  [-] 正在填充标题和作品简介...')
         title_selectors = [
             "input.semi-input[placeholder*='作品标题']",
@@ -156,7 +165,8 @@ class DouYinVideo(object):
             "input[placeholder*='作品标题']",
             ".editor-comp-publish-container-d4oeQI input.semi-input",
         ]
-        title_container = await self.locate_first_visible(page, title_selectors, timeout=15000)
+        title_container = await first_visible(page, SOCIAL_MEDIA_DOUYIN, "标题输入框", title_selectors, timeout=15000,
+                                              log=douyin_logger)
         if title_container:
             await title_container.fill(self.title[:30])
         else:
@@ -165,7 +175,7 @@ class DouYinVideo(object):
             await page.keyboard.press("Backspace")
             await page.keyboard.press("Control+KeyA")
             await page.keyboard.press("Delete")
-            await page.keyboard.type(self.title)
+            await text_entry.insert(page, self.title)
             await page.keyboard.press("Enter")
 
         description_selectors = [
@@ -176,7 +186,8 @@ class DouYinVideo(object):
             "[contenteditable='true'][data-placeholder*='作品简介']",
             "[contenteditable='true'][data-placeholder*='正文']",
         ]
-        description_editor = await self.locate_first_visible(page, description_selectors, timeout=15000)
+        description_editor = await first_visible(page, SOCIAL_MEDIA_DOUYIN, "作品简介输入框", description_selectors,
+                                                 timeout=15000, log=douyin_logger)
         if description_editor is None:
             raise RuntimeError("未找到抖音作品简介输入框，请检查页面结构是否发生变化。")
         await description_editor.click()
@@ -187,51 +198,34 @@ class DouYinVideo(object):
             pass
 
         if self.title:
-            await description_editor.type(self.title)
-            await description_editor.type("\n")
-
-        for index, tag in enumerate(self.tags, start=1):
-            await description_editor.type(f"#{tag} ")
-            await page.wait_for_timeout(200)  # brief pause to let Douyin suggestion panel settle
-        await page.wait_for_timeout(1000)  # ensure the editor syncs before proceeding
-        douyin_logger.info(f'总共添加{len(self.tags)}个话题')
-        while True:
-            # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
-            try:
-                #  新版：定位重新上传
-                number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
-                if number > 0:
-                    douyin_logger.success("  [-]视频上传完毕")
-                    # 等待视频预览加载
-                    douyin_logger.info("  [-] 等待视频预览加载...")
-                    if await wait_for_video_preview(page, timeout=30000):
-                        douyin_logger.success("  [+] 视频预览加载成功")
-                    else:
-                        douyin_logger.warning("  [!] 视频预览加载超时，但继续执行")
-                    break
-                else:
-                    douyin_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-
-                    if await page.locator('div.progress-div > div:has-text("上传失败")').count():
-                        douyin_logger.error("  [-] 发现上传出错了... 准备重试")
-                        await self.handle_upload_error(page)
-            except:
-                douyin_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+            await text_entry.insert(page, self.title)
+            await page.keyboard.press("Enter")
 
-        if self.productLink and self.productTitle:
-            douyin_logger.info(f'  [-] 正在设置商品链接...')
-            await self.set_product_link(page, self.productLink, self.productTitle)
-            douyin_logger.info(f'  [+] 完成设置商品链接...')
-        
-        # 上传视频封面（必须设置封面）
-        await self.set_thumbnail_with_validation(page, self.thumbnail_path)
+        # 每个话题输入后等话题联想弹窗稳定，最后等编辑器同步完
+        count = await text_entry.add_tags(page, self.tags)
+        await text_entry.settle(page, name="简介同步")
+        douyin_logger.info(f'总共添加{count}个话题')
+
+    async def wait_for_video_uploaded(self, page: Page, pipeline: UploadPipeline):
+        # 页面出现"重新上传"即上传完毕，出现"上传失败"时重新上传
+        await wait_for_upload(page, SOCIAL_MEDIA_DOUYIN, on_failed=pipeline.exclusive(self.handle_upload_error),
+                              log=douyin_logger)
+        # 等待视频预览加载
+        douyin_logger.info("  [-] 等待视频预览加载...")
+        if await wait_for_video_preview(page, timeout=30000):
+            douyin_logger.success("  [+] 视频预览加载成功")
+        else:
+            douyin_logger.warning("  [!] 视频预览加载超时，但继续执行")
 
+    async def set_product(self, page: Page):
+        douyin_logger.info(f'  [-] 正在设置商品链接...')
+        await self.set_product_link(page, self.productLink, self.productTitle)
+        douyin_logger.info(f'  [+] 完成设置商品链接...')
+
+    async def set_publish_options(self, page: Page):
         # 更换可见元素
         await self.set_location(page, "")
 
-
         # 頭條/西瓜
         third_part_element = '[class^="info"] > [class^="first-part"] div div.semi-switch'
         # 定位是否有第三方平台
@@ -240,9 +234,7 @@ class DouYinVideo(object):
             if 'semi-switch-checked' not in await page.eval_on_selector(third_part_element, 'div => div.className'):
                 await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
 
-        if self.publish_date != 0:
-            await self.set_schedule_time_douyin(page, self.publish_date)
-
+    async def click_publish(self, page: Page):
         # 判断视频是否发布成功
         while True:
             # 判断视频是否发布成功
@@ -259,13 +251,6 @@ class DouYinVideo(object):
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(0.5)
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        douyin_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
-    
     async def set_thumbnail_with_validation(self, page: Page, thumbnail_path: str):
         """
         设置视频封面（必须设置）并验证设置成功
@@ -320,9 +305,10 @@ class DouYinVideo(object):
         通过检查“请设置封面后再发布”的弹窗是否消失
         """
         try:
-            # 等待一下让页面更新
-            await page.wait_for_timeout(1000)
-            
+            # 等待提示消失（没有提示时立即返回）
+            await waits.selector(page, 'text="请设置封面后再发布"', state="hidden", name="封面提示消失",
+                                 required=False)
+
             # 检查是否还有“请设置封面后再发布”的提示
             warning_selectors = [
                 'text="请设置封面后再发布"',
@@ -365,14 +351,16 @@ class DouYinVideo(object):
             await page.click('text="选择封面"')
             await page.wait_for_selector("div.dy-creator-content-modal", timeout=5000)
             await page.click('text="设置竖封面"')
-            await page.wait_for_timeout(2000)  # 等待2秒
-            
+            upload_input = page.locator("div[class^='semi-upload upload'] >> input.semi-upload-hidden-input")
+            await waits.locator(upload_input, state="attached", name="竖封面上传区域", kind="dialog")
+
             # 定位到上传区域并点击
-            await page.locator("div[class^='semi-upload upload'] >> input.semi-upload-hidden-input").set_input_files(thumbnail_path)
-            await page.wait_for_timeout(2000)  # 等待2秒
-            
+            await upload_input.set_input_files(thumbnail_path)
+            finish_button = page.locator("div#tooltip-container button:visible:has-text('完成')")
+            await waits.locator(finish_button, name="封面完成按钮", kind="dialog")
+
             # 点击完成按钮
-            await page.locator("div#tooltip-container button:visible:has-text('完成')").click()
+            await finish_button.click()
             
             douyin_logger.info('  [+] 封面上传完成')
             
@@ -394,7 +382,7 @@ class DouYinVideo(object):
         #     "div.semi-select-single").nth(0).click()
         await page.locator('div.semi-select span:has-text("输入地理位置")').click()
         await page.keyboard.press("Backspace")
-        await page.wait_for_timeout(2000)
+        await waits.function(page, "() => document.activeElement?.tagName === 'INPUT'", name="地理位置输入框")
         await page.keyboard.type(location)
         await page.wait_for_selector('div[role="listbox"] [role="option"]', timeout=5000)
         await page.locator('div[role="listbox"] [role="option"]').first.click()
@@ -402,18 +390,17 @@ class DouYinVideo(object):
     async def handle_product_dialog(self, page: Page, product_title: str):
         """处理商品编辑弹窗"""
 
-        await page.wait_for_timeout(2000)
-        await page.wait_for_selector('input[placeholder="请输入商品短标题"]', timeout=10000)
+        await waits.selector(page, 'input[placeholder="请输入商品短标题"]', name="商品短标题输入框", kind="dialog")
         short_title_input = page.locator('input[placeholder="请输入商品短标题"]')
         if not await short_title_input.count():
             douyin_logger.error("[-] 未找到商品短标题输入框")
             return False
         product_title = product_title[:10]
         await short_title_input.fill(product_title)
-        # 等待一下让界面响应
-        await page.wait_for_timeout(1000)
 
         finish_button = page.locator('button:has-text("完成编辑")')
+        # 等待界面响应短标题（按钮可用），超时后按原来的逻辑处理禁用状态
+        await waits.attribute(finish_button, "class", excludes="disabled", name="完成编辑按钮可用", required=False)
         if 'disabled' not in await finish_button.get_attribute('class'):
             await finish_button.click()
             douyin_logger.debug("[+] 成功点击'完成编辑'按钮")
@@ -437,10 +424,9 @@ class DouYinVideo(object):
         
     async def set_product_link(self, page: Page, product_link: str, product_title: str):
         """设置商品链接功能"""
-        await page.wait_for_timeout(2000)  # 等待2秒
         try:
             # 定位"添加标签"文本，然后向上导航到容器，再找到下拉框
-            await page.wait_for_selector('text=添加标签', timeout=10000)
+            await waits.selector(page, 'text=添加标签', name="添加标签", kind="dialog")
             dropdown = page.get_by_text('添加标签').locator("..").locator("..").locator("..").locator(".semi-select").first
             if not await dropdown.count():
                 douyin_logger.error("[-] 未找到标签下拉框")
@@ -471,8 +457,9 @@ class DouYinVideo(object):
             await add_button.click()
             douyin_logger.debug("[+] 成功点击'添加链接'按钮")
             ## 如果链接不可用
-            await page.wait_for_timeout(2000)
             error_modal = page.locator('text=未搜索到对应商品')
+            await waits.locator(error_modal.or_(page.locator('input[placeholder="请输入商品短标题"]')),
+                                name="商品链接校验结果", kind="dialog", required=False)
             if await error_modal.count():
                 confirm_button = page.locator('button:has-text("确定")')
                 await confirm_button.click()
@@ -491,22 +478,7 @@ class DouYinVideo(object):
             douyin_logger.error(f"[-] 设置商品链接时出错: {str(e)}")
             return False
 
-    async def locate_first_visible(self, page: Page, selectors, timeout=5000):
-        """
-        Try selectors sequentially and return the first visible locator.
-        """
-        for selector in selectors:
-            locator = page.locator(selector).first
-            if not await locator.count():
-                continue
-            try:
-                await locator.wait_for(state="visible", timeout=timeout)
-                return locator
-            except PlaywrightTimeoutError:
-                continue
-        return None
-
     async def main(self):
-        async with async_playwright() as playwright:
+        async with shared_playwright() as playwright:
             await self.upload(playwright)
 
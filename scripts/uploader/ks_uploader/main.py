@@ -1,25 +1,31 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import Page, Playwright
 import os
 import asyncio
 
 from conf import LOCAL_CHROME_PATH
-from utils.base_social_media import set_init_script
+from utils.state_persistence import save_storage_state
+from utils.base_social_media import SOCIAL_MEDIA_KUAISHOU, goto_upload_page, set_init_script
 from utils.files_times import get_absolute_path
 from utils.log import kuaishou_logger
 from utils.browser_setup import get_browser_context, handle_permissions_dialog, wait_for_video_preview
+from utils.playwright_runtime import shared_playwright
+from utils.page_waits import PageWaits
+from utils.text_entry import TextEntry
+from utils.upload_pipeline import UploadPipeline
+from utils.upload_progress import track_upload
+from utils.upload_status import wait_for_upload
+from utils.warm_pool import upload_context, warm_pool
+
+waits = PageWaits(SOCIAL_MEDIA_KUAISHOU, kuaishou_logger)
+text_entry = TextEntry(SOCIAL_MEDIA_KUAISHOU, kuaishou_logger)
 
 
 async def cookie_auth(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
+    async with shared_playwright() as playwright, \
+            upload_context(playwright, SOCIAL_MEDIA_KUAISHOU, account_file, headless=True) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -45,7 +51,7 @@ async def ks_setup(account_file, handle=False):
 
 
 async def get_ks_cookie(account_file):
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB'
@@ -64,7 +70,9 @@ async def get_ks_cookie(account_file):
         await page.goto("https://cp.kuaishou.com")
         await page.pause()
         # 点击调试器的继续，保存cookie
-        await context.storage_state(path=account_file)
+        await save_storage_state(context, account_file)
+        await context.close()
+        await browser.close()
 
 
 class KSVideo(object):
@@ -81,24 +89,16 @@ class KSVideo(object):
         kuaishou_logger.error("视频出错了，重新上传中")
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        print(self.local_executable_path)
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=False,
-                executable_path=self.local_executable_path,
-            )
-        else:
-            browser = await playwright.chromium.launch(
-                headless=False
-            )  # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
+    async def upload(self, playwright: Playwright, verify_login: bool = False) -> None:
+        # 从预热池获取页面（已预热时页面已经停在上传页，浏览器来自浏览器池）
+        async with warm_pool.page(playwright, SOCIAL_MEDIA_KUAISHOU, self.account_file,
+                                  verify_login=verify_login) as page:
+            await self.upload_on_page(page)
+
+    async def upload_on_page(self, page: Page) -> None:
+        context = page.context
         # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
+        await goto_upload_page(page, SOCIAL_MEDIA_KUAISHOU)
         kuaishou_logger.info('正在上传-------{}.mp4'.format(self.title))
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         kuaishou_logger.info('正在打开主页...')
@@ -110,15 +110,29 @@ class KSVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await upload_button.click()
         file_chooser = await fc_info.value
+        await track_upload(page, SOCIAL_MEDIA_KUAISHOU, self.file_path, log=kuaishou_logger)
         await file_chooser.set_files(self.file_path)
 
-        await asyncio.sleep(2)
+        # 等待编辑页面的描述输入框出现
+        description_editor = page.get_by_text("描述").locator("xpath=following-sibling::div")
+        await waits.locator(description_editor, name="描述输入框", kind="navigation")
 
         # if not await page.get_by_text("封面编辑").count():
         #     raise Exception("似乎没有跳转到到编辑页面")
 
-        await asyncio.sleep(1)
+        # 标题、话题、定时在视频上传的同时填写，上传完成后发布
+        pipeline = UploadPipeline(SOCIAL_MEDIA_KUAISHOU, kuaishou_logger)
+        pipeline.add("metadata", self.fill_title_and_tags)
+        pipeline.add("upload", self.wait_for_video_uploaded, ui=False)
+        if self.publish_date != 0:
+            pipeline.add("schedule", lambda page: self.set_schedule_time(page, self.publish_date))
+        pipeline.add("publish", self.click_publish, after="*")
+        await pipeline.run(page)
 
+        await save_storage_state(context, self.account_file, debounce=True)  # 保存cookie
+        kuaishou_logger.info('cookie更新完毕！')
+
+    async def fill_title_and_tags(self, page: Page):
         # 等待按钮可交互
         new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
         if await new_feature_button.count() > 0:
@@ -131,42 +145,21 @@ class KSVideo(object):
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.press("Delete")
         kuaishou_logger.info("filling new  title")
-        await page.keyboard.type(self.title)
+        await text_entry.insert(page, self.title)
         await page.keyboard.press("Enter")
 
         # 快手只能添加3个话题
-        for index, tag in enumerate(self.tags[:3], start=1):
-            kuaishou_logger.info("正在添加第%s个话题" % index)
-            await page.keyboard.type(f"#{tag} ")
-            await asyncio.sleep(2)
-
-        max_retries = 60  # 设置最大重试次数,最大等待时间为 2 分钟
-        retry_count = 0
-
-        while retry_count < max_retries:
-            try:
-                # 获取包含 '上传中' 文本的元素数量
-                number = await page.locator("text=上传中").count()
-
-                if number == 0:
-                    kuaishou_logger.success("视频上传完毕")
-                    break
-                else:
-                    if retry_count % 5 == 0:
-                        kuaishou_logger.info("正在上传视频中...")
-                    await asyncio.sleep(2)
-            except Exception as e:
-                kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
-                await asyncio.sleep(2)  # 等待 2 秒后重试
-            retry_count += 1
+        count = await text_entry.add_tags(page, self.tags[:3])
+        kuaishou_logger.info("成功添加%s个话题" % count)
 
-        if retry_count == max_retries:
-            kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
-
-        # 定时任务
-        if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
+    async def wait_for_video_uploaded(self, page: Page):
+        # 先等"上传中"出现，避免上传进度还没渲染时误判为已完成
+        await waits.selector(page, "text=上传中", state="attached", name="上传进度", required=False)
+        # 页面上不再有"上传中"即上传完毕，最多等待 2 分钟
+        if not await wait_for_upload(page, SOCIAL_MEDIA_KUAISHOU, log=kuaishou_logger):
+            kuaishou_logger.warning("等待上传超时，视频上传可能未完成。")
 
+    async def click_publish(self, page: Page):
         # 判断视频是否发布成功
         while True:
             try:
@@ -191,15 +184,8 @@ class KSVideo(object):
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(1)
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        kuaishou_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
-
     async def main(self):
-        async with async_playwright() as playwright:
+        async with shared_playwright() as playwright:
             await self.upload(playwright)
 
     async def set_schedule_time(self, page, publish_date):
@@ -207,12 +193,15 @@ class KSVideo(object):
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M:%S")
         await page.locator("label:text('发布时间')").locator('xpath=following-sibling::div').locator(
             '.ant-radio-input').nth(1).click()
-        await asyncio.sleep(1)
 
-        await page.locator('div.ant-picker-input input[placeholder="选择日期时间"]').click()
-        await asyncio.sleep(1)
+        date_input = page.locator('div.ant-picker-input input[placeholder="选择日期时间"]')
+        await waits.locator(date_input, name="发布时间输入框")
+        await date_input.click()
+        await waits.selector(page, "div.ant-picker-dropdown", name="日期选择面板")
 
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
-        await asyncio.sleep(1)
+        await waits.function(page, "([selector, value]) => document.querySelector(selector)?.value === value",
+                             ['div.ant-picker-input input[placeholder="选择日期时间"]', publish_date_hour],
+                             name="发布时间生效", required=False)
@@ -1,15 +1,26 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import Page, Playwright
 import os
 import asyncio
 
 from conf import LOCAL_CHROME_PATH
-from utils.base_social_media import set_init_script
+from utils.state_persistence import save_storage_state
+from utils.base_social_media import SOCIAL_MEDIA_TENCENT, goto_upload_page, set_init_script
 from utils.files_times import get_absolute_path
 from utils.log import tencent_logger
 from utils.browser_setup import get_browser_context, handle_permissions_dialog, wait_for_video_preview
+from utils.playwright_runtime import shared_playwright
+from utils.page_waits import PageWaits
+from utils.text_entry import TextEntry
+from utils.upload_pipeline import UploadPipeline
+from utils.upload_progress import track_upload
+from utils.upload_status import wait_for_upload
+from utils.warm_pool import upload_context, warm_pool
+
+waits = PageWaits(SOCIAL_MEDIA_TENCENT, tencent_logger)
+text_entry = TextEntry(SOCIAL_MEDIA_TENCENT, tencent_logger)
 
 
 def format_str_for_short_title(origin_title: str) -> str:
@@ -33,13 +44,8 @@ def format_str_for_short_title(origin_title: str) -> str:
 
 
 async def cookie_auth(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
+    async with shared_playwright() as playwright, \
+            upload_context(playwright, SOCIAL_MEDIA_TENCENT, account_file, headless=True) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -54,7 +60,7 @@ async def cookie_auth(account_file):
 
 
 async def get_tencent_cookie(account_file):
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB'
@@ -73,7 +79,9 @@ async def get_tencent_cookie(account_file):
         await page.goto("https://channels.weixin.qq.com")
         await page.pause()
         # 点击调试器的继续，保存cookie
-        await context.storage_state(path=account_file)
+        await save_storage_state(context, account_file)
+        await context.close()
+        await browser.close()
 
 
 async def weixin_setup(account_file, handle=False):
@@ -139,46 +147,45 @@ class TencentVideo(object):
         file_input = page.locator('input[type="file"]')
         await file_input.set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium (这里使用系统内浏览器，用chromium 会造成h264错误
-        browser = await playwright.chromium.launch(headless=False, executable_path=self.local_executable_path)
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
+    async def upload(self, playwright: Playwright, verify_login: bool = False) -> None:
+        # 从预热池获取页面（已预热时页面已经停在上传页，浏览器来自浏览器池）
+        async with warm_pool.page(playwright, SOCIAL_MEDIA_TENCENT, self.account_file,
+                                  verify_login=verify_login) as page:
+            await self.upload_on_page(page)
 
-        # 创建一个新的页面
-        page = await context.new_page()
+    async def upload_on_page(self, page: Page) -> None:
+        context = page.context
         # 访问指定的 URL
-        await page.goto("https://channels.weixin.qq.com/platform/post/create")
+        await goto_upload_page(page, SOCIAL_MEDIA_TENCENT)
         tencent_logger.info(f'[+]正在上传-------{self.title}.mp4')
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         await page.wait_for_url("https://channels.weixin.qq.com/platform/post/create")
         # await page.wait_for_selector('input[type="file"]', timeout=10000)
         file_input = page.locator('input[type="file"]')
+        await track_upload(page, SOCIAL_MEDIA_TENCENT, self.file_path, log=tencent_logger)
         await file_input.set_input_files(self.file_path)
+        # 标题、合集、原创、定时、短标题在视频上传的同时填写，上传完成后发表
+        pipeline = UploadPipeline(SOCIAL_MEDIA_TENCENT, tencent_logger)
         # 填充标题和话题
-        await self.add_title_tags(page)
+        pipeline.add("metadata", self.add_title_tags)
         # 添加商品
-        # await self.add_product(page)
+        # pipeline.add("product", self.add_product)
         # 合集功能
-        await self.add_collection(page)
+        pipeline.add("collection", self.add_collection)
         # 原创选择
-        await self.add_original(page)
+        pipeline.add("original", self.add_original)
         # 检测上传状态
-        await self.detect_upload_status(page)
+        on_failed = pipeline.exclusive(self.handle_upload_error)
+        pipeline.add("upload", lambda page: self.detect_upload_status(page, on_failed), ui=False)
         if self.publish_date != 0:
-            await self.set_schedule_time_tencent(page, self.publish_date)
+            pipeline.add("schedule", lambda page: self.set_schedule_time_tencent(page, self.publish_date))
         # 添加短标题
-        await self.add_short_title(page)
-
-        await self.click_publish(page)
+        pipeline.add("short_title", self.add_short_title)
+        pipeline.add("publish", self.click_publish, after="*")
+        await pipeline.run(page)
 
-        await context.storage_state(path=f"{self.account_file}")  # 保存cookie
+        await save_storage_state(context, self.account_file, debounce=True)  # 保存cookie
         tencent_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
 
     async def add_short_title(self, page):
         short_title_element = page.get_by_text("短标题", exact=True).locator("..").locator(
@@ -207,35 +214,17 @@ class TencentVideo(object):
                     tencent_logger.info("  [-] 视频正在发布中...")
                     await asyncio.sleep(0.5)
 
-    async def detect_upload_status(self, page):
-        while True:
-            # 匹配删除按钮，代表视频上传完毕，如果不存在，代表视频正在上传，则等待
-            try:
-                # 匹配删除按钮，代表视频上传完毕
-                if "weui-desktop-btn_disabled" not in await page.get_by_role("button", name="发表").get_attribute(
-                        'class'):
-                    tencent_logger.info("  [-]视频上传完毕")
-                    break
-                else:
-                    tencent_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-                    # 出错了视频出错
-                    if await page.locator('div.status-msg.error').count() and await page.locator(
-                            'div.media-status-content div.tag-inner:has-text("删除")').count():
-                        tencent_logger.error("  [-] 发现上传出错了...准备重试")
-                        await self.handle_upload_error(page)
-            except:
-                tencent_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+    async def detect_upload_status(self, page, on_failed=None):
+        # "发表"按钮可用代表视频上传完毕，出现错误提示时重新上传
+        await wait_for_upload(page, SOCIAL_MEDIA_TENCENT, on_failed=on_failed or self.handle_upload_error,
+                              log=tencent_logger)
 
     async def add_title_tags(self, page):
         await page.locator("div.input-editor").click()
-        await page.keyboard.type(self.title)
+        await text_entry.insert(page, self.title)
         await page.keyboard.press("Enter")
-        for index, tag in enumerate(self.tags, start=1):
-            await page.keyboard.type("#" + tag)
-            await page.keyboard.press("Space")
-        tencent_logger.info(f"成功添加hashtag: {len(self.tags)}")
+        count = await text_entry.add_tags(page, self.tags)
+        tencent_logger.info(f"成功添加hashtag: {count}")
 
     async def add_collection(self, page):
         collection_elements = page.get_by_text("添加到合集").locator("xpath=following-sibling::div").locator(
@@ -264,10 +253,11 @@ class TencentVideo(object):
                 await page.locator('div.form-content:visible').click()  # 下拉菜单
                 await page.locator(
                     f'div.form-content:visible ul.weui-desktop-dropdown__list li.weui-desktop-dropdown__list-ele:has-text("{self.category}")').first.click()
-                await page.wait_for_timeout(1000)
+                await waits.selector(page, 'ul.weui-desktop-dropdown__list li.weui-desktop-dropdown__list-ele',
+                                     state="hidden", name="原创类型下拉框关闭", required=False)
             if await page.locator('button:has-text("声明原创"):visible').count():
                 await page.locator('button:has-text("声明原创"):visible').click()
 
     async def main(self):
-        async with async_playwright() as playwright:
+        async with shared_playwright() as playwright:
             await self.upload(playwright)
@@ -2,26 +2,37 @@
 import re
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import Page, Playwright
 import os
 import asyncio
 from uploader.tk_uploader.tk_config import Tk_Locator
-from utils.base_social_media import set_init_script
+from utils.state_persistence import save_storage_state
+from utils.base_social_media import SOCIAL_MEDIA_TIKTOK, goto_upload_page, set_init_script
 from utils.files_times import get_absolute_path
 from utils.log import tiktok_logger
 from utils.browser_setup import get_browser_context, handle_permissions_dialog, wait_for_video_preview
+from utils.playwright_runtime import shared_playwright
+from utils.page_waits import PageWaits
+from utils.text_entry import TextEntry
+from utils.upload_pipeline import UploadPipeline
+from utils.upload_progress import track_upload
+from utils.upload_status import wait_for_upload
+from utils.warm_pool import upload_context, warm_pool
+
+waits = PageWaits(SOCIAL_MEDIA_TIKTOK, tiktok_logger)
+text_entry = TextEntry(SOCIAL_MEDIA_TIKTOK, tiktok_logger)
 
 
 async def cookie_auth(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.firefox.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
+    async with shared_playwright() as playwright, \
+            upload_context(playwright, SOCIAL_MEDIA_TIKTOK, account_file, headless=True) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
         await page.goto("https://www.tiktok.com/tiktokstudio/upload?lang=en")
-        await page.wait_for_load_state('networkidle')
+        # 等待登录表单或上传区域出现（代替 networkidle）
+        await waits.locator(page.locator(Tk_Locator.login_form).or_(page.locator(Tk_Locator.upload_surface)),
+                            name="登录表单或上传区域", kind="navigation", required=False)
         try:
             # 选择所有的 select 元素
             select_elements = await page.query_selector_all('select')
@@ -49,7 +60,7 @@ async def tiktok_setup(account_file, handle=False):
 
 
 async def get_tiktok_cookie(account_file):
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB',
@@ -66,7 +77,9 @@ async def get_tiktok_cookie(account_file):
         await page.goto("https://www.tiktok.com/login?lang=en")
         await page.pause()
         # 点击调试器的继续，保存cookie
-        await context.storage_state(path=account_file)
+        await save_storage_state(context, account_file)
+        await context.close()
+        await browser.close()
 
 
 class TiktokVideo(object):
@@ -122,11 +135,12 @@ class TiktokVideo(object):
 
         # pick hour first
         await self.locator_base.locator(hour_selector).click()
-        # click time button again
-        # 等待某个特定的元素出现或状态变化，表明UI已更新
-        await page.wait_for_timeout(1000)  # 等待500毫秒
+        # 选完小时后时间选择器会收起，等它收起后再重新打开
+        await waits.selector(self.locator_base, "span.tiktok-timepicker-left", state="hidden",
+                             name="时间选择器收起", required=False)
         await scheduled_picker.locator('div.TUXInputBox').nth(0).click()
         # pick minutes after
+        await waits.selector(self.locator_base, minute_selector, name="分钟选项")
         await self.locator_base.locator(minute_selector).click()
 
         # click title to remove the focus.
@@ -140,13 +154,15 @@ class TiktokVideo(object):
         file_chooser = await fc_info.value
         await file_chooser.set_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.firefox.launch(headless=False)
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
-        page = await context.new_page()
+    async def upload(self, playwright: Playwright, verify_login: bool = False) -> None:
+        # get a page from the warm pool (already on the upload page if pre-warmed)
+        async with warm_pool.page(playwright, SOCIAL_MEDIA_TIKTOK, self.account_file,
+                                  verify_login=verify_login) as page:
+            await self.upload_on_page(page)
 
-        await page.goto("https://www.tiktok.com/creator-center/upload")
+    async def upload_on_page(self, page: Page) -> None:
+        context = page.context
+        await goto_upload_page(page, SOCIAL_MEDIA_TIKTOK)
         tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
 
         await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=10000)
@@ -166,22 +182,22 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await upload_button.click()
         file_chooser = await fc_info.value
+        await track_upload(page, SOCIAL_MEDIA_TIKTOK, self.file_path, log=tiktok_logger)
         await file_chooser.set_files(self.file_path)
 
-        await self.add_title_tags(page)
+        # fill in caption and schedule while the video is still uploading, post once it is done
+        pipeline = UploadPipeline(SOCIAL_MEDIA_TIKTOK, tiktok_logger)
+        pipeline.add("metadata", self.add_title_tags)
         # detact upload status
-        await self.detect_upload_status(page)
+        on_failed = pipeline.exclusive(self.handle_upload_error)
+        pipeline.add("upload", lambda page: self.detect_upload_status(page, on_failed), ui=False)
         if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
+            pipeline.add("schedule", lambda page: self.set_schedule_time(page, self.publish_date))
+        pipeline.add("publish", self.click_publish, after="*")
+        await pipeline.run(page)
 
-        await self.click_publish(page)
-
-        await context.storage_state(path=f"{self.account_file}")  # save cookie
+        await save_storage_state(context, self.account_file, debounce=True)  # save cookie
         tiktok_logger.info('  [-] update cookie！')
-        await asyncio.sleep(2)  # close delay for look the video status
-        # close all
-        await context.close()
-        await browser.close()
 
     async def add_title_tags(self, page):
 
@@ -196,25 +212,14 @@ class TiktokVideo(object):
 
         await page.keyboard.press("End")
 
-        await page.wait_for_timeout(1000)  # 等待1秒
-
-        await page.keyboard.insert_text(self.title)
-        await page.wait_for_timeout(1000)  # 等待1秒
+        await text_entry.insert(page, self.title)
         await page.keyboard.press("End")
 
         await page.keyboard.press("Enter")
 
-        # tag part
-        for index, tag in enumerate(self.tags, start=1):
-            tiktok_logger.info("Setting the %s tag" % index)
-            await page.keyboard.press("End")
-            await page.wait_for_timeout(1000)  # 等待1秒
-            await page.keyboard.insert_text("#" + tag + " ")
-            await page.keyboard.press("Space")
-            await page.wait_for_timeout(1000)  # 等待1秒
-
-            await page.keyboard.press("Backspace")
-            await page.keyboard.press("End")
+        # tag part: each tag waits only for the hashtag suggestion popup to settle
+        count = await text_entry.add_tags(page, self.tags)
+        tiktok_logger.info("Added %s tags" % count)
 
     async def click_publish(self, page):
         success_flag_div = '#\\:r9\\:'
@@ -237,21 +242,10 @@ class TiktokVideo(object):
                     await page.screenshot(full_page=True)
                     await asyncio.sleep(0.5)
 
-    async def detect_upload_status(self, page):
-        while True:
-            try:
-                if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
-                    tiktok_logger.info("  [-]video uploaded.")
-                    break
-                else:
-                    tiktok_logger.info("  [-] video uploading...")
-                    await asyncio.sleep(2)
-                    if await self.locator_base.locator('button[aria-label="Select file"]').count():
-                        tiktok_logger.info("  [-] found some error while uploading now retry...")
-                        await self.handle_upload_error(page)
-            except:
-                tiktok_logger.info("  [-] video uploading...")
-                await asyncio.sleep(2)
+    async def detect_upload_status(self, page, on_failed=None):
+        # Post button enabled means uploaded; the "Select file" button shows up again on errors
+        await wait_for_upload(page, SOCIAL_MEDIA_TIKTOK, on_failed=on_failed or self.handle_upload_error,
+                              log=tiktok_logger)
 
     async def choose_base_locator(self, page):
         # await page.wait_for_selector('div.upload-container')
@@ -261,6 +255,6 @@ class TiktokVideo(object):
             self.locator_base = page.locator(Tk_Locator.default) 
 
     async def main(self):
-        async with async_playwright() as playwright:
+        async with shared_playwright() as playwright:
             await self.upload(playwright)
 
@@ -10,9 +10,19 @@ import asyncio
 
 from conf import LOCAL_CHROME_PATH, USE_CDP_CHROME, CHROME_CDP_URL, LOCAL_CHROME_USER_DATA_DIR
 from uploader.tk_uploader.tk_config import Tk_Locator
+from utils.state_persistence import save_storage_state
 from utils.base_social_media import set_init_script
 from utils.files_times import get_absolute_path
 from utils.log import tiktok_logger
+from utils.locator_race import first_visible
+from utils.page_waits import PageWaits
+from utils.text_entry import TextEntry
+from utils.upload_pipeline import UploadPipeline
+from utils.upload_progress import track_upload
+from utils.upload_status import wait_for_upload
+
+waits = PageWaits("tiktok", tiktok_logger)
+text_entry = TextEntry("tiktok", tiktok_logger)
 
 
 async def cookie_auth(account_file):
@@ -27,7 +37,9 @@ async def cookie_auth(account_file):
         page = await context.new_page()
         # 访问指定的 URL
         await page.goto("https://www.tiktok.com/tiktokstudio/upload?lang=en")
-        await page.wait_for_load_state('networkidle')
+        # 等待登录表单或上传区域出现（代替 networkidle）
+        await waits.locator(page.locator(Tk_Locator.login_form).or_(page.locator(Tk_Locator.upload_surface)),
+                            name="登录表单或上传区域", kind="navigation", required=False)
         try:
             # 选择所有的 select 元素
             select_elements = await page.query_selector_all('select')
@@ -74,7 +86,7 @@ async def get_tiktok_cookie(account_file):
         await page.goto("https://www.tiktok.com/login?lang=en")
         await page.pause()
         # 点击调试器的继续，保存cookie
-        await context.storage_state(path=account_file)
+        await save_storage_state(context, account_file)
 
 
 class TiktokVideo(object):
@@ -135,11 +147,10 @@ class TiktokVideo(object):
         minute_selector = f"span.tiktok-timepicker-right:has-text('{minute_str}')"
 
         # pick hour first
-        await page.wait_for_timeout(1000)  # 等待500毫秒
+        await waits.selector(self.locator_base, hour_selector, name="小时选项")
         await self.locator_base.locator(hour_selector).click()
-        # click time button again
-        await page.wait_for_timeout(1000)  # 等待500毫秒
         # pick minutes after
+        await waits.selector(self.locator_base, minute_selector, name="分钟选项")
         await self.locator_base.locator(minute_selector).click()
 
         # click title to remove the focus.
@@ -197,10 +208,6 @@ class TiktokVideo(object):
 
         await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=20000)
 
-        # 等待页面加载完成
-        await page.wait_for_load_state('networkidle', timeout=30000)
-        tiktok_logger.info("Page load state: networkidle")
-
         try:
             await self.wait_for_upload_surface(page)
         except Exception as exc:
@@ -210,9 +217,6 @@ class TiktokVideo(object):
 
         await self.choose_base_locator(page)
 
-        # 添加额外延迟确保页面完全加载
-        await page.wait_for_timeout(2000)
-
         upload_button = self.locator_base.locator(
             'button:has-text("Select video"):visible')
 
@@ -238,25 +242,28 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await upload_button.click()
         file_chooser = await fc_info.value
+        await track_upload(page, "tiktok_studio", self.file_path, log=tiktok_logger)
         await file_chooser.set_files(self.file_path)
 
-        await self.add_title_tags(page)
+        # caption, AI flag and schedule go in while the video is uploading; the cover editor
+        # is built from the uploaded video, so the cover waits for the upload
+        pipeline = UploadPipeline("tiktok", tiktok_logger)
+        pipeline.add("metadata", self.add_title_tags)
         # detect upload status
-        await self.detect_upload_status(page)
+        on_failed = pipeline.exclusive(self.handle_upload_error)
+        pipeline.add("upload", lambda page: self.detect_upload_status(page, on_failed), ui=False)
+        pipeline.add("modal", lambda page: self.ensure_modal_closed(page, wait_seconds=5), after=["upload"])
         if self.thumbnail_path:
-            tiktok_logger.info(f'[+] Uploading thumbnail file {self.title}.png')
-            await self.upload_thumbnails(page)
-        await self.configure_ai_generated_flag(page)
-
+            pipeline.add("cover", self.upload_cover, after=["modal"])
+        pipeline.add("ai_flag", self.configure_ai_generated_flag)
         if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
-
-        await self.click_publish(page)
+            pipeline.add("schedule", lambda page: self.set_schedule_time(page, self.publish_date))
+        pipeline.add("publish", self.click_publish, after="*")
+        await pipeline.run(page)
         tiktok_logger.success(f"video_id: {await self.get_last_video_id(page)}")
 
-        await context.storage_state(path=f"{self.account_file}")
+        await save_storage_state(context, self.account_file, debounce=True)
         tiktok_logger.info('  [-] update cookie！')
-        await asyncio.sleep(2)  # close delay for look the video status
         # close all
         try:
             await context.close()
@@ -280,25 +287,18 @@ class TiktokVideo(object):
 
         await page.keyboard.press("End")
 
-        await page.wait_for_timeout(1000)  # 等待1秒
-
-        await page.keyboard.insert_text(self.title)
-        await page.wait_for_timeout(1000)  # 等待1秒
+        await text_entry.insert(page, self.title)
         await page.keyboard.press("End")
 
         await page.keyboard.press("Enter")
 
-        # tag part
-        for index, tag in enumerate(self.tags, start=1):
-            tiktok_logger.info("Setting the %s tag" % index)
-            await page.keyboard.press("End")
-            await page.wait_for_timeout(1000)  # 等待1秒
-            await page.keyboard.insert_text("#" + tag + " ")
-            await page.keyboard.press("Space")
-            await page.wait_for_timeout(1000)  # 等待1秒
+        # tag part: each tag waits only for the hashtag suggestion popup to settle
+        count = await text_entry.add_tags(page, self.tags)
+        tiktok_logger.info("Added %s tags" % count)
 
-            await page.keyboard.press("Backspace")
-            await page.keyboard.press("End")
+    async def upload_cover(self, page):
+        tiktok_logger.info(f'[+] Uploading thumbnail file {self.title}.png')
+        await self.upload_thumbnails(page)
 
     async def upload_thumbnails(self, page):
         await self.locator_base.locator(".cover-container").click()
@@ -307,9 +307,10 @@ class TiktokVideo(object):
             await self.locator_base.locator(".upload-image-upload-area").click()
             file_chooser = await fc_info.value
             await file_chooser.set_files(self.thumbnail_path)
-        await self.locator_base.locator('div.cover-edit-panel:not(.hide-panel)').get_by_role(
-            "button", name="Confirm").click()
-        await page.wait_for_timeout(3000)  # wait 3s, fix it later
+        cover_panel = self.locator_base.locator('div.cover-edit-panel:not(.hide-panel)')
+        await cover_panel.get_by_role("button", name="Confirm").click()
+        # the panel gets the hide-panel class once the cover is applied
+        await waits.locator(cover_panel, state="hidden", name="cover panel closed", kind="dialog", required=False)
 
     async def configure_ai_generated_flag(self, page):
         if self.is_ai_content is None:
@@ -341,11 +342,8 @@ class TiktokVideo(object):
             tiktok_logger.warning("[+] show-more button for advanced settings not found")
             return False
         await toggle.click()
-        for _ in range(5):
-            await page.wait_for_timeout(200)
-            class_attr = (await container.first.get_attribute("class") or "").lower()
-            if "collapsed" not in class_attr:
-                return True
+        if await waits.attribute(container, "class", excludes="collapsed", name="高级设置展开", required=False):
+            return True
         tiktok_logger.warning("[+] advanced settings still collapsed after clicking show more")
         return False
 
@@ -376,7 +374,12 @@ class TiktokVideo(object):
         if current_state == enable_flag or not await switch_root.count():
             return
         await switch_root.click()
-        await page.wait_for_timeout(300)
+        # 开关切换到目标状态，或者弹出确认框（确认后才切换）
+        expected_state = 'checked' if enable_flag else 'unchecked'
+        switched = container.locator(f'[data-state="{expected_state}"], '
+                                     f'[role="switch"][aria-checked="{str(enable_flag).lower()}"]')
+        await waits.locator(switched.or_(page.locator('.TUXModal')), name="AI 内容开关状态",
+                            required=False)
 
         # 处理AI内容确认模态框
         await self.handle_ai_content_modal(page, enable_flag)
@@ -413,7 +416,6 @@ class TiktokVideo(object):
                 if await turn_on_button.count():
                     await turn_on_button.click()
                     tiktok_logger.success("[+] Clicked 'Turn on' button in AI content modal")
-                    await page.wait_for_timeout(500)
                 else:
                     tiktok_logger.warning("[+] 'Turn on' button not found in modal")
             else:
@@ -427,15 +429,13 @@ class TiktokVideo(object):
                 if await not_now_button.count():
                     await not_now_button.click()
                     tiktok_logger.info("[+] Clicked 'Not now' button in AI content modal")
-                    await page.wait_for_timeout(500)
                 else:
                     tiktok_logger.warning("[+] 'Not now' button not found in modal")
 
             # 等待模态框消失
-            try:
-                await modal.wait_for(state='hidden', timeout=3000)
+            if await waits.locator(modal, state="hidden", name="AI 内容确认框关闭", kind="dialog", required=False):
                 tiktok_logger.success("[+] AI content modal closed successfully")
-            except Exception:
+            else:
                 tiktok_logger.warning("[+] Modal did not close within timeout")
 
         except Exception as exc:
@@ -588,26 +588,10 @@ class TiktokVideo(object):
             return video_id
 
 
-    async def detect_upload_status(self, page):
-        while True:
-            try:
-                # if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
-                if await self.locator_base.locator(
-                        'div.button-group > button >> text=Post').get_attribute("disabled") is None:
-                    tiktok_logger.info("  [-]video uploaded.")
-                    await self.ensure_modal_closed(page, wait_seconds=5)
-                    break
-                else:
-                    tiktok_logger.info("  [-] video uploading...")
-                    await asyncio.sleep(2)
-                    if await self.locator_base.locator(
-                            'button[aria-label="Select file"]').count():
-                        tiktok_logger.info("  [-] found some error while uploading now retry...")
-                        await self.handle_upload_error(page)
-                    await self.ensure_modal_closed(page, wait_seconds=2)
-            except:
-                tiktok_logger.info("  [-] video uploading...")
-                await asyncio.sleep(2)
+    async def detect_upload_status(self, page, on_failed=None):
+        # Post button enabled means uploaded; the "Select file" button shows up again on errors
+        await wait_for_upload(page, "tiktok_studio", on_failed=on_failed or self.handle_upload_error,
+                              log=tiktok_logger)
 
     async def dismiss_auto_check_modal(self, page):
         handled = False
@@ -722,9 +706,6 @@ class TiktokVideo(object):
             tiktok_logger.warning(f"Failed to save HTML snapshot: {html_error}")
 
     async def wait_for_upload_surface(self, page):
-        timeout_ms = 30000
-        poll_interval = 0.5
-        deadline = time.perf_counter() + timeout_ms / 1000
         candidate_locators = [
             ("upload iframe", page.locator('iframe[data-tt="Upload_index_iframe"]')),
             ("upload container", page.locator('div.upload-container')),
@@ -738,22 +719,12 @@ class TiktokVideo(object):
         ]
         candidate_locators.extend(button_locators)
 
-        logged_pending = set()
-        last_error = None
-        while time.perf_counter() < deadline:
-            for description, locator in candidate_locators:
-                try:
-                    if await locator.first.is_visible():
-                        tiktok_logger.info(f"{description} detected.")
-                        return
-                    if description not in logged_pending:
-                        tiktok_logger.info(f"{description} not visible yet, waiting...")
-                        logged_pending.add(description)
-                except Exception as candidate_error:
-                    last_error = candidate_error
-            await asyncio.sleep(poll_interval)
-
-        raise TimeoutError("Unable to detect any known upload containers/buttons.") from last_error
+        # wait for all candidates at once; the last detected one is preferred next time
+        surface = await first_visible(page, "tiktok", "upload surface", candidate_locators, timeout=30000,
+                                      log=tiktok_logger)
+        if surface is None:
+            raise TimeoutError("Unable to detect any known upload containers/buttons.")
+        tiktok_logger.info("Upload surface detected.")
 
     async def choose_base_locator(self, page):
         # await page.wait_for_selector('div.upload-container')
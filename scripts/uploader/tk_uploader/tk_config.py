@@ -1,4 +1,9 @@
+from utils.base_social_media import TIKTOK_LOGIN_FORM, TIKTOK_UPLOAD_SURFACE
+
 
 class Tk_Locator(object):
     tk_iframe = '[data-tt="Upload_index_iframe"]'
     default = 'body'
+    # 未登录时出现的登录表单 / 已登录时的上传区域
+    login_form = TIKTOK_LOGIN_FORM
+    upload_surface = TIKTOK_UPLOAD_SURFACE
@@ -0,0 +1,194 @@
+"""
+账号级互斥与请求合并
+并发上传时，同一账号的多个任务可能同时校验 Cookie 或同时弹出扫码登录。
+
+- SingleFlight：进程内同一个 key 同时只执行一次，并发调用方共享这一次的结果
+- AccountLocks：按 Cookie 文件加锁（进程内 asyncio 锁 + 跨进程文件锁），
+  多个进程之间的校验、登录和 storage_state 写入按账号串行
+- file_lock：同步的跨进程文件锁，用于共享缓存文件的读-改-写
+"""
+import asyncio
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+from conf import CACHE_DIR
+from .log import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock_file(fd: int) -> bool:
+    """非阻塞地获取文件锁，已被其他进程持有时返回 False"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock_file(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(lock_file, poll_interval: float = 0.01):
+    """
+    持有跨进程文件锁（同步等待，只用于读写缓存文件这类很短的临界区）
+
+    Args:
+        lock_file: 锁文件路径（不存在时创建）
+        poll_interval: 等待其他进程释放锁时的轮询间隔（秒）
+    """
+    lock_file = Path(lock_file)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        while not _try_lock_file(fd):
+            time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            _unlock_file(fd)
+    finally:
+        os.close(fd)
+
+
+class SingleFlight:
+    """进程内请求合并：同一个 key 同时只执行一次"""
+
+    def __init__(self):
+        self._inflight = {}
+        self._loop = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._inflight = {}
+
+    async def do(self, key, func):
+        """
+        执行 func()，同一个 key 已经在执行时等待并共享那一次的结果（包括异常）
+
+        Args:
+            key: 合并的键
+            func: 无参数的协程函数
+
+        Returns:
+            func() 的返回值
+        """
+        self._bind_loop()
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._loop.create_task(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key, None)
+                                   if self._inflight.get(key) is done else None)
+        else:
+            logger.info(f"[账号锁] 共享进行中的操作: {key[0]} {Path(key[1]).name}")
+        # 某个调用方被取消时不影响其他共享结果的调用方
+        return await asyncio.shield(task)
+
+
+class AccountLocks:
+    """按 Cookie 文件加锁，同一个任务内可重入"""
+
+    def __init__(self, lock_dir=None, poll_interval: float = 0.1):
+        """
+        初始化账号锁
+
+        Args:
+            lock_dir: 锁文件目录（默认 CACHE_DIR/locks）
+            poll_interval: 等待其他进程释放锁时的轮询间隔（秒）
+        """
+        self.lock_dir = Path(lock_dir) if lock_dir else CACHE_DIR / "locks"
+        self.poll_interval = poll_interval
+        self._locks = {}
+        self._owners = {}
+        self._loop = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._locks = {}
+            self._owners = {}
+
+    @staticmethod
+    def _key(cookie_path) -> str:
+        return str(Path(cookie_path).resolve())
+
+    def lock_file(self, cookie_path) -> Path:
+        """Cookie 文件对应的锁文件（放在缓存目录，不污染 cookiesFile）"""
+        digest = hashlib.sha1(self._key(cookie_path).encode("utf-8")).hexdigest()[:16]
+        return self.lock_dir / f"{digest}.lock"
+
+    async def _acquire_file(self, cookie_path) -> int:
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_file(cookie_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            start = time.monotonic()
+            warned = False
+            while not _try_lock_file(fd):
+                if not warned and time.monotonic() - start > 1:
+                    logger.info(f"[账号锁] 等待其他进程释放 {Path(cookie_path).name}")
+                    warned = True
+                await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    @asynccontextmanager
+    async def hold(self, cookie_path):
+        """
+        持有账号锁（进程内锁 + 文件锁）
+
+        Args:
+            cookie_path: Cookie 文件路径
+        """
+        self._bind_loop()
+        key = self._key(cookie_path)
+        task = asyncio.current_task()
+        owner = self._owners.get(key)
+        if owner is not None and owner[0] is task:
+            # 同一个任务内嵌套获取（例如登录时保存 Cookie）
+            self._owners[key] = (task, owner[1] + 1)
+            try:
+                yield
+            finally:
+                self._owners[key] = (task, self._owners[key][1] - 1)
+            return
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            fd = await self._acquire_file(cookie_path)
+            self._owners[key] = (task, 1)
+            try:
+                yield
+            finally:
+                del self._owners[key]
+                try:
+                    _unlock_file(fd)
+                finally:
+                    os.close(fd)
+
+
+# 全局实例
+single_flight = SingleFlight()
+account_locks = AccountLocks()
+
@@ -0,0 +1,347 @@
+"""
+账号库
+用一张 SQLite 表记录所有平台的账号：Cookie 文件路径和 storage_state 内容、登录态过期时间、
+最近一次校验 / 上传时间和状态。按 (platform, account) 主键查询，列出账号不再需要扫描目录。
+
+storage_state 在进程内按文件 mtime / 大小缓存，创建浏览器上下文时直接传入内存中的 dict，
+不需要每次重新读取、解析 JSON 文件。
+
+历史数据可以用 migrate() 导入：cookiesFile 目录中的文件、utils/login.py 写入的
+db/database.db user_info 表，以及小红书的 accounts.ini。
+"""
+import configparser
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from conf import ACCOUNTS_DB, BASE_DIR
+from .cookie_check import AUTH_COOKIES
+from .cookie_expiry import earliest_auth_expiry
+from .log import logger
+from .state_persistence import state_writer
+
+
+# 账号状态
+STATUS_ACTIVE = "active"
+STATUS_INVALID = "invalid"
+STATUS_UNKNOWN = "unknown"
+
+# utils/login.py 中 user_info.type 对应的平台
+USER_INFO_PLATFORMS = {1: "xhs", 2: "tencent", 3: "douyin", 4: "kuaishou", 5: "tiktok"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    platform TEXT NOT NULL,
+    account TEXT NOT NULL,
+    cookie_path TEXT,
+    storage_state TEXT,
+    state_mtime_ns INTEGER,
+    state_size INTEGER,
+    status TEXT NOT NULL DEFAULT 'unknown',
+    expires_at REAL,
+    last_verified REAL,
+    last_upload REAL,
+    source TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (platform, account)
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_cookie_path ON accounts(cookie_path);
+CREATE INDEX IF NOT EXISTS idx_accounts_status ON accounts(status, platform);
+CREATE INDEX IF NOT EXISTS idx_accounts_expires ON accounts(expires_at);
+"""
+
+# list_accounts 返回的列（不包含 storage_state 内容）
+_LIST_COLUMNS = ("platform", "account", "cookie_path", "status", "expires_at", "last_verified", "last_upload",
+                 "source", "updated_at")
+
+
+def cookie_string_to_state(cookie_string: str, domain: str) -> dict:
+    """把 "a=1; b=2" 形式的 Cookie 字符串转换为 storage_state"""
+    cookies = []
+    for pair in cookie_string.split(";"):
+        name, sep, value = pair.strip().partition("=")
+        if sep and name:
+            cookies.append({"name": name, "value": value, "domain": domain, "path": "/", "expires": -1,
+                            "httpOnly": False, "secure": False, "sameSite": "Lax"})
+    return {"cookies": cookies, "origins": []}
+
+
+class AccountStore:
+    """账号库"""
+
+    def __init__(self, db_path=ACCOUNTS_DB, max_states: int = 512):
+        """
+        初始化账号库（第一次使用时才打开数据库）
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            max_states: 内存中最多缓存的 storage_state 数量（LRU）
+        """
+        self.db_path = Path(db_path)
+        self.max_states = max_states
+        self._conn = None
+        self._states = OrderedDict()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---------------------------------------------------------------- 读写
+
+    def upsert(self, platform: str, account: str, cookie_path=None, state: dict = None, status: str = None,
+               source: str = None):
+        """
+        新增或更新账号；传入 cookie_path 时同时读取文件，记录 storage_state 内容和过期时间
+
+        Args:
+            platform: 平台名称
+            account: 账号名称
+            cookie_path: Cookie 文件路径
+            state: storage_state 内容（不传则从 cookie_path 读取）
+            status: 账号状态（不传则保留原状态）
+            source: 数据来源（cookies_file / user_info / accounts_ini / login 等）
+        """
+        now = time.time()
+        mtime_ns = size = None
+        if cookie_path is not None:
+            cookie_path = Path(cookie_path)
+            try:
+                stat = cookie_path.stat()
+                mtime_ns, size = stat.st_mtime_ns, stat.st_size
+                if state is None:
+                    with open(cookie_path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"[账号库] 读取 {cookie_path} 失败: {e}")
+        expires_at = earliest_auth_expiry(platform, state.get("cookies", [])) if isinstance(state, dict) else None
+        self.conn.execute(
+            """
+            INSERT INTO accounts (platform, account, cookie_path, storage_state, state_mtime_ns, state_size,
+                                  status, expires_at, source, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, 'unknown'), ?, ?, ?, ?)
+            ON CONFLICT(platform, account) DO UPDATE SET
+                cookie_path = COALESCE(excluded.cookie_path, cookie_path),
+                storage_state = COALESCE(excluded.storage_state, storage_state),
+                state_mtime_ns = COALESCE(excluded.state_mtime_ns, state_mtime_ns),
+                state_size = COALESCE(excluded.state_size, state_size),
+                status = COALESCE(?, status),
+                expires_at = COALESCE(excluded.expires_at, expires_at),
+                source = COALESCE(excluded.source, source),
+                updated_at = excluded.updated_at
+            """,
+            (platform, account, str(cookie_path) if cookie_path is not None else None,
+             json.dumps(state, ensure_ascii=False) if state is not None else None, mtime_ns, size,
+             status, expires_at, source, now, now, status),
+        )
+
+    def get(self, platform: str, account: str) -> dict:
+        """查询单个账号（不包含 storage_state 内容），不存在时返回 None"""
+        row = self.conn.execute(f"SELECT {', '.join(_LIST_COLUMNS)} FROM accounts WHERE platform = ? AND account = ?",
+                                (platform, account)).fetchone()
+        return dict(row) if row else None
+
+    def list_accounts(self, platform: str = None, status: str = None) -> list:
+        """
+        列出账号（按平台、账号排序）
+
+        Args:
+            platform: 只列出该平台
+            status: 只列出该状态
+
+        Returns:
+            账号信息列表（不包含 storage_state 内容）
+        """
+        conditions, params = [], []
+        if platform is not None:
+            conditions.append("platform = ?")
+            params.append(platform)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(f"SELECT {', '.join(_LIST_COLUMNS)} FROM accounts {where} "
+                                 f"ORDER BY platform, account", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def delete(self, platform: str, account: str):
+        row = self.conn.execute("SELECT cookie_path FROM accounts WHERE platform = ? AND account = ?",
+                                (platform, account)).fetchone()
+        if row and row["cookie_path"]:
+            self._states.pop(row["cookie_path"], None)
+        self.conn.execute("DELETE FROM accounts WHERE platform = ? AND account = ?", (platform, account))
+
+    def record_verification(self, platform: str, account: str, valid: bool):
+        """记录一次明确的校验结果"""
+        now = time.time()
+        if valid:
+            self.conn.execute("UPDATE accounts SET status = ?, last_verified = ?, updated_at = ? "
+                              "WHERE platform = ? AND account = ?", (STATUS_ACTIVE, now, now, platform, account))
+        else:
+            self.conn.execute("UPDATE accounts SET status = ?, updated_at = ? WHERE platform = ? AND account = ?",
+                              (STATUS_INVALID, now, platform, account))
+
+    def record_upload(self, platform: str, account: str):
+        """记录一次成功上传（上传后保存的 storage_state 同时视为一次成功校验）"""
+        now = time.time()
+        self.conn.execute("UPDATE accounts SET status = ?, last_verified = ?, last_upload = ?, updated_at = ? "
+                          "WHERE platform = ? AND account = ?", (STATUS_ACTIVE, now, now, now, platform, account))
+
+    # ---------------------------------------------------------------- storage_state
+
+    def storage_state(self, cookie_path):
+        """
+        获取 Cookie 文件的 storage_state（dict，可直接传给 new_context）
+
+        有等待延迟写入的内容时返回该内容；文件 mtime / 大小没变时直接返回内存中的缓存；
+        内存中没有时优先使用账号库中保存的内容，都不是最新的才读取文件。返回的 dict 不要修改。
+
+        Args:
+            cookie_path: Cookie 文件路径
+
+        Returns:
+            storage_state，文件不存在时返回 None
+        """
+        pending = state_writer.pending(cookie_path)
+        if pending is not None:
+            return pending
+        cookie_path = Path(cookie_path)
+        key = str(cookie_path)
+        try:
+            stat = cookie_path.stat()
+        except OSError:
+            self._states.pop(key, None)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._states.get(key)
+        if cached is not None and cached[0] == signature:
+            self._states.move_to_end(key)
+            return cached[1]
+
+        state = None
+        row = self.conn.execute("SELECT platform, account, storage_state, state_mtime_ns, state_size "
+                                "FROM accounts WHERE cookie_path = ?", (key,)).fetchone()
+        if row and row["storage_state"] and (row["state_mtime_ns"], row["state_size"]) == signature:
+            state = json.loads(row["storage_state"])
+        else:
+            with open(cookie_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if row:
+                self.upsert(row["platform"], row["account"], cookie_path, state)
+
+        self._states[key] = (signature, state)
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
+        return state
+
+    # ---------------------------------------------------------------- 迁移
+
+    def sync_directory(self, cookies_dir) -> int:
+        """
+        同步 Cookie 目录：导入新增或变化的 platform_account.json 文件，删除文件已不存在的记录
+
+        Returns:
+            新增或更新的账号数
+        """
+        cookies_dir = Path(cookies_dir)
+        known = {row["cookie_path"]: row for row in self.conn.execute(
+            "SELECT platform, account, cookie_path, state_mtime_ns, state_size, source FROM accounts")}
+        changed = 0
+        seen = set()
+        for cookie_file in cookies_dir.glob("*.json"):
+            name = cookie_file.stem
+            if '_' not in name:
+                continue
+            platform, account = name.split('_', 1)
+            seen.add(str(cookie_file))
+            stat = cookie_file.stat()
+            row = known.get(str(cookie_file))
+            if row and (row["state_mtime_ns"], row["state_size"]) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            self.upsert(platform, account, cookie_file, source=row["source"] if row else "cookies_file")
+            changed += 1
+        for cookie_path, row in known.items():
+            if row["source"] == "cookies_file" and cookie_path and cookie_path not in seen \
+                    and Path(cookie_path).parent == cookies_dir and not Path(cookie_path).exists():
+                self.delete(row["platform"], row["account"])
+        return changed
+
+    def migrate(self, cookies_dir, legacy_db=None, accounts_ini=None) -> dict:
+        """
+        从历史存储导入账号（可重复执行）
+
+        Args:
+            cookies_dir: Cookie 文件目录（platform_account.json）
+            legacy_db: utils/login.py 使用的 db/database.db（user_info 表）
+            accounts_ini: 小红书的 accounts.ini（[账号] cookies = ...）
+
+        Returns:
+            各来源导入的账号数 {cookies_file, user_info, accounts_ini}
+        """
+        cookies_dir = Path(cookies_dir)
+        legacy_db = Path(legacy_db) if legacy_db else BASE_DIR / "db" / "database.db"
+        accounts_ini = Path(accounts_ini) if accounts_ini else \
+            BASE_DIR / "scripts" / "uploader" / "xhs_uploader" / "accounts.ini"
+        counts = {"cookies_file": self.sync_directory(cookies_dir), "user_info": 0, "accounts_ini": 0}
+
+        # utils/login.py 按 uuid 命名的 Cookie 文件，账号名记录在 user_info 表中
+        if legacy_db.exists():
+            try:
+                with sqlite3.connect(str(legacy_db)) as legacy:
+                    rows = legacy.execute("SELECT type, filePath, userName, status FROM user_info").fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"[账号库] 读取 {legacy_db} 失败: {e}")
+                rows = []
+            for platform_type, file_path, user_name, status in rows:
+                platform = USER_INFO_PLATFORMS.get(platform_type)
+                cookie_path = cookies_dir / file_path
+                if platform is None or not cookie_path.exists():
+                    continue
+                self.upsert(platform, str(user_name), cookie_path,
+                            status=STATUS_ACTIVE if status == 1 else STATUS_UNKNOWN, source="user_info")
+                counts["user_info"] += 1
+
+        # 小红书 accounts.ini 中的 Cookie 字符串，转换成 storage_state 文件
+        if accounts_ini.exists():
+            config = configparser.RawConfigParser()
+            config.read(accounts_ini, encoding="utf-8")
+            for section in config.sections():
+                cookie_string = config.get(section, "cookies", fallback="").strip()
+                if not cookie_string or cookie_string == "changeme":
+                    continue
+                state = cookie_string_to_state(cookie_string, ".xiaohongshu.com")
+                if not any(cookie["name"] in AUTH_COOKIES["xhs"] for cookie in state["cookies"]):
+                    logger.warning(f"[账号库] accounts.ini 中 {section} 的 Cookie 不包含登录信息，跳过")
+                    continue
+                cookie_path = cookies_dir / f"xhs_{section}.json"
+                if not cookie_path.exists():
+                    with open(cookie_path, "w", encoding="utf-8") as f:
+                        json.dump(state, f, ensure_ascii=False)
+                self.upsert("xhs", section, cookie_path, source="accounts_ini")
+                counts["accounts_ini"] += 1
+
+        logger.info(f"[账号库] 导入完成: Cookie 文件 {counts['cookies_file']}，user_info {counts['user_info']}，"
+                    f"accounts.ini {counts['accounts_ini']}，共 {self.count()} 个账号")
+        return counts
+
+
+# 全局账号库实例
+account_store = AccountStore()
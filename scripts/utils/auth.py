@@ -4,139 +4,127 @@ import os
 import re
 from pathlib import Path
 
-from playwright.async_api import async_playwright
 from xhs import XhsClient
 
 from conf import BASE_DIR, LOCAL_CHROME_PATH
-from utils.base_social_media import set_init_script
-from utils.log import tencent_logger, kuaishou_logger, douyin_logger
+from utils.base_social_media import TIKTOK_LOGIN_FORM, TIKTOK_UPLOAD_SURFACE, set_init_script
+from utils.browser_pool import browser_pool
+from utils.playwright_runtime import shared_playwright
+from utils.log import tencent_logger, kuaishou_logger, douyin_logger, tiktok_logger
+from utils.page_waits import PageWaits
 from uploader.xhs_uploader.main import sign_local
 
+# TikTok Cookie 校验页面的等待
+tiktok_waits = PageWaits("tiktok", tiktok_logger)
+
+def auth_context(playwright, account_file, engine="chromium"):
+    """从浏览器池获取用于 Cookie 校验的无头上下文（验证结束后只关闭上下文，浏览器留在池中复用）"""
+    executable_path = LOCAL_CHROME_PATH if engine == "chromium" else None
+    return browser_pool.context(playwright, engine, headless=True, executable_path=executable_path or None,
+                                storage_state=str(account_file))
+
+
 async def cookie_auth_douyin(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.douyin.com/creator-micro/content/upload")
-        try:
-            await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
-            # 2024.06.17 抖音创作者中心改版
-            # 判断
-            # 等待“扫码登录”元素出现，超时 5 秒（如果 5 秒没出现，说明 cookie 有效）
+    async with shared_playwright() as playwright:
+        async with auth_context(playwright, account_file) as context:
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.douyin.com/creator-micro/content/upload")
             try:
-                await page.get_by_text("扫码登录").wait_for(timeout=5000)
-                douyin_logger.error("[+] cookie 失效，需要扫码登录")
-                return False
+                await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
+                # 2024.06.17 抖音创作者中心改版
+                # 判断
+                # 等待“扫码登录”元素出现，超时 5 秒（如果 5 秒没出现，说明 cookie 有效）
+                try:
+                    await page.get_by_text("扫码登录").wait_for(timeout=5000)
+                    douyin_logger.error("[+] cookie 失效，需要扫码登录")
+                    return False
+                except:
+                    douyin_logger.success("[+]  cookie 有效")
+                    return True
             except:
-                douyin_logger.success("[+]  cookie 有效")
-                return True
-        except:
-            douyin_logger.error("[+] 等待5秒 cookie 失效")
-            await context.close()
-            await browser.close()
-            return False
+                douyin_logger.error("[+] 等待5秒 cookie 失效")
+                return False
 
 async def cookie_auth_tencent(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://channels.weixin.qq.com/platform/post/create")
-        try:
-            await page.wait_for_selector('div.title-name:has-text("微信小店")', timeout=5000)  # 等待5秒
-            tencent_logger.error("[+] 等待5秒 cookie 失效")
-            return False
-        except:
-            tencent_logger.success("[+] cookie 有效")
-            return True
+    async with shared_playwright() as playwright:
+        async with auth_context(playwright, account_file) as context:
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://channels.weixin.qq.com/platform/post/create")
+            try:
+                await page.wait_for_selector('div.title-name:has-text("微信小店")', timeout=5000)  # 等待5秒
+                tencent_logger.error("[+] 等待5秒 cookie 失效")
+                return False
+            except:
+                tencent_logger.success("[+] cookie 有效")
+                return True
 
 async def cookie_auth_ks(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
-        try:
-            await page.wait_for_selector("div.names div.container div.name:text('机构服务')", timeout=5000)  # 等待5秒
+    async with shared_playwright() as playwright:
+        async with auth_context(playwright, account_file) as context:
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://cp.kuaishou.com/article/publish/video")
+            try:
+                await page.wait_for_selector("div.names div.container div.name:text('机构服务')", timeout=5000)  # 等待5秒
 
-            kuaishou_logger.info("[+] 等待5秒 cookie 失效")
-            return False
-        except:
-            kuaishou_logger.success("[+] cookie 有效")
-            return True
+                kuaishou_logger.info("[+] 等待5秒 cookie 失效")
+                return False
+            except:
+                kuaishou_logger.success("[+] cookie 有效")
+                return True
 
 
 async def cookie_auth_xhs(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
-        try:
-            await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
-        except:
-            print("[+] 等待5秒 cookie 失效")
-            await context.close()
-            await browser.close()
-            return False
-        # 2024.06.17 抖音创作者中心改版
-        if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
-            print("[+] 等待5秒 cookie 失效")
-            return False
-        else:
-            print("[+] cookie 有效")
-            return True
+    async with shared_playwright() as playwright:
+        async with auth_context(playwright, account_file) as context:
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
+            try:
+                await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
+            except:
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            # 2024.06.17 抖音创作者中心改版
+            if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            else:
+                print("[+] cookie 有效")
+                return True
 
 async def cookie_auth_tiktok(account_file):
-    async with async_playwright() as playwright:
-        if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
-        else:
-            browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        page = await context.new_page()
-        await page.goto("https://www.tiktok.com/tiktokstudio/upload?lang=en")
-        try:
-            await page.wait_for_load_state('networkidle')
-            select_elements = await page.query_selector_all('select')
-            for element in select_elements:
-                class_name = await element.get_attribute('class') or ''
-                if re.match(r'tiktok-.*-SelectFormContainer.*', class_name):
-                    print("[+] TikTok cookie 失效")
-                    return False
-            print("[+] TikTok cookie 有效")
-            return True
-        except Exception as exc:
-            print("[+] TikTok cookie 校验异常:", exc)
-            return False
-        finally:
-            await context.close()
-            await browser.close()
+    async with shared_playwright() as playwright:
+        async with auth_context(playwright, account_file) as context:
+            context = await set_init_script(context)
+            page = await context.new_page()
+            await page.goto("https://www.tiktok.com/tiktokstudio/upload?lang=en")
+            try:
+                # 等待登录表单或上传区域出现（代替 networkidle）
+                await tiktok_waits.locator(
+                    page.locator(TIKTOK_LOGIN_FORM).or_(page.locator(TIKTOK_UPLOAD_SURFACE)),
+                    name="登录表单或上传区域", kind="navigation", required=False)
+                select_elements = await page.query_selector_all('select')
+                for element in select_elements:
+                    class_name = await element.get_attribute('class') or ''
+                    if re.match(r'tiktok-.*-SelectFormContainer.*', class_name):
+                        print("[+] TikTok cookie 失效")
+                        return False
+                print("[+] TikTok cookie 有效")
+                return True
+            except Exception as exc:
+                print("[+] TikTok cookie 校验异常:", exc)
+                return False
 
 
 async def check_cookie(type,file_path):
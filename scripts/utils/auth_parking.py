@@ -0,0 +1,127 @@
+"""
+需要登录的账号挂起
+批量 / 队列 / 常驻服务中，账号的 Cookie 失效时不在任务里弹出登录窗口等人扫码（会卡住整个批次），
+而是抛出 AuthRequiredError：调度方释放并发槽位，把任务挂起（needs_auth），其他账号继续上传。
+
+账号重新登录后（本进程的 --login / 扫码登录，或者其他进程的 --qr-login），账号库中该账号变为 active
+且更新时间晚于挂起时间，挂起的任务自动恢复执行。
+"""
+import asyncio
+import time
+
+from .account_store import STATUS_ACTIVE, account_store
+from .log import logger
+
+
+class AuthRequiredError(Exception):
+    """账号需要登录（批量 / 队列 / 常驻服务中由调度方挂起任务，等待登录后恢复）"""
+
+    def __init__(self, platform: str, account: str):
+        super().__init__(f"{platform} 账号 {account} 需要登录")
+        self.platform = platform
+        self.account = account
+
+
+class AuthParking:
+    """需要登录的账号登记表"""
+
+    def __init__(self, poll_interval: float = 5):
+        """
+        初始化登记表
+
+        Args:
+            poll_interval: 检查账号是否已重新登录的间隔（秒），本进程内登录成功时会立即唤醒
+        """
+        self.poll_interval = poll_interval
+        self._parked = {}
+        self._events = {}
+        self._loop = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._events = {}
+
+    def park(self, platform: str, account: str) -> float:
+        """
+        登记账号需要登录（已登记时保留最早的挂起时间）
+
+        Returns:
+            挂起时间（time.time()）
+        """
+        key = (platform, account)
+        if key not in self._parked:
+            self._parked[key] = time.time()
+            self.mark_needs_auth(platform, account)
+        return self._parked[key]
+
+    @staticmethod
+    def mark_needs_auth(platform: str, account: str):
+        """在账号库中把账号标记为失效，并提示如何登录"""
+        account_store.record_verification(platform, account, False)
+        logger.warning(f"[登录] {platform} 账号 {account} 需要登录，相关任务已挂起，其他账号继续执行；"
+                       f"执行 python scripts/upload.py --qr-login {platform}:{account} 登录后自动恢复")
+
+    def is_parked(self, platform: str, account: str) -> bool:
+        return (platform, account) in self._parked
+
+    def parked_accounts(self) -> list:
+        """当前挂起的账号 [(platform, account)]"""
+        return sorted(self._parked)
+
+    @staticmethod
+    def login_completed(platform: str, account: str, since: float) -> bool:
+        """账号在 since 之后是否已经重新登录（账号库中为 active 且更新时间更晚，跨进程有效）"""
+        row = account_store.get(platform, account)
+        return bool(row) and row["status"] == STATUS_ACTIVE and (row["updated_at"] or 0) > since
+
+    def notify(self, platform: str, account: str):
+        """账号登录成功（由登录流程调用），立即唤醒等待该账号的任务"""
+        self._bind_loop()
+        event = self._events.pop((platform, account), None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, platform: str, account: str, timeout: float = None) -> bool:
+        """
+        等待挂起的账号重新登录
+
+        Args:
+            platform: 平台名称
+            account: 账号名称
+            timeout: 最长等待时间（秒），None 表示一直等待，0 表示不等待
+
+        Returns:
+            账号是否已经重新登录（未挂起时直接返回 True）
+        """
+        self._bind_loop()
+        key = (platform, account)
+        parked_at = self._parked.get(key)
+        if parked_at is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.login_completed(platform, account, parked_at):
+                if self._parked.get(key) == parked_at:
+                    del self._parked[key]
+                    logger.info(f"[登录] {platform} 账号 {account} 已重新登录，恢复挂起的任务")
+                return True
+            if key not in self._parked:
+                # 其他等待方已确认登录
+                return True
+            wait_time = self.poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            event = self._events.setdefault(key, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout=wait_time)
+            except asyncio.TimeoutError:
+                pass
+
+
+# 全局登记表实例
+auth_parking = AuthParking()
@@ -1,7 +1,7 @@
 from pathlib import Path
 from typing import List
 
-from conf import BASE_DIR
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 SOCIAL_MEDIA_DOUYIN = "douyin"
 SOCIAL_MEDIA_TENCENT = "tencent"
@@ -19,6 +19,74 @@ def get_cli_action() -> List[str]:
 
 
 async def set_init_script(context):
-    stealth_js_path = Path(BASE_DIR / "utils/stealth.min.js")
+    stealth_js_path = Path(__file__).parent / "stealth.min.js"
     await context.add_init_script(path=stealth_js_path)
     return context
+
+
+# 各平台创作者中心上传页：(导航地址, 登录状态下最终停留的地址前缀)
+UPLOAD_PAGES = {
+    SOCIAL_MEDIA_DOUYIN: ("https://creator.douyin.com/creator-micro/content/upload",
+                          "https://creator.douyin.com/creator-micro/content/upload"),
+    SOCIAL_MEDIA_KUAISHOU: ("https://cp.kuaishou.com/article/publish/video",
+                            "https://cp.kuaishou.com/article/publish/video"),
+    SOCIAL_MEDIA_TENCENT: ("https://channels.weixin.qq.com/platform/post/create",
+                           "https://channels.weixin.qq.com/platform/post/create"),
+    SOCIAL_MEDIA_TIKTOK: ("https://www.tiktok.com/creator-center/upload",
+                          "https://www.tiktok.com/tiktokstudio/upload"),
+}
+
+# TikTok Studio 上传页：未登录时出现的登录表单 / 已登录时的上传区域（校验 Cookie 时等待其中之一出现）
+TIKTOK_LOGIN_FORM = 'select[class*="SelectFormContainer"]'
+TIKTOK_UPLOAD_SURFACE = 'iframe[data-tt="Upload_index_iframe"], div.upload-container, [data-e2e="upload_drag_area"]'
+
+
+def is_on_upload_page(page, platform: str) -> bool:
+    """页面是否已经停在该平台的上传页（例如从预热池取到的页面）"""
+    return page.url.startswith(UPLOAD_PAGES[platform][1])
+
+
+async def goto_upload_page(page, platform: str):
+    """打开上传页；页面已经在上传页时跳过导航"""
+    if not is_on_upload_page(page, platform):
+        await page.goto(UPLOAD_PAGES[platform][0])
+
+
+# 各平台上传页上表示未登录的元素（与 CookieManager 浏览器校验使用的判断一致）
+LOGIN_PROMPTS = {
+    SOCIAL_MEDIA_DOUYIN: ("text=扫码登录", "text=手机号登录"),
+    SOCIAL_MEDIA_KUAISHOU: ("div.names div.container div.name:text('机构服务')",),
+    SOCIAL_MEDIA_TENCENT: ('div.title-name:has-text("微信小店")',),
+    SOCIAL_MEDIA_TIKTOK: ("select[class*='SelectFormContainer']",),
+}
+
+
+class LoginRequiredError(Exception):
+    """上传页显示未登录（Cookie 已失效，需要重新登录）"""
+
+
+async def upload_page_logged_in(page, platform: str, timeout: float = 5000) -> bool:
+    """
+    在已经打开的上传页上判断是否处于登录状态（代替单独打开浏览器校验 Cookie）
+
+    等待上传控件或登录提示先出现：出现登录提示、或者被重定向离开上传页视为未登录；
+    超时仍没有登录提示时与浏览器校验一样视为已登录。
+
+    Args:
+        page: 已经导航到上传页的页面
+        platform: 平台名称
+        timeout: 最长等待时间（毫秒）
+
+    Returns:
+        是否已登录
+    """
+    prompts = [page.locator(selector) for selector in LOGIN_PROMPTS[platform]]
+    login_prompt = prompts[0]
+    for prompt in prompts[1:]:
+        login_prompt = login_prompt.or_(prompt)
+    try:
+        await login_prompt.or_(page.locator("input[type='file']")).first.wait_for(state="attached",
+                                                                                  timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+    return is_on_upload_page(page, platform) and await login_prompt.count() == 0
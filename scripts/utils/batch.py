@@ -0,0 +1,206 @@
+"""
+批量上传调度模块
+从 manifest（JSONL，每行一个任务）读取任务，在同一个事件循环中并发执行，
+支持全局 / 平台 / 账号三级并发限制，并逐条写出任务结果；
+账号需要登录的任务挂起等待登录（不占用并发槽位），登录后自动恢复
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+
+from .auth_parking import AuthRequiredError, auth_parking
+from .log import logger
+
+
+# manifest 中每个任务必须包含的字段
+REQUIRED_JOB_FIELDS = ("platform", "video", "title")
+
+
+class ConcurrencyLimiter:
+    """三级并发限制器：全局 → 平台 → 账号"""
+
+    def __init__(self, global_limit: int = 3, platform_limits: dict = None, account_limit: int = 1):
+        """
+        初始化并发限制器
+
+        Args:
+            global_limit: 全局最大并发数
+            platform_limits: 每个平台的最大并发数 {platform: limit}，未配置的平台只受全局限制
+            account_limit: 每个账号的最大并发数（默认 1，即同一账号的任务串行执行）
+        """
+        self.global_limit = max(1, global_limit)
+        self.platform_limits = platform_limits or {}
+        self.account_limit = max(1, account_limit)
+        self._global = asyncio.Semaphore(self.global_limit)
+        self._platforms = {}
+        self._accounts = {}
+
+    def _platform_semaphore(self, platform: str):
+        if platform not in self.platform_limits:
+            return None
+        if platform not in self._platforms:
+            self._platforms[platform] = asyncio.Semaphore(max(1, self.platform_limits[platform]))
+        return self._platforms[platform]
+
+    def _account_semaphore(self, platform: str, account: str):
+        key = (platform, account)
+        if key not in self._accounts:
+            self._accounts[key] = asyncio.Semaphore(self.account_limit)
+        return self._accounts[key]
+
+    @asynccontextmanager
+    async def slot(self, platform: str, account: str = "default"):
+        """
+        获取一个执行槽位
+
+        先占账号槽，再占平台槽，最后占全局槽：
+        排队等待同一账号的任务不会占用全局槽位，其他账号可以继续执行
+        """
+        account_sem = self._account_semaphore(platform, account)
+        platform_sem = self._platform_semaphore(platform)
+        async with account_sem:
+            if platform_sem is not None:
+                await platform_sem.acquire()
+            try:
+                async with self._global:
+                    yield
+            finally:
+                if platform_sem is not None:
+                    platform_sem.release()
+
+
+def parse_platform_limits(spec: str) -> dict:
+    """
+    解析平台并发配置
+
+    Args:
+        spec: 形如 "douyin=2,tiktok=1" 的字符串
+
+    Returns:
+        {platform: limit}
+    """
+    limits = {}
+    if not spec:
+        return limits
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        platform, _, value = item.partition('=')
+        if not value:
+            raise ValueError(f"平台并发配置格式错误: {item}（应为 platform=数量）")
+        limits[platform.strip()] = int(value)
+    return limits
+
+
+def load_manifest(manifest_path) -> list:
+    """
+    读取 manifest 文件
+
+    每行一个 JSON 对象，至少包含 platform / video / title，
+    可选 id / account / tags / publish_date / thumbnail / product_link / product_title / category。
+    空行和以 # 开头的行会被忽略。
+
+    Args:
+        manifest_path: manifest 文件路径
+
+    Returns:
+        任务列表
+    """
+    jobs = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"manifest 第 {line_no} 行不是合法的 JSON: {e}") from e
+            missing = [field for field in REQUIRED_JOB_FIELDS if not job.get(field)]
+            if missing:
+                raise ValueError(f"manifest 第 {line_no} 行缺少字段: {', '.join(missing)}")
+            job.setdefault("id", f"line-{line_no}")
+            job.setdefault("account", "default")
+            jobs.append(job)
+    return jobs
+
+
+def default_results_path(manifest_path) -> Path:
+    """根据 manifest 路径生成默认的结果文件路径（jobs.jsonl -> jobs.results.jsonl）"""
+    manifest_path = Path(manifest_path)
+    return manifest_path.with_name(f"{manifest_path.stem}.results.jsonl")
+
+
+async def run_jobs(jobs: list, runner, limiter: ConcurrencyLimiter, results_path=None,
+                   auth_wait: float = None) -> list:
+    """
+    并发执行一批上传任务
+
+    Args:
+        jobs: 任务列表（load_manifest 的返回值）
+        runner: 执行单个任务的协程函数 runner(job) -> bool，账号需要登录时抛出 AuthRequiredError
+        limiter: 并发限制器
+        results_path: 结果文件路径（JSONL），每个任务完成后立即追加一行
+        auth_wait: 账号需要登录时任务最多挂起等待多久（秒），None 表示一直等待，
+            超时仍未登录的任务结果为 needs_auth
+
+    Returns:
+        每个任务的结果列表，顺序与 jobs 一致
+    """
+    results_file = open(results_path, "a", encoding="utf-8") if results_path else None
+
+    async def run_one(job):
+        platform = job["platform"]
+        account = job.get("account", "default")
+        started_at = datetime.now()
+        start = time.perf_counter()
+        while True:
+            # 账号已挂起时先等待登录，不占用并发槽位
+            if not await auth_parking.wait(platform, account, auth_wait):
+                status, error = "needs_auth", f"{platform} 账号 {account} 需要登录"
+                break
+            async with limiter.slot(platform, account):
+                started_at = datetime.now()
+                start = time.perf_counter()
+                error = None
+                logger.info(f"[批量] 开始任务 {job['id']}: {platform}/{account} {job['title']}")
+                try:
+                    status = "success" if await runner(job) else "failed"
+                except AuthRequiredError as e:
+                    status, error = "needs_auth", str(e)
+                    auth_parking.park(platform, account)
+                except Exception as e:
+                    status = "error"
+                    error = str(e)
+                    logger.exception(f"[批量] 任务 {job['id']} 出错: {e}")
+            if status != "needs_auth":
+                break
+            logger.warning(f"[批量] 任务 {job['id']} 已挂起，等待 {platform} 账号 {account} 登录")
+        duration = round(time.perf_counter() - start, 3)
+
+        result = {
+            "id": job["id"],
+            "platform": platform,
+            "account": account,
+            "video": job["video"],
+            "status": status,
+            "error": error,
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "duration": duration,
+        }
+        if results_file is not None:
+            results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            results_file.flush()
+        log = logger.success if status == "success" else logger.error
+        log(f"[批量] 任务 {job['id']} 结束: {status}（{duration}s）")
+        return result
+
+    try:
+        return await asyncio.gather(*(run_one(job) for job in jobs))
+    finally:
+        if results_file is not None:
+            results_file.close()
@@ -0,0 +1,282 @@
+"""
+浏览器池
+同一个 Playwright 驱动下按启动配置保持有限数量的 Chromium / Firefox 进程常驻，
+每个任务从池中拿到一个全新的、相互隔离的 BrowserContext，用完归还（关闭上下文，保留浏览器）
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import Browser, BrowserContext, Playwright
+
+from .browser_setup import apply_anti_detection, get_context_options, get_launch_options
+from .log import logger
+
+
+class _PooledBrowser:
+    """池中的一个浏览器进程"""
+
+    def __init__(self, browser: Browser, engine: str, launch_options: dict):
+        self.browser = browser
+        self.engine = engine
+        self.launch_options = launch_options
+        self.active = 0
+        self.launched_at = time.time()
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser.is_connected()
+
+
+class BrowserPool:
+    """浏览器池"""
+
+    def __init__(self, max_browsers: int = 2, max_contexts_per_browser: int = 8):
+        """
+        初始化浏览器池
+
+        Args:
+            max_browsers: 每种启动配置最多同时保持的浏览器进程数
+            max_contexts_per_browser: 每个浏览器最多同时打开的上下文数，全部占满时新的请求排队等待
+        """
+        self.max_browsers = max(1, max_browsers)
+        self.max_contexts_per_browser = max(1, max_contexts_per_browser)
+        self._browsers = {}
+        self._launching = {}
+        self._owners = {}
+        self._loop = None
+        self._changed = None
+
+    def _bind_loop(self):
+        """
+        绑定当前事件循环
+
+        asyncio 原语只能在创建它的事件循环中使用；换了事件循环（例如多次 asyncio.run），
+        旧循环中的驱动和浏览器都已失效，直接丢弃
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._changed = asyncio.Condition()
+            self._browsers = {}
+            self._launching = {}
+            self._owners = {}
+
+    @staticmethod
+    def _make_key(playwright: Playwright, engine: str, launch_options: dict):
+        return playwright, engine, json.dumps(launch_options, sort_keys=True, default=str)
+
+    def _purge(self):
+        """移除已断开的浏览器（包括所属驱动已经退出的）"""
+        for key, entries in list(self._browsers.items()):
+            alive = [entry for entry in entries if entry.healthy]
+            if len(alive) != len(entries):
+                logger.warning(f"[浏览器池] 移除 {len(entries) - len(alive)} 个已断开的 {key[1]} 浏览器")
+            if alive or self._launching.get(key):
+                self._browsers[key] = alive
+            else:
+                del self._browsers[key]
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _launch(self, playwright: Playwright, engine: str, launch_options: dict) -> _PooledBrowser:
+        start = time.perf_counter()
+        browser = await getattr(playwright, engine).launch(**launch_options)
+        logger.info(f"[浏览器池] 启动 {engine} 浏览器（headless={launch_options.get('headless')}，"
+                    f"{time.perf_counter() - start:.2f}s）")
+        entry = _PooledBrowser(browser, engine, launch_options)
+        browser.on("disconnected", lambda _: asyncio.ensure_future(self._notify()))
+        return entry
+
+    async def _checkout(self, key, playwright: Playwright, engine: str, launch_options: dict) -> _PooledBrowser:
+        """占用一个浏览器的上下文名额，没有空闲名额时在上限内启动新浏览器，否则等待"""
+        async with self._changed:
+            while True:
+                self._purge()
+                entries = self._browsers.setdefault(key, [])
+                candidates = [entry for entry in entries if entry.active < self.max_contexts_per_browser]
+                if candidates:
+                    entry = min(candidates, key=lambda item: item.active)
+                    entry.active += 1
+                    return entry
+                if len(entries) + self._launching.get(key, 0) < self.max_browsers:
+                    self._launching[key] = self._launching.get(key, 0) + 1
+                    break
+                await self._changed.wait()
+
+        try:
+            entry = await self._launch(playwright, engine, launch_options)
+        except BaseException:
+            self._launching[key] -= 1
+            await self._notify()
+            raise
+        self._launching[key] -= 1
+        entry.active = 1
+        async with self._changed:
+            self._browsers.setdefault(key, []).append(entry)
+            self._changed.notify_all()
+        return entry
+
+    async def _reserve_idle(self, key, entry: _PooledBrowser) -> bool:
+        """占用一个空闲浏览器的上下文名额（与 _checkout 相同的计数），浏览器正在使用或已被移除时返回 False"""
+        async with self._changed:
+            if entry.active or entry not in self._browsers.get(key, []):
+                return False
+            entry.active += 1
+            return True
+
+    async def acquire(self, playwright: Playwright, engine: str = "chromium", headless: bool = True,
+                      executable_path: str = None, launch_options: dict = None,
+                      **context_options) -> BrowserContext:
+        """
+        从池中获取一个新的浏览器上下文
+
+        Args:
+            playwright: Playwright 实例（浏览器属于该驱动，驱动退出后池中对应的浏览器自动失效）
+            engine: chromium 或 firefox
+            headless: 是否无头模式
+            executable_path: 浏览器可执行文件路径（为空则使用 Playwright 自带的浏览器）
+            launch_options: 额外的启动参数（默认只设置 headless）
+            **context_options: 传给 browser.new_context() 的参数，例如 storage_state
+
+        Returns:
+            新建的 BrowserContext，用完后必须调用 release()
+        """
+        self._bind_loop()
+        options = dict(launch_options or {})
+        options["headless"] = headless
+        if executable_path:
+            options["executable_path"] = executable_path
+        key = self._make_key(playwright, engine, options)
+
+        for attempt in range(2):
+            entry = await self._checkout(key, playwright, engine, options)
+            try:
+                context = await entry.browser.new_context(**context_options)
+            except Exception:
+                entry.active -= 1
+                await self._notify()
+                # 浏览器已崩溃：丢弃后用新浏览器重试一次
+                if attempt == 0 and not entry.healthy:
+                    logger.warning(f"[浏览器池] {engine} 浏览器已崩溃，重新启动")
+                    continue
+                raise
+            self._owners[context] = entry
+            return context
+
+    async def release(self, context: BrowserContext):
+        """归还上下文：关闭上下文，浏览器保留在池中"""
+        entry = self._owners.pop(context, None)
+        try:
+            await context.close()
+        except Exception:
+            pass
+        if entry is not None:
+            entry.active -= 1
+            await self._notify()
+
+    @asynccontextmanager
+    async def context(self, playwright: Playwright, engine: str = "chromium", headless: bool = True,
+                      executable_path: str = None, launch_options: dict = None, **context_options):
+        """acquire / release 的上下文管理器形式"""
+        context = await self.acquire(playwright, engine, headless, executable_path, launch_options,
+                                     **context_options)
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+    @asynccontextmanager
+    async def configured_context(self, playwright: Playwright, account_file: str, headless: bool = False,
+                                 locale: str = "zh-CN", use_chrome: bool = True):
+        """
+        获取与 get_browser_context() 配置完全相同的上下文（启动参数、指纹、反检测脚本），但复用池中的浏览器
+
+        Args:
+            playwright: Playwright 实例
+            account_file: Cookie 文件路径
+            headless: 是否无头模式
+            locale: 语言环境（zh-CN 或 en-US）
+            use_chrome: 是否使用 Chrome（否则使用 Firefox）
+        """
+        launch_options = get_launch_options(headless, use_chrome)
+        async with self.context(playwright, "chromium" if use_chrome else "firefox", headless,
+                                launch_options=launch_options,
+                                **get_context_options(account_file, locale)) as context:
+            await apply_anti_detection(context)
+            yield context
+
+    async def health_check(self, timeout: float = 10) -> dict:
+        """
+        健康检查：移除已断开的浏览器；空闲浏览器用一次新建上下文探测是否仍能响应，
+        无响应的浏览器关闭后按原配置重新启动一个替换。探测期间占用该浏览器的名额，
+        并发的 acquire 不会拿到正在探测（可能马上被关闭）的浏览器
+
+        Returns:
+            {"healthy": 数量, "replaced": 数量}
+        """
+        self._bind_loop()
+        healthy = replaced = 0
+        for key, entries in list(self._browsers.items()):
+            playwright, engine, _ = key
+            for entry in list(entries):
+                ok = entry.healthy
+                if ok and await self._reserve_idle(key, entry):
+                    try:
+                        probe = await asyncio.wait_for(entry.browser.new_context(), timeout)
+                        await probe.close()
+                    except Exception:
+                        ok = False
+                    if ok:
+                        entry.active -= 1
+                        await self._notify()
+                if ok:
+                    healthy += 1
+                    continue
+                logger.warning(f"[浏览器池] {engine} 浏览器无响应，替换")
+                async with self._changed:
+                    if entry in self._browsers.get(key, []):
+                        self._browsers[key].remove(entry)
+                try:
+                    await entry.browser.close()
+                except Exception:
+                    pass
+                try:
+                    new_entry = await self._launch(playwright, engine, entry.launch_options)
+                except Exception as e:
+                    logger.error(f"[浏览器池] 重新启动 {engine} 浏览器失败: {e}")
+                    continue
+                async with self._changed:
+                    self._browsers.setdefault(key, []).append(new_entry)
+                    self._changed.notify_all()
+                replaced += 1
+        return {"healthy": healthy, "replaced": replaced}
+
+    async def run_health_checks(self, interval: float = 60):
+        """后台定期执行健康检查（常驻服务中使用）"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                logger.error(f"[浏览器池] 健康检查出错: {e}")
+
+    async def close(self):
+        """关闭池中所有浏览器"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        browsers = [entry.browser for entries in self._browsers.values() for entry in entries]
+        self._browsers = {}
+        self._owners = {}
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+
+# 全局浏览器池实例
+browser_pool = BrowserPool()
@@ -10,28 +10,17 @@ import os
 # 本地 Chrome 路径（如果存在）
 LOCAL_CHROME_PATH = os.environ.get("CHROME_PATH", "")
 
-async def get_browser_context(
-    playwright: Playwright,
-    account_file: str,
-    headless: bool = False,
-    locale: str = "zh-CN",
-    use_chrome: bool = True
-) -> tuple[Browser, BrowserContext]:
+def get_launch_options(headless: bool = False, use_chrome: bool = True) -> dict:
     """
-    创建完整配置的浏览器上下文
-    
+    浏览器启动参数
+
     Args:
-        playwright: Playwright 实例
-        account_file: Cookie 文件路径
         headless: 是否无头模式
-        locale: 语言环境（zh-CN 或 en-US）
         use_chrome: 是否使用 Chrome（否则使用 Firefox）
-    
+
     Returns:
-        (browser, context) 元组
+        传给 browser_type.launch() 的参数
     """
-    
-    # 1. 浏览器启动参数
     launch_options = {
         "headless": headless,
         "args": [
@@ -47,15 +36,21 @@ async def get_browser_context(
     # 如果有本地 Chrome 路径，使用本地 Chrome
     if use_chrome and LOCAL_CHROME_PATH and os.path.exists(LOCAL_CHROME_PATH):
         launch_options["executable_path"] = LOCAL_CHROME_PATH
-    
-    # 启动浏览器
-    if use_chrome:
-        browser = await playwright.chromium.launch(**launch_options)
-    else:
-        browser = await playwright.firefox.launch(**launch_options)
-    
-    # 2. 上下文参数（关键！）
-    context_options = {
+    return launch_options
+
+
+def get_context_options(account_file: str, locale: str = "zh-CN") -> dict:
+    """
+    上下文参数（关键！）
+
+    Args:
+        account_file: Cookie 文件路径
+        locale: 语言环境（zh-CN 或 en-US）
+
+    Returns:
+        传给 browser.new_context() 的参数
+    """
+    return {
         "storage_state": account_file if os.path.exists(account_file) else None,
         "locale": locale,  # 语言环境
         "timezone_id": "Asia/Shanghai" if locale == "zh-CN" else "America/New_York",
@@ -67,16 +62,16 @@ async def get_browser_context(
         "permissions": ["geolocation", "notifications"],  # 预授权权限
         "geolocation": {"longitude": 116.397128, "latitude": 39.916527} if locale == "zh-CN" else None,  # 北京坐标
     }
-    
-    # 创建上下文
-    context = await browser.new_context(**context_options)
-    
-    # 3. 注入 stealth.js（反检测）
+
+
+async def apply_anti_detection(context: BrowserContext) -> BrowserContext:
+    """注入 stealth.js 和额外的反检测脚本"""
+    # 1. 注入 stealth.js（反检测）
     stealth_js_path = Path(__file__).parent / "stealth.min.js"
     if stealth_js_path.exists():
         await context.add_init_script(path=stealth_js_path)
     
-    # 4. 注入额外的反检测脚本
+    # 2. 注入额外的反检测脚本
     await context.add_init_script("""
         // 覆盖 navigator.webdriver
         Object.defineProperty(navigator, 'webdriver', {
@@ -106,6 +101,42 @@ async def get_browser_context(
                 originalQuery(parameters)
         );
     """)
+    return context
+
+
+async def get_browser_context(
+    playwright: Playwright,
+    account_file: str,
+    headless: bool = False,
+    locale: str = "zh-CN",
+    use_chrome: bool = True
+) -> tuple[Browser, BrowserContext]:
+    """
+    创建完整配置的浏览器上下文
+    
+    每次调用都会启动一个新浏览器；需要复用浏览器时使用 browser_pool.configured_context()
+    
+    Args:
+        playwright: Playwright 实例
+        account_file: Cookie 文件路径
+        headless: 是否无头模式
+        locale: 语言环境（zh-CN 或 en-US）
+        use_chrome: 是否使用 Chrome（否则使用 Firefox）
+    
+    Returns:
+        (browser, context) 元组
+    """
+    launch_options = get_launch_options(headless, use_chrome)
+    
+    # 启动浏览器
+    if use_chrome:
+        browser = await playwright.chromium.launch(**launch_options)
+    else:
+        browser = await playwright.firefox.launch(**launch_options)
+    
+    # 创建上下文
+    context = await browser.new_context(**get_context_options(account_file, locale))
+    await apply_anti_detection(context)
     
     return browser, context
 
@@ -0,0 +1,263 @@
+"""
+免浏览器的 Cookie 快速校验
+直接读取 storage_state 中的 Cookie，请求各平台一个轻量的登录态接口判断是否仍然登录，
+不需要启动浏览器、加载页面。所有请求共用一个 HTTP 客户端（Playwright APIRequestContext，
+运行在共享驱动中，连接复用），可以同时校验成百上千个账号。
+
+结果只有在接口明确返回“已登录 / 未登录”时才采用；网络错误、风控页面、接口格式变化等
+无法判断的情况返回 None，由调用方回退到浏览器校验。
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from playwright.async_api import APIRequestContext, Playwright
+
+from .log import logger
+
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+# 各平台代表登录态的 Cookie（全部缺失或已过期即可判定失效，无需请求）
+AUTH_COOKIES = {
+    "douyin": ("sessionid", "sessionid_ss"),
+    "tiktok": ("sessionid", "sessionid_ss"),
+    "kuaishou": ("kuaishou.web.cp.api_st", "kuaishou.web.cp.api_ph"),
+    "tencent": ("sessionid",),
+    "xhs": ("web_session", "galaxy_creator_session_id"),
+}
+
+
+def _check_douyin(status: int, data: dict):
+    if data.get("status_code") == 0 and data.get("user"):
+        return True
+    if data.get("status_code") == 8 or "登录" in str(data.get("status_msg", "")):
+        return False
+    return None
+
+
+def _check_kuaishou(status: int, data: dict):
+    if data.get("result") == 1:
+        return True
+    if data.get("result") == 109:
+        return False
+    return None
+
+
+def _check_tencent(status: int, data: dict):
+    if data.get("errCode") == 0 and (data.get("data") or {}).get("finderUser"):
+        return True
+    if data.get("errCode") in (300333, 300334):
+        return False
+    return None
+
+
+def _check_tiktok(status: int, data: dict):
+    if data.get("message") == "success" and (data.get("data") or {}).get("user_id"):
+        return True
+    if data.get("message") == "error" and (data.get("data") or {}).get("name") == "session_expired":
+        return False
+    return None
+
+
+def _check_xhs(status: int, data: dict):
+    if data.get("success") and data.get("data"):
+        return True
+    if data.get("code") == -100:
+        return False
+    return None
+
+
+# 各平台的登录态接口：method / url / 可选 json 请求体 / 根据 (HTTP 状态码, JSON) 判断的函数
+PROBES = {
+    "douyin": {"method": "GET", "url": "https://creator.douyin.com/web/api/media/user/info/",
+               "check": _check_douyin},
+    "kuaishou": {"method": "POST", "url": "https://cp.kuaishou.com/rest/cp/creator/pc/home/infoV2",
+                 "json": {}, "check": _check_kuaishou},
+    "tencent": {"method": "POST",
+                "url": "https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/auth/auth_data",
+                "json": {}, "check": _check_tencent},
+    "tiktok": {"method": "GET", "url": "https://www.tiktok.com/passport/web/account/info/",
+               "check": _check_tiktok},
+    "xhs": {"method": "GET", "url": "https://creator.xiaohongshu.com/api/galaxy/user/info",
+            "check": _check_xhs},
+}
+
+# 视为安全上下文的本地地址（与浏览器一致，secure Cookie 也会发送）
+_LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def load_storage_cookies(cookie_path) -> list:
+    """读取 storage_state 文件中的 Cookie 列表（文件不存在或格式错误时返回空列表）"""
+    try:
+        with open(cookie_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("cookies", [])
+    except (OSError, ValueError, AttributeError):
+        return []
+
+
+def cookie_header_for(cookies: list, url: str, now: float = None) -> str:
+    """
+    按域名、路径、secure 和过期时间筛选出请求 url 时浏览器会发送的 Cookie，拼成 Cookie 请求头
+
+    Args:
+        cookies: storage_state 中的 Cookie 列表
+        url: 请求地址
+        now: 当前时间戳（默认 time.time()）
+
+    Returns:
+        Cookie 请求头，没有匹配的 Cookie 时返回空字符串
+    """
+    now = time.time() if now is None else now
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    secure_ok = parts.scheme == "https" or host in _LOOPBACK_HOSTS
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.get("domain", "").lower().lstrip(".")
+        if not domain or not (host == domain or host.endswith("." + domain)):
+            continue
+        if not path.startswith(cookie.get("path") or "/"):
+            continue
+        if cookie.get("secure") and not secure_ok:
+            continue
+        expires = cookie.get("expires", -1)
+        if expires not in (None, -1) and expires <= now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+def auth_cookies_expired(platform: str, cookies: list, now: float = None) -> bool:
+    """
+    离线判断登录态 Cookie 是否已全部失效
+
+    只在能确定时返回 True：该平台的登录 Cookie 存在且全部过期，或者文件中根本没有 Cookie
+    """
+    if not cookies:
+        return True
+    now = time.time() if now is None else now
+    names = AUTH_COOKIES.get(platform, ())
+    auth = [cookie for cookie in cookies if cookie.get("name") in names]
+    if not auth:
+        return False
+    return all(cookie.get("expires", -1) not in (None, -1) and cookie["expires"] <= now for cookie in auth)
+
+
+class HttpCookieChecker:
+    """基于 HTTP 的 Cookie 快速校验器"""
+
+    def __init__(self, probes: dict = None, timeout: float = 5000, concurrency: int = 64):
+        """
+        初始化校验器
+
+        Args:
+            probes: 各平台的登录态接口配置（默认 PROBES，测试时可以指向本地替身服务）
+            timeout: 单次请求超时（毫秒）
+            concurrency: 同时进行的请求数上限
+        """
+        self.probes = PROBES if probes is None else probes
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self._client = None
+        self._client_owner = None
+        self._client_lock = None
+        self._semaphore = None
+        self._loop = None
+
+    def supports(self, platform: str) -> bool:
+        return platform in self.probes
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._client = None
+            self._client_owner = None
+            self._client_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def _get_client(self, playwright: Playwright) -> APIRequestContext:
+        """所有账号共用一个请求上下文；Cookie 每次显式放在请求头里，不使用上下文自身的 Cookie 存储"""
+        async with self._client_lock:
+            if self._client is None or self._client_owner is not playwright:
+                self._client = await playwright.request.new_context(
+                    user_agent=USER_AGENT, timeout=self.timeout,
+                    extra_http_headers={"Accept": "application/json, text/plain, */*"},
+                )
+                self._client_owner = playwright
+            return self._client
+
+    async def check(self, platform: str, cookie_path, playwright: Playwright):
+        """
+        校验一个账号的 Cookie
+
+        Args:
+            platform: 平台名称
+            cookie_path: storage_state 文件路径
+            playwright: Playwright 实例（请求在该驱动中发出）
+
+        Returns:
+            True 有效 / False 失效 / None 无法判断（需要回退到浏览器校验）
+        """
+        probe = self.probes.get(platform)
+        if probe is None:
+            return None
+        self._bind_loop()
+        cookies = load_storage_cookies(cookie_path)
+        if auth_cookies_expired(platform, cookies):
+            logger.info(f"[Cookie] {platform} {Path(cookie_path).name}: "
+                        f"{'登录 Cookie 已过期' if cookies else '没有 Cookie'}（离线判断）")
+            return False
+        header = cookie_header_for(cookies, probe["url"])
+        if not header:
+            logger.info(f"[Cookie] {platform} {Path(cookie_path).name}: 没有该平台域名下的有效 Cookie（离线判断）")
+            return False
+
+        start = time.perf_counter()
+        async with self._semaphore:
+            try:
+                client = await self._get_client(playwright)
+                response = await client.fetch(
+                    probe["url"], method=probe["method"], data=probe.get("json"),
+                    headers={"Cookie": header, "Referer": f"{urlsplit(probe['url']).scheme}://"
+                                                          f"{urlsplit(probe['url']).netloc}/"},
+                    max_redirects=0, fail_on_status_code=False,
+                )
+                status = response.status
+                location = response.headers.get("location", "")
+                body = await response.body()
+                await response.dispose()
+            except Exception as e:
+                logger.debug(f"[Cookie] {platform} HTTP 校验请求失败: {e}")
+                return None
+        elapsed = time.perf_counter() - start
+
+        if status == 401 or (300 <= status < 400 and ("login" in location or "passport" in location)):
+            result = False
+        else:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = None
+            result = probe["check"](status, data) if isinstance(data, dict) else None
+        logger.debug(f"[Cookie] {platform} HTTP 校验: HTTP {status} -> {result}（{elapsed * 1000:.0f}ms）")
+        return result
+
+    async def close(self):
+        """释放共用的请求上下文"""
+        if self._loop is not asyncio.get_running_loop() or self._client is None:
+            return
+        client, self._client, self._client_owner = self._client, None, None
+        try:
+            await client.dispose()
+        except Exception:
+            pass
+
+
+# 全局校验器实例
+http_cookie_checker = HttpCookieChecker()
@@ -0,0 +1,175 @@
+"""
+Cookie 过期时间索引
+离线解析 cookiesFile 中每个 storage_state 文件，记录每个账号登录态 Cookie 最早的过期时间。
+索引保存在磁盘上，只有文件的 mtime / 大小变化时才重新解析，几百个账号也只需要一次 stat。
+
+用途：不启动浏览器就能跳过已经过期的账号，并提前几小时提示哪些账号需要重新登录。
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from conf import CACHE_DIR
+from .cookie_check import AUTH_COOKIES, load_storage_cookies
+from .log import logger
+
+
+# 过期状态
+EXPIRY_EXPIRED = "expired"
+EXPIRY_EXPIRING = "expiring"
+EXPIRY_OK = "ok"
+EXPIRY_UNKNOWN = "unknown"
+
+
+def earliest_auth_expiry(platform: str, cookies: list):
+    """
+    登录态 Cookie 中最早的过期时间戳
+
+    Returns:
+        时间戳；没有登录 Cookie 或者都是会话 Cookie（expires = -1）时返回 None
+    """
+    names = AUTH_COOKIES.get(platform, ())
+    expiries = [cookie["expires"] for cookie in cookies
+                if cookie.get("name") in names and cookie.get("expires") not in (None, -1)]
+    return min(expiries) if expiries else None
+
+
+class CookieExpiryIndex:
+    """Cookie 过期时间索引"""
+
+    def __init__(self, cookies_dir, index_file=None):
+        """
+        初始化索引
+
+        Args:
+            cookies_dir: Cookie 文件目录（文件名格式 platform_account.json）
+            index_file: 索引文件路径（默认 CACHE_DIR/cookie_expiry_<目录哈希>.json）
+        """
+        self.cookies_dir = Path(cookies_dir)
+        if index_file is None:
+            # 不同的 Cookie 目录使用不同的索引文件
+            digest = hashlib.sha1(str(self.cookies_dir.resolve()).encode("utf-8")).hexdigest()[:8]
+            index_file = CACHE_DIR / f"cookie_expiry_{digest}.json"
+        self.index_file = Path(index_file)
+        self._entries = None
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_name(f"{self.index_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    @staticmethod
+    def _parse(cookie_file: Path, platform: str, account_name: str, stat) -> dict:
+        cookies = load_storage_cookies(cookie_file)
+        names = AUTH_COOKIES.get(platform, ())
+        return {
+            "platform": platform,
+            "account": account_name,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "cookies": len(cookies),
+            "auth_cookies": sorted({cookie["name"] for cookie in cookies if cookie.get("name") in names}),
+            "expires_at": earliest_auth_expiry(platform, cookies),
+        }
+
+    def _update(self, cookie_file: Path) -> bool:
+        """文件新增或变化时重新解析，返回索引是否有变化"""
+        name = cookie_file.stem
+        if '_' not in name:
+            return False
+        try:
+            stat = cookie_file.stat()
+        except OSError:
+            return self._entries.pop(cookie_file.name, None) is not None
+        entry = self._entries.get(cookie_file.name)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return False
+        platform, account_name = name.split('_', 1)
+        self._entries[cookie_file.name] = self._parse(cookie_file, platform, account_name, stat)
+        return True
+
+    def _persist(self):
+        try:
+            self._save()
+        except OSError as e:
+            logger.warning(f"[Cookie] 写入过期时间索引失败: {e}")
+
+    def refresh(self) -> dict:
+        """
+        增量更新整个索引：只重新解析新增或变化的文件，删除已不存在的文件
+
+        Returns:
+            {文件名: 索引项}
+        """
+        if self._entries is None:
+            self._entries = self._load()
+        files = {cookie_file.name: cookie_file for cookie_file in self.cookies_dir.glob("*.json")}
+        changed = False
+        for cookie_file in files.values():
+            changed = self._update(cookie_file) or changed
+        for file_name in set(self._entries) - set(files):
+            del self._entries[file_name]
+            changed = True
+        if changed:
+            self._persist()
+        return self._entries
+
+    @staticmethod
+    def status_of(entry: dict, warn_hours: float = 24, now: float = None) -> str:
+        """根据最早过期时间判断状态：expired / expiring（warn_hours 内过期）/ ok / unknown"""
+        expires_at = entry.get("expires_at")
+        if expires_at is None:
+            return EXPIRY_UNKNOWN
+        now = time.time() if now is None else now
+        if expires_at <= now:
+            return EXPIRY_EXPIRED
+        if expires_at - now <= warn_hours * 3600:
+            return EXPIRY_EXPIRING
+        return EXPIRY_OK
+
+    def get(self, platform: str, account_name: str) -> dict:
+        """查询单个账号的索引项（只检查该账号的文件；文件不存在时返回 None）"""
+        if self._entries is None:
+            self._entries = self._load()
+        cookie_file = self.cookies_dir / f"{platform}_{account_name}.json"
+        if self._update(cookie_file):
+            self._persist()
+        return self._entries.get(cookie_file.name)
+
+    def report(self, warn_hours: float = 24) -> list:
+        """
+        生成过期报告
+
+        Args:
+            warn_hours: 距离过期不足多少小时视为即将过期
+
+        Returns:
+            [{platform, account, status, expires_at, expires_in_hours, auth_cookies}]，按过期时间排序（未知的排在最后）
+        """
+        now = time.time()
+        rows = []
+        for entry in self.refresh().values():
+            expires_at = entry.get("expires_at")
+            rows.append({
+                "platform": entry["platform"],
+                "account": entry["account"],
+                "status": self.status_of(entry, warn_hours, now),
+                "expires_at": datetime.fromtimestamp(expires_at).isoformat(timespec="seconds") if expires_at else None,
+                "expires_in_hours": round((expires_at - now) / 3600, 1) if expires_at else None,
+                "auth_cookies": ",".join(entry["auth_cookies"]),
+            })
+        rows.sort(key=lambda row: (row["expires_in_hours"] is None, row["expires_in_hours"] or 0,
+                                   row["platform"], row["account"]))
+        return rows
@@ -4,32 +4,55 @@ Cookie 管理模块
 """
 import asyncio
 import json
+import time
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-from playwright.async_api import async_playwright, Browser, BrowserContext
-from .base_social_media import set_init_script
+from playwright.async_api import Browser, BrowserContext, Playwright
+from .account_lock import account_locks, single_flight
+from .account_store import AccountStore, account_store
+from .auth_parking import auth_parking
+from .base_social_media import TIKTOK_LOGIN_FORM, TIKTOK_UPLOAD_SURFACE, set_init_script
+from .browser_pool import browser_pool
+from .cookie_check import http_cookie_checker
+from .cookie_expiry import EXPIRY_EXPIRED, CookieExpiryIndex
 from .log import logger
+from .page_waits import PageWaits
+from .playwright_runtime import playwright_runtime, shared_playwright
+from .state_compaction import compact_state, compaction_stats, write_state
+from .state_persistence import save_storage_state, state_writer
+from .verify_cache import verification_cache
+
+# TikTok Cookie 校验页面的等待
+tiktok_waits = PageWaits("tiktok")
 
 
 class CookieManager:
     """Cookie 管理器"""
     
-    def __init__(self, cookies_dir: Path = None):
+    def __init__(self, cookies_dir: Path = None, store: AccountStore = None):
         """
         初始化 Cookie 管理器
         
         Args:
             cookies_dir: Cookie 文件存储目录
+            store: 账号库（默认目录使用全局账号库，自定义目录使用该目录下的 accounts.db）
         """
         if cookies_dir is None:
             # 默认使用项目根目录下的 cookiesFile
             self.cookies_dir = Path(__file__).parent.parent.parent / "cookiesFile"
+            self.store = store or account_store
         else:
             self.cookies_dir = Path(cookies_dir)
+            self.store = store or AccountStore(self.cookies_dir / "accounts.db")
         
         # 确保目录存在
         self.cookies_dir.mkdir(parents=True, exist_ok=True)
+        self._migrated = False
+        
+        # 离线的 Cookie 过期时间索引
+        self.expiry_index = CookieExpiryIndex(self.cookies_dir)
         
     def get_cookie_path(self, platform: str, account_name: str = "default") -> Path:
         """
@@ -42,6 +65,10 @@ class CookieManager:
         Returns:
             Cookie 文件路径
         """
+        account = self.store.get(platform, account_name)
+        if account and account["cookie_path"]:
+            # 从 user_info 等历史存储导入的账号，文件名不是 platform_account.json
+            return Path(account["cookie_path"])
         filename = f"{platform}_{account_name}.json"
         return self.cookies_dir / filename
     
@@ -69,7 +96,8 @@ class CookieManager:
             account_name: 账号名称
         """
         cookie_path = self.get_cookie_path(platform, account_name)
-        await context.storage_state(path=str(cookie_path))
+        await save_storage_state(context, cookie_path, platform)
+        self.store.upsert(platform, account_name, cookie_path)
         logger.success(f"[Cookie] 已保存 {platform} 账号 {account_name} 的 Cookie 到 {cookie_path}")
     
     async def load_cookie(self, browser: Browser, platform: str, account_name: str = "default") -> BrowserContext:
@@ -99,12 +127,24 @@ class CookieManager:
         context = await set_init_script(context)
         return context
     
-    async def verify_cookie_douyin(self, cookie_path: Path) -> bool:
+    @asynccontextmanager
+    async def verification_context(self, cookie_path: Path, engine: str = "chromium", playwright: Playwright = None):
+        """
+        获取用于验证 Cookie 的无头浏览器上下文（浏览器来自浏览器池，验证结束后只关闭上下文）
+        
+        Args:
+            cookie_path: Cookie 文件路径
+            engine: chromium 或 firefox
+            playwright: Playwright 实例（不传则使用进程共享的驱动）
+        """
+        playwright = playwright or await playwright_runtime.get()
+        async with browser_pool.context(playwright, engine, headless=True,
+                                        storage_state=self.store.storage_state(cookie_path)) as context:
+            yield await set_init_script(context)
+    
+    async def verify_cookie_douyin(self, cookie_path: Path, playwright: Playwright = None) -> bool:
         """验证抖音 Cookie 是否有效"""
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context(storage_state=str(cookie_path))
-            context = await set_init_script(context)
+        async with self.verification_context(cookie_path, "chromium", playwright) as context:
             page = await context.new_page()
             
             try:
@@ -122,16 +162,10 @@ class CookieManager:
             except Exception as e:
                 logger.error(f"[Cookie] 抖音 Cookie 验证失败: {e}")
                 return False
-            finally:
-                await context.close()
-                await browser.close()
     
-    async def verify_cookie_kuaishou(self, cookie_path: Path) -> bool:
+    async def verify_cookie_kuaishou(self, cookie_path: Path, playwright: Playwright = None) -> bool:
         """验证快手 Cookie 是否有效"""
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context(storage_state=str(cookie_path))
-            context = await set_init_script(context)
+        async with self.verification_context(cookie_path, "chromium", playwright) as context:
             page = await context.new_page()
             
             try:
@@ -147,21 +181,18 @@ class CookieManager:
             except Exception as e:
                 logger.error(f"[Cookie] 快手 Cookie 验证失败: {e}")
                 return False
-            finally:
-                await context.close()
-                await browser.close()
     
-    async def verify_cookie_tiktok(self, cookie_path: Path) -> bool:
+    async def verify_cookie_tiktok(self, cookie_path: Path, playwright: Playwright = None) -> bool:
         """验证 TikTok Cookie 是否有效"""
-        async with async_playwright() as playwright:
-            browser = await playwright.firefox.launch(headless=True)
-            context = await browser.new_context(storage_state=str(cookie_path))
-            context = await set_init_script(context)
+        async with self.verification_context(cookie_path, "firefox", playwright) as context:
             page = await context.new_page()
             
             try:
                 await page.goto("https://www.tiktok.com/tiktokstudio/upload?lang=en")
-                await page.wait_for_load_state('networkidle')
+                # 等待登录表单或上传区域出现（代替 networkidle）
+                await tiktok_waits.locator(
+                    page.locator(TIKTOK_LOGIN_FORM).or_(page.locator(TIKTOK_UPLOAD_SURFACE)),
+                    name="登录表单或上传区域", kind="navigation", required=False)
                 
                 # 检查是否有登录相关的 select 元素
                 select_elements = await page.query_selector_all('select')
@@ -176,16 +207,10 @@ class CookieManager:
             except Exception as e:
                 logger.error(f"[Cookie] TikTok Cookie 验证失败: {e}")
                 return False
-            finally:
-                await context.close()
-                await browser.close()
     
-    async def verify_cookie_tencent(self, cookie_path: Path) -> bool:
+    async def verify_cookie_tencent(self, cookie_path: Path, playwright: Playwright = None) -> bool:
         """验证视频号 Cookie 是否有效"""
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context(storage_state=str(cookie_path))
-            context = await set_init_script(context)
+        async with self.verification_context(cookie_path, "chromium", playwright) as context:
             page = await context.new_page()
             
             try:
@@ -201,16 +226,10 @@ class CookieManager:
             except Exception as e:
                 logger.error(f"[Cookie] 视频号 Cookie 验证失败: {e}")
                 return False
-            finally:
-                await context.close()
-                await browser.close()
     
-    async def verify_cookie_xhs(self, cookie_path: Path) -> bool:
+    async def verify_cookie_xhs(self, cookie_path: Path, playwright: Playwright = None) -> bool:
         """验证小红书 Cookie 是否有效"""
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context(storage_state=str(cookie_path))
-            context = await set_init_script(context)
+        async with self.verification_context(cookie_path, "chromium", playwright) as context:
             page = await context.new_page()
             
             try:
@@ -227,26 +246,44 @@ class CookieManager:
             except Exception as e:
                 logger.error(f"[Cookie] 小红书 Cookie 验证失败: {e}")
                 return False
-            finally:
-                await context.close()
-                await browser.close()
     
-    async def verify_cookie(self, platform: str, account_name: str = "default") -> bool:
+    async def verify_cookie(self, platform: str, account_name: str = "default", playwright: Playwright = None,
+                            http_check: bool = True, use_cache: bool = True) -> bool:
         """
         验证 Cookie 是否有效
         
         Args:
             platform: 平台名称
             account_name: 账号名称
+            playwright: Playwright 实例（传入时复用该驱动和浏览器池中的浏览器）
+            http_check: 是否先用 HTTP 快速校验（无法判断时自动回退到浏览器校验）
+            use_cache: 是否使用校验结果缓存（有效期内、Cookie 文件未变化时直接返回有效）
             
         Returns:
             Cookie 是否有效
         """
-        cookie_path = self.get_cookie_path(platform, account_name)
+        result = await self.check_cookie(platform, account_name, playwright, http_check, use_cache)
+        return result["valid"]
+    
+    async def check_cookie(self, platform: str, account_name: str = "default", playwright: Playwright = None,
+                           http_check: bool = True, use_cache: bool = True,
+                           browser_slots: asyncio.Semaphore = None, browser_fallback: bool = True) -> dict:
+        """
+        验证 Cookie 并返回详细结果
         
-        if not cookie_path.exists():
-            logger.warning(f"[Cookie] Cookie 文件不存在: {cookie_path}")
-            return False
+        Args:
+            platform / account_name / playwright / http_check / use_cache: 同 verify_cookie
+            browser_slots: 限制同时进行的浏览器校验数量（批量校验时使用）
+            browser_fallback: HTTP 无法判断时是否打开浏览器校验；为 False 时返回 valid=None、method=deferred，
+                由调用方在上传页上确认（会话复用，省去一次浏览器校验）
+            
+        Returns:
+            {platform, account, valid, method, latency_ms, error}，
+            method 为 missing / unsupported / expiry / cache / http / browser / deferred / error
+        """
+        start = time.perf_counter()
+        result = {"platform": platform, "account": account_name, "valid": False, "method": None, "error": None}
+        cookie_path = self.get_cookie_path(platform, account_name)
         
         # 根据平台调用对应的验证函数
         verify_funcs = {
@@ -256,23 +293,299 @@ class CookieManager:
             'tencent': self.verify_cookie_tencent,
             'xhs': self.verify_cookie_xhs,
         }
-        
         verify_func = verify_funcs.get(platform)
-        if verify_func is None:
+        
+        if not cookie_path.exists():
+            logger.warning(f"[Cookie] Cookie 文件不存在: {cookie_path}")
+            result["method"] = "missing"
+        elif verify_func is None:
             logger.error(f"[Cookie] 不支持的平台: {platform}")
-            return False
+            result["method"] = "unsupported"
+        elif self.is_expired(platform, account_name):
+            logger.info(f"[Cookie] {platform} 账号 {account_name} 的登录 Cookie 已过期（离线判断）")
+            result["method"] = "expiry"
+            verification_cache.invalidate(platform, account_name)
+            self._record_verification(platform, account_name, cookie_path, False)
+        elif use_cache and verification_cache.get(platform, account_name, cookie_path):
+            logger.info(f"[Cookie] {platform} 账号 {account_name} 的 Cookie 近期已确认有效（缓存）")
+            result.update(valid=True, method="cache")
+        else:
+            # 同一账号同时只进行一次校验，并发调用方共享结果
+            key = ("verify", str(cookie_path), http_check, browser_fallback)
+            valid, method, error = await single_flight.do(key, lambda: self._verify_exclusive(
+                platform, account_name, cookie_path, verify_func, playwright, http_check, use_cache,
+                browser_slots, browser_fallback))
+            result.update(valid=valid, method=method, error=error)
+            if valid is not None and method != "error":
+                self._record_verification(platform, account_name, cookie_path, valid)
+        
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000)
+        return result
+    
+    def _record_verification(self, platform: str, account_name: str, cookie_path: Path, valid: bool):
+        """把校验结果写入账号库（账号库中还没有该账号时先登记）"""
+        if self.store.get(platform, account_name) is None:
+            self.store.upsert(platform, account_name, cookie_path, source="cookies_file")
+        self.store.record_verification(platform, account_name, valid)
+    
+    async def _verify_exclusive(self, platform: str, account_name: str, cookie_path: Path, verify_func,
+                                playwright: Playwright, http_check: bool, use_cache: bool,
+                                browser_slots: asyncio.Semaphore, browser_fallback: bool):
+        """持有账号锁校验并更新缓存，返回 (是否有效, 校验方式, 错误信息)"""
+        async with account_locks.hold(cookie_path):
+            # 等锁期间其他进程可能刚刚校验过
+            if use_cache and verification_cache.get(platform, account_name, cookie_path):
+                logger.info(f"[Cookie] {platform} 账号 {account_name} 的 Cookie 刚刚已确认有效（缓存）")
+                return True, "cache", None
+            valid, method, error = False, None, None
+            try:
+                valid, method = await self._verify_uncached(platform, account_name, cookie_path, verify_func,
+                                                            playwright, http_check, browser_slots, browser_fallback)
+            except Exception as e:
+                logger.error(f"[Cookie] {platform} 账号 {account_name} 校验出错: {e}")
+                method, error = "error", str(e)
+            if valid:
+                verification_cache.record(platform, account_name, cookie_path)
+            elif valid is not None:
+                verification_cache.invalidate(platform, account_name)
+            return valid, method, error
+    
+    async def _verify_uncached(self, platform: str, account_name: str, cookie_path: Path, verify_func,
+                               playwright: Playwright, http_check: bool, browser_slots: asyncio.Semaphore = None,
+                               browser_fallback: bool = True):
+        """实际校验，返回 (是否有效, 校验方式)；不回退到浏览器且 HTTP 无法判断时返回 (None, "deferred")"""
+        playwright = playwright or await playwright_runtime.get()
+        
+        # 先用 HTTP 快速校验，只有无法判断时才打开浏览器
+        if http_check and http_cookie_checker.supports(platform):
+            start = time.perf_counter()
+            result = await http_cookie_checker.check(platform, cookie_path, playwright)
+            elapsed = (time.perf_counter() - start) * 1000
+            if result is not None:
+                logger.info(f"[Cookie] {platform} 账号 {account_name} 的 Cookie {'有效' if result else '已失效'}"
+                            f"（HTTP 校验，{elapsed:.0f}ms）")
+                return result, "http"
+            if not browser_fallback:
+                logger.info(f"[Cookie] {platform} 账号 {account_name} HTTP 校验无法判断，由上传页确认登录态")
+                return None, "deferred"
+            logger.info(f"[Cookie] {platform} 账号 {account_name} HTTP 校验无法判断，使用浏览器校验")
+        elif not browser_fallback:
+            return None, "deferred"
+        
+        if browser_slots is None:
+            return await verify_func(cookie_path, playwright), "browser"
+        async with browser_slots:
+            return await verify_func(cookie_path, playwright), "browser"
+    
+    async def verify_all(self, platforms: list = None, concurrency: int = 8, http_check: bool = True,
+                         use_cache: bool = False, playwright: Playwright = None) -> list:
+        """
+        并发校验所有已保存的 Cookie（list_cookies() 中的每个账号）
+        
+        HTTP 校验全部并发进行；需要回退到浏览器的账号最多同时打开 concurrency 个上下文，
+        这些上下文来自浏览器池，每种浏览器内核只启动一个浏览器。
+        
+        Args:
+            platforms: 只校验这些平台（默认全部）
+            concurrency: 同时进行的浏览器校验数量（不超过浏览器池中单个浏览器的上下文上限）
+            http_check: 是否先用 HTTP 快速校验
+            use_cache: 是否使用校验结果缓存（默认不使用，总是重新校验）
+            playwright: Playwright 实例（默认使用进程共享的驱动）
+            
+        Returns:
+            每个账号的校验结果（格式同 check_cookie），按平台、账号排序
+        """
+        playwright = playwright or await playwright_runtime.get()
+        # 浏览器校验的上下文数不超过单个浏览器的上限，保证每种内核只启动一个浏览器
+        concurrency = max(1, min(concurrency, browser_pool.max_contexts_per_browser))
+        browser_slots = asyncio.Semaphore(concurrency)
+        accounts = [
+            (platform, account_name)
+            for platform, account_names in sorted(self.list_cookies().items())
+            if platforms is None or platform in platforms
+            for account_name in sorted(account_names)
+        ]
+        logger.info(f"[Cookie] 开始校验 {len(accounts)} 个账号（浏览器并发 {concurrency}）")
+        return await asyncio.gather(*(
+            self.check_cookie(platform, account_name, playwright, http_check, use_cache, browser_slots)
+            for platform, account_name in accounts
+        ))
+    
+    def get_cookie_expiry(self, platform: str, account_name: str = "default", warn_hours: float = 24) -> dict:
+        """
+        查询账号登录态 Cookie 的过期信息（离线，不请求网络）
+        
+        Args:
+            platform: 平台名称
+            account_name: 账号名称
+            warn_hours: 距离过期不足多少小时视为即将过期
+            
+        Returns:
+            {expires_at, status, auth_cookies, ...}，Cookie 文件不存在时返回 None；
+            status 为 expired / expiring / ok / unknown
+        """
+        entry = self.expiry_index.get(platform, account_name)
+        if entry is None:
+            return None
+        return dict(entry, status=self.expiry_index.status_of(entry, warn_hours))
+    
+    def is_expired(self, platform: str, account_name: str = "default") -> bool:
+        """登录态 Cookie 是否已经确定过期（无法判断时返回 False）"""
+        expiry = self.get_cookie_expiry(platform, account_name)
+        return expiry is not None and expiry["status"] == EXPIRY_EXPIRED
+    
+    def expiry_report(self, warn_hours: float = 24) -> list:
+        """所有账号的过期报告（见 CookieExpiryIndex.report）"""
+        return self.expiry_index.report(warn_hours)
+    
+    async def _context_creation_ms(self, playwright: Playwright, engine: str, state: dict, rounds: int = 3) -> float:
+        """用 storage_state 创建浏览器上下文的耗时（毫秒，取中位数；浏览器已经预先启动）"""
+        await browser_pool.release(await browser_pool.acquire(playwright, engine, headless=True))
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            context = await browser_pool.acquire(playwright, engine, headless=True, storage_state=state)
+            timings.append((time.perf_counter() - start) * 1000)
+            await browser_pool.release(context)
+        return round(sorted(timings)[len(timings) // 2], 1)
+    
+    async def compact_cookie(self, platform: str, account_name: str = "default", measure: bool = True,
+                             playwright: Playwright = None) -> dict:
+        """
+        压缩 Cookie 文件：只保留平台登录需要的域名下未过期的 Cookie 和 origin
         
-        return await verify_func(cookie_path)
+        Args:
+            platform: 平台名称
+            account_name: 账号名称
+            measure: 是否测量压缩前后创建浏览器上下文的耗时
+            playwright: Playwright 实例（默认使用进程共享的驱动）
+            
+        Returns:
+            {platform, account, bytes_before, bytes_after, cookies_before, cookies_after,
+             origins_before, origins_after, context_ms_before, context_ms_after, error}
+        """
+        result = {"platform": platform, "account": account_name, "bytes_before": None, "bytes_after": None,
+                  "cookies_before": None, "cookies_after": None, "origins_before": None, "origins_after": None,
+                  "context_ms_before": None, "context_ms_after": None, "error": None}
+        cookie_path = self.get_cookie_path(platform, account_name)
+        async with account_locks.hold(cookie_path):
+            try:
+                with open(cookie_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                result["error"] = str(e)
+                return result
+            compacted = compact_state(platform, state)
+            result.update(compaction_stats(state, compacted))
+            if result["bytes_after"] < result["bytes_before"]:
+                write_state(cookie_path, compacted)
+                self.store.upsert(platform, account_name, cookie_path, compacted)
+        
+        if measure:
+            engine = "firefox" if platform == "tiktok" else "chromium"
+            try:
+                playwright = playwright or await playwright_runtime.get()
+                result["context_ms_before"] = await self._context_creation_ms(playwright, engine, state)
+                result["context_ms_after"] = await self._context_creation_ms(playwright, engine, compacted)
+            except Exception as e:
+                logger.warning(f"[Cookie] 测量创建上下文耗时失败: {e}")
+                result["error"] = str(e)
+        logger.info(f"[Cookie] {platform} 账号 {account_name}: {result['bytes_before'] // 1024}KB → "
+                    f"{result['bytes_after'] // 1024}KB，Cookie {result['cookies_before']} → {result['cookies_after']}，"
+                    f"origin {result['origins_before']} → {result['origins_after']}")
+        return result
+    
+    async def compact_all(self, platforms: list = None, measure: bool = True, playwright: Playwright = None) -> list:
+        """
+        依次压缩所有账号的 Cookie 文件（逐个执行，测量的耗时不受并发干扰）
+        
+        Args:
+            platforms: 只压缩这些平台（默认全部）
+            measure: 是否测量创建浏览器上下文的耗时
+            playwright: Playwright 实例
+            
+        Returns:
+            每个账号的压缩结果（格式同 compact_cookie）
+        """
+        return [await self.compact_cookie(account["platform"], account["account"], measure, playwright)
+                for account in self.list_accounts()
+                if platforms is None or account["platform"] in platforms]
+    
+    def mark_verified(self, platform: str, account_name: str = "default"):
+        """
+        记录 Cookie 刚被确认有效（例如上传成功并保存了 storage_state），之后的校验可以直接命中缓存
+        
+        Args:
+            platform: 平台名称
+            account_name: 账号名称
+        """
+        cookie_path = self.get_cookie_path(platform, account_name)
+
+        def record():
+            if cookie_path.exists():
+                verification_cache.record(platform, account_name, cookie_path, source="upload")
+                self.store.upsert(platform, account_name, cookie_path)
+                self.store.record_upload(platform, account_name)
+
+        # 上传后的 storage_state 可能还在延迟写入，写入后再按新文件记录
+        state_writer.after_flush(cookie_path, record)
     
     async def login_and_save_cookie(self, platform: str, account_name: str = "default", timeout: int = 200):
         """
         打开浏览器让用户登录，并保存 Cookie
         
+        同一账号同时只会打开一个登录窗口：进程内的并发调用共享同一次登录结果；
+        其他进程正在登录时等待其完成，完成后 Cookie 有效则直接使用
+        
         Args:
             platform: 平台名称
             account_name: 账号名称
             timeout: 登录超时时间（秒）
         """
+        cookie_path = self.get_cookie_path(platform, account_name)
+        success = await single_flight.do(("login", str(cookie_path)),
+                                         lambda: self._login_exclusive(platform, account_name, timeout))
+        if success:
+            # 唤醒等待该账号登录的挂起任务
+            auth_parking.notify(platform, account_name)
+        return success
+    
+    @staticmethod
+    def _file_signature(cookie_path: Path):
+        try:
+            stat = cookie_path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    async def _login_exclusive(self, platform: str, account_name: str, timeout: int) -> bool:
+        """持有账号锁登录并保存 Cookie，锁释放后再校验"""
+        cookie_path = self.get_cookie_path(platform, account_name)
+        before = self._file_signature(cookie_path)
+        async with account_locks.hold(cookie_path):
+            changed = self._file_signature(cookie_path) != before
+        if changed and await self.verify_cookie(platform, account_name):
+            logger.success(f"[Cookie] {platform} 账号 {account_name} 已在其他进程中完成登录")
+            return True
+        
+        async with account_locks.hold(cookie_path):
+            saved = await self._login_in_browser(platform, account_name, timeout)
+        if not saved:
+            return False
+        
+        self.store.upsert(platform, account_name, cookie_path, source="login")
+        
+        # 验证 Cookie
+        is_valid = await self.verify_cookie(platform, account_name)
+        if is_valid:
+            logger.success(f"[Cookie] Cookie 验证成功！")
+            return True
+        else:
+            logger.error(f"[Cookie] Cookie 验证失败，请重试")
+            return False
+    
+    async def _login_in_browser(self, platform: str, account_name: str, timeout: int) -> bool:
+        """打开浏览器等待用户登录，登录成功后保存 Cookie，返回是否已保存"""
         login_urls = {
             'douyin': 'https://creator.douyin.com/',
             'kuaishou': 'https://cp.kuaishou.com',
@@ -288,7 +601,7 @@ class CookieManager:
         
         logger.info(f"[Cookie] 打开浏览器进行 {platform} 登录...")
         
-        async with async_playwright() as playwright:
+        async with shared_playwright() as playwright:
             # 使用非无头模式
             browser_type = playwright.firefox if platform == 'tiktok' else playwright.chromium
             browser = await browser_type.launch(headless=False)
@@ -321,17 +634,9 @@ class CookieManager:
                 
                 # 保存 Cookie
                 cookie_path = self.get_cookie_path(platform, account_name)
-                await context.storage_state(path=str(cookie_path))
+                await save_storage_state(context, cookie_path, platform)
                 logger.success(f"[Cookie] Cookie 已保存到 {cookie_path}")
-                
-                # 验证 Cookie
-                is_valid = await self.verify_cookie(platform, account_name)
-                if is_valid:
-                    logger.success(f"[Cookie] Cookie 验证成功！")
-                    return True
-                else:
-                    logger.error(f"[Cookie] Cookie 验证失败，请重试")
-                    return False
+                return True
                     
             except asyncio.TimeoutError:
                 logger.error(f"[Cookie] 登录超时（{timeout}秒）")
@@ -340,6 +645,36 @@ class CookieManager:
                 await context.close()
                 await browser.close()
     
+    def migrate_accounts(self) -> dict:
+        """
+        把 Cookie 目录中的文件、db/database.db 的 user_info 表和 accounts.ini 导入账号库（可重复执行，
+        也用于导入手动放进 Cookie 目录的文件）
+        
+        Returns:
+            各来源导入的账号数
+        """
+        self._migrated = True
+        return self.store.migrate(self.cookies_dir)
+    
+    def list_accounts(self, platform: str = None, status: str = None) -> list:
+        """
+        从账号库列出账号（账号库为空时先从历史存储导入；每次都会同步 Cookie 目录，
+        手动放进目录或由上传器直接保存的文件也会列出）
+        
+        Args:
+            platform: 只列出该平台
+            status: 只列出该状态（active / invalid / unknown）
+            
+        Returns:
+            [{platform, account, cookie_path, status, expires_at, last_verified, last_upload, ...}]
+        """
+        if not self._migrated and self.store.count() == 0:
+            self.migrate_accounts()
+        else:
+            # 按 mtime / 大小增量同步，没有变化的文件不会重新读取
+            self.store.sync_directory(self.cookies_dir)
+        return self.store.list_accounts(platform, status)
+    
     def list_cookies(self) -> dict:
         """
         列出所有已保存的 Cookie
@@ -348,15 +683,8 @@ class CookieManager:
             {platform: [account_names]}
         """
         cookies = {}
-        for cookie_file in self.cookies_dir.glob("*.json"):
-            # 文件名格式: platform_accountname.json
-            name = cookie_file.stem
-            if '_' in name:
-                platform, account_name = name.split('_', 1)
-                if platform not in cookies:
-                    cookies[platform] = []
-                cookies[platform].append(account_name)
-        
+        for account in self.list_accounts():
+            cookies.setdefault(account["platform"], []).append(account["account"])
         return cookies
     
     def delete_cookie(self, platform: str, account_name: str = "default"):
@@ -368,6 +696,8 @@ class CookieManager:
             account_name: 账号名称
         """
         cookie_path = self.get_cookie_path(platform, account_name)
+        verification_cache.invalidate(platform, account_name)
+        self.store.delete(platform, account_name)
         if cookie_path.exists():
             cookie_path.unlink()
             logger.info(f"[Cookie] 已删除 {platform} 账号 {account_name} 的 Cookie")
@@ -0,0 +1,390 @@
+"""
+常驻上传服务
+在一个长期运行的进程中保持 Playwright 驱动常驻，通过本地 HTTP（TCP 或 Unix socket）接收任务
+
+接口：
+    POST   /jobs              提交任务（JSON，字段与 manifest 中的一行相同），返回任务 ID
+    GET    /jobs              列出所有任务
+    GET    /jobs/{id}         查询任务状态
+    DELETE /jobs/{id}         取消任务
+    GET    /jobs/{id}/events  以 NDJSON 流式返回任务进度（日志），任务结束后关闭
+    GET    /health            健康检查
+"""
+import asyncio
+import json
+import signal
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from http import HTTPStatus
+
+from .auth_parking import AuthRequiredError, auth_parking
+from .batch import REQUIRED_JOB_FIELDS, ConcurrencyLimiter
+from .browser_pool import browser_pool
+from .log import logger
+from .page_waits import wait_recorder
+from .playwright_runtime import playwright_runtime
+
+
+# 任务结束状态
+FINISHED_STATES = ("success", "failed", "error", "cancelled")
+
+# 已结束的任务保留多久（秒），以及最多保留多少个（超过时先删除最早结束的）
+JOB_RETENTION = 3600
+MAX_FINISHED_JOBS = 200
+# 每个任务最多保留的进度事件数（超过时丢弃最早的日志）
+MAX_JOB_EVENTS = 500
+
+
+class DaemonJob:
+    """常驻服务中的一个任务"""
+
+    def __init__(self, job: dict):
+        self.id = job.get("id") or uuid.uuid4().hex[:12]
+        job["id"] = self.id
+        job.setdefault("account", "default")
+        self.job = job
+        self.status = "queued"
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.events = deque(maxlen=MAX_JOB_EVENTS)
+        # 产生过的事件总数（包括已经丢弃的），订阅者按它判断有没有新事件
+        self.event_count = 0
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    async def emit(self, event: str, message: str = ""):
+        """记录一条进度事件并唤醒所有订阅者"""
+        self.events.append({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "event": event,
+            "message": message,
+        })
+        self.event_count += 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_event(self, seen: int):
+        """等待新事件（事件总数超过 seen 或任务结束）"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.event_count > seen or self.finished)
+
+    def events_since(self, seen: int) -> list:
+        """第 seen 个之后的事件（已经丢弃的跳过）"""
+        dropped = self.event_count - len(self.events)
+        return list(self.events)[max(0, seen - dropped):]
+
+    def to_dict(self) -> dict:
+        duration = None
+        if self.started_at:
+            end = self.finished_at or datetime.now()
+            duration = round((end - self.started_at).total_seconds(), 3)
+        return {
+            "id": self.id,
+            "platform": self.job["platform"],
+            "account": self.job["account"],
+            "title": self.job["title"],
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "duration": duration,
+        }
+
+
+class UploadDaemon:
+    """常驻上传服务"""
+
+    def __init__(self, runner, supported_platforms, limiter: ConcurrencyLimiter = None, on_submit=None,
+                 refresher=None, refresh_interval: float = 0, auth_wait: float = None,
+                 job_retention: float = JOB_RETENTION, max_finished_jobs: int = MAX_FINISHED_JOBS):
+        """
+        初始化常驻服务
+
+        Args:
+            runner: 执行单个任务的协程函数 runner(job, playwright=...) -> bool
+            supported_platforms: 支持的平台列表，用于校验提交的任务
+            limiter: 并发限制器（默认全局 3 并发、同账号串行）
+            on_submit: 任务提交时的回调 on_submit(job, playwright)，例如为该账号预热上传页
+            refresher: 登录态保活任务（SessionRefresher），与上传任务共用并发限制器
+            refresh_interval: 后台保活的间隔（秒），0 表示不保活
+            auth_wait: 账号需要登录时任务最多挂起多久（秒，状态为 needs_auth，不占用并发槽位），
+                None 表示一直等待；超时仍未登录的任务记为失败
+            job_retention: 已结束的任务保留多久（秒），之后不再出现在 /jobs 中
+            max_finished_jobs: 最多保留多少个已结束的任务
+        """
+        self.runner = runner
+        self.supported_platforms = set(supported_platforms)
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.on_submit = on_submit
+        self.refresher = refresher
+        self.refresh_interval = refresh_interval
+        self.auth_wait = auth_wait
+        self.job_retention = job_retention
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self.playwright = None
+        self._log_sink_id = None
+        self._health_task = None
+        self._refresh_task = None
+        self._stopped = None
+
+    # ---------------------------------------------------------------- 生命周期
+
+    async def start(self):
+        """启动常驻的 Playwright 驱动、浏览器池健康检查和登录态保活，并把任务内的日志转发到任务事件流"""
+        self.playwright = await playwright_runtime.get()
+        self._log_sink_id = logger.add(self._forward_log, level="INFO", format="{message}",
+                                       filter=lambda record: "daemon_job_id" in record["extra"])
+        self._stopped = asyncio.Event()
+        self._health_task = asyncio.get_running_loop().create_task(browser_pool.run_health_checks())
+        if self.refresher is not None and self.refresh_interval > 0:
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self.refresher.run_forever(self.refresh_interval, self.playwright, self.limiter))
+            logger.info(f"[服务] 登录态保活间隔 {self.refresh_interval / 60:g} 分钟")
+        logger.info("[服务] 已启动")
+
+    async def stop(self):
+        """取消未完成的任务，关闭预热池、浏览器池和 Playwright 驱动"""
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        pending = [job.task for job in self.jobs.values() if job.task]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self._log_sink_id is not None:
+            logger.remove(self._log_sink_id)
+            self._log_sink_id = None
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        # 依次关闭预热池、浏览器池和共享驱动
+        await playwright_runtime.stop()
+        self.playwright = None
+        logger.info("[服务] 已停止")
+
+    def _forward_log(self, message):
+        record = message.record
+        job = self.jobs.get(record["extra"]["daemon_job_id"])
+        if job is not None:
+            asyncio.get_running_loop().create_task(job.emit("log", record["message"]))
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, unix_socket: str = None):
+        """
+        启动 HTTP 服务并一直运行，直到收到 SIGINT / SIGTERM
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            unix_socket: Unix socket 路径（指定后忽略 host / port）
+        """
+        await self.start()
+        if unix_socket:
+            server = await asyncio.start_unix_server(self._handle_connection, path=unix_socket)
+            logger.info(f"[服务] 监听 Unix socket: {unix_socket}")
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info(f"[服务] 监听 http://{host}:{port}")
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopped.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows 不支持 add_signal_handler，依赖 KeyboardInterrupt 退出
+                pass
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            await self.stop()
+
+    # ---------------------------------------------------------------- 任务管理
+
+    def prune(self):
+        """删除超过保留时间或超出数量上限的已结束任务"""
+        now = datetime.now()
+        finished = sorted((job for job in self.jobs.values() if job.finished and job.finished_at),
+                          key=lambda job: job.finished_at)
+        excess = len(finished) - self.max_finished_jobs
+        for index, job in enumerate(finished):
+            if index < excess or (now - job.finished_at).total_seconds() > self.job_retention:
+                del self.jobs[job.id]
+
+    def submit(self, job: dict) -> DaemonJob:
+        """提交任务，立即返回；任务在后台按并发限制执行"""
+        self.prune()
+        missing = [field for field in REQUIRED_JOB_FIELDS if not job.get(field)]
+        if missing:
+            raise ValueError(f"缺少字段: {', '.join(missing)}")
+        if job["platform"] not in self.supported_platforms:
+            raise ValueError(f"不支持的平台: {job['platform']}")
+        if job.get("id") in self.jobs:
+            raise ValueError(f"任务 ID 已存在: {job['id']}")
+
+        daemon_job = DaemonJob(job)
+        self.jobs[daemon_job.id] = daemon_job
+        if self.on_submit is not None:
+            self.on_submit(daemon_job.job, self.playwright)
+        daemon_job.task = asyncio.get_running_loop().create_task(self._run(daemon_job))
+        return daemon_job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.task.cancel()
+        return True
+
+    async def _run(self, daemon_job: DaemonJob):
+        job = daemon_job.job
+        await daemon_job.emit("queued")
+        try:
+            while True:
+                # 账号需要登录时挂起等待，不占用并发槽位
+                if not await auth_parking.wait(job["platform"], job["account"], self.auth_wait):
+                    daemon_job.status = "failed"
+                    daemon_job.error = f"{job['platform']} 账号 {job['account']} 需要登录（等待超时）"
+                    break
+                if daemon_job.status == "needs_auth":
+                    daemon_job.status = "queued"
+                    await daemon_job.emit("resumed")
+                async with self.limiter.slot(job["platform"], job["account"]):
+                    daemon_job.status = "running"
+                    daemon_job.started_at = daemon_job.started_at or datetime.now()
+                    await daemon_job.emit("running")
+                    start = time.perf_counter()
+                    try:
+                        with logger.contextualize(daemon_job_id=daemon_job.id):
+                            ok = await self.runner(job, playwright=self.playwright)
+                    except AuthRequiredError as e:
+                        auth_parking.park(job["platform"], job["account"])
+                        daemon_job.status = "needs_auth"
+                        await daemon_job.emit("needs_auth", str(e))
+                        continue
+                    daemon_job.status = "success" if ok else "failed"
+                    logger.info(f"[服务] 任务 {daemon_job.id} 结束: {daemon_job.status}"
+                                f"（{time.perf_counter() - start:.1f}s）")
+                    break
+        except asyncio.CancelledError:
+            daemon_job.status = "cancelled"
+        except Exception as e:
+            daemon_job.status = "error"
+            daemon_job.error = str(e)
+            logger.exception(f"[服务] 任务 {daemon_job.id} 出错: {e}")
+        finally:
+            daemon_job.finished_at = datetime.now()
+            await daemon_job.emit(daemon_job.status, daemon_job.error or "")
+
+    # ---------------------------------------------------------------- HTTP
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = b""
+            if int(headers.get("content-length", 0)):
+                body = await reader.readexactly(int(headers["content-length"]))
+            await self._route(method.upper(), target.split("?", 1)[0].rstrip("/"), body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.exception(f"[服务] 处理请求出错: {e}")
+            await self._send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = [part for part in path.split("/") if part]
+        self.prune()
+
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, HTTPStatus.OK, {
+                "status": "ok",
+                "jobs": len(self.jobs),
+                "running": sum(1 for job in self.jobs.values() if job.status == "running"),
+                "needs_auth": [f"{platform}:{account}" for platform, account in auth_parking.parked_accounts()],
+                "waits": wait_recorder.summary()[:10],
+            })
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                return await self._send_json(writer, HTTPStatus.OK, [job.to_dict() for job in self.jobs.values()])
+            if method == "POST":
+                try:
+                    job = json.loads(body or b"{}")
+                    if not isinstance(job, dict):
+                        raise ValueError("请求体必须是 JSON 对象")
+                    daemon_job = self.submit(job)
+                except ValueError as e:
+                    return await self._send_json(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)})
+                return await self._send_json(writer, HTTPStatus.ACCEPTED, daemon_job.to_dict())
+
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await self._send_json(writer, HTTPStatus.NOT_FOUND, {"error": "任务不存在"})
+            if len(parts) == 2 and method == "GET":
+                return await self._send_json(writer, HTTPStatus.OK, job.to_dict())
+            if len(parts) == 2 and method == "DELETE":
+                if not self.cancel(job.id):
+                    return await self._send_json(writer, HTTPStatus.CONFLICT, {"error": "任务已结束"})
+                return await self._send_json(writer, HTTPStatus.ACCEPTED, job.to_dict())
+            if len(parts) == 3 and parts[2] == "events" and method == "GET":
+                return await self._stream_events(writer, job)
+
+        await self._send_json(writer, HTTPStatus.NOT_FOUND, {"error": f"未知接口: {method} {path}"})
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: HTTPStatus, data):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, job: DaemonJob):
+        """以 chunked 编码逐行推送事件（NDJSON），任务结束后关闭连接"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson; charset=utf-8\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        seen = 0
+        while True:
+            for event in job.events_since(seen):
+                line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+                writer.write(f"{len(line):X}\r\n".encode("latin-1") + line + b"\r\n")
+            seen = job.event_count
+            await writer.drain()
+            if job.finished and seen == job.event_count:
+                break
+            await job.wait_for_event(seen)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
@@ -0,0 +1,210 @@
+"""
+候选选择器竞速
+平台改版后页面元素的选择器经常变化，上传器里通常列了一组候选选择器。以前是一个个依次尝试，每个等十几秒，
+改版后要等大半分钟才轮到能用的那个。这里同时等待所有候选，返回第一个可见的元素。
+
+每次命中的候选按 平台 + 页面版本 + 元素 记录在磁盘上（CACHE_DIR/selectors.json，多次运行共享，写入时持有文件锁）：
+同时可见时优先使用上次命中的候选；参与竞速后连续多次超时未出现的候选排到最后
+（同时可见但没有被选中、或者因为已有候选可见而没有参与竞速的不算未命中）。
+"""
+import asyncio
+import copy
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from playwright.async_api import Error as PlaywrightError
+
+from conf import CACHE_DIR
+from .account_lock import file_lock
+from .log import logger
+from .page_waits import wait_recorder
+
+
+# 连续多少次竞速超时后降级（排到其他候选之后）
+DEMOTE_AFTER = 3
+
+
+class SelectorCache:
+    """各平台候选选择器的命中记录"""
+
+    def __init__(self, cache_file=None):
+        """
+        初始化缓存
+
+        Args:
+            cache_file: 缓存文件路径（默认 CACHE_DIR/selectors.json）
+        """
+        self.cache_file = Path(cache_file) if cache_file else CACHE_DIR / "selectors.json"
+        self.lock_file = self.cache_file.parent / "locks" / f"{self.cache_file.name}.lock"
+        # 最近一次读取 / 写入的内容：((mtime_ns, size), entries)，文件没有变化时不重新解析
+        self._loaded = None
+
+    @staticmethod
+    def _key(platform: str, variant: str, group: str) -> str:
+        return f"{platform}:{variant}:{group}"
+
+    @staticmethod
+    def _signature(stat) -> tuple:
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> dict:
+        """读取命中记录（返回副本；文件自上次读写后没有变化时直接使用内存中的内容）"""
+        try:
+            signature = self._signature(self.cache_file.stat())
+            if self._loaded is None or self._loaded[0] != signature:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    self._loaded = (signature, json.load(f))
+        except (OSError, ValueError):
+            return {}
+        return copy.deepcopy(self._loaded[1])
+
+    def _save(self, entries: dict):
+        """写入临时文件后原子替换，其他进程不会读到写了一半的文件"""
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.cache_file)
+        self._loaded = (self._signature(self.cache_file.stat()), entries)
+
+    def rank(self, platform: str, variant: str, group: str, names: list) -> list:
+        """
+        候选的优先顺序：最近命中的在前，降级的在后，其余保持原顺序
+
+        Args:
+            platform: 平台名称
+            variant: 页面版本
+            group: 元素名称
+            names: 候选名称（原顺序）
+
+        Returns:
+            排序后的候选名称
+        """
+        stats = self._load().get(self._key(platform, variant, group), {})
+
+        def score(name):
+            entry = stats.get(name, {})
+            return entry.get("misses", 0) >= DEMOTE_AFTER, -entry.get("last_win", 0), names.index(name)
+
+        return sorted(names, key=score)
+
+    def record(self, platform: str, variant: str, group: str, winner: str = None, visible=(), missed=()):
+        """
+        记录一次查找结果（在文件锁内重新读取后合并，不覆盖其他进程同时写入的记录）
+
+        Args:
+            platform: 平台名称
+            variant: 页面版本
+            group: 元素名称
+            winner: 命中的候选（None 表示都没有找到）
+            visible: 同时可见但没有被选中的候选（清零未命中次数）
+            missed: 参与竞速并超时未出现的候选（未命中次数加一）
+        """
+        try:
+            with file_lock(self.lock_file):
+                entries = self._load()
+                stats = entries.setdefault(self._key(platform, variant, group), {})
+                for name in {winner, *visible, *missed} - {None}:
+                    entry = stats.setdefault(name, {"wins": 0, "misses": 0, "last_win": 0})
+                    if name == winner:
+                        entry["wins"] += 1
+                        entry["misses"] = 0
+                        entry["last_win"] = time.time()
+                    elif name in visible:
+                        entry["misses"] = 0
+                    else:
+                        entry["misses"] += 1
+                self._save(entries)
+        except OSError as e:
+            logger.warning(f"[选择器] 写入命中记录失败: {e}")
+
+
+# 全局缓存实例
+selector_cache = SelectorCache()
+
+
+def page_variant(page) -> str:
+    """页面版本（默认按页面路径区分）"""
+    return urlparse(page.url).path or "/"
+
+
+async def _visible_now(locator) -> bool:
+    try:
+        return await locator.is_visible()
+    except PlaywrightError:
+        return False
+
+
+async def _race(locators: dict, order: list, timeout: float):
+    """
+    同时等待所有候选可见
+
+    Returns:
+        (最先可见的候选名称（同时可见时按 order 的顺序，超时为 None）, 同时可见的其他候选, 超时未出现的候选)
+    """
+    tasks = {asyncio.ensure_future(locators[name].wait_for(state="visible", timeout=timeout)): name
+             for name in order}
+    pending = set(tasks)
+    missed = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            visible = sorted((tasks[task] for task in done if task.exception() is None), key=order.index)
+            missed += [tasks[task] for task in done if task.exception() is not None]
+            if visible:
+                return visible[0], visible[1:], missed
+        return None, [], missed
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def first_visible(page, platform: str, group: str, candidates: list, timeout: float = 5000,
+                        variant: str = None, log=None):
+    """
+    同时等待一组候选元素，返回第一个可见的
+
+    Args:
+        page: Playwright Page 对象
+        platform: 平台名称
+        group: 元素名称（如 title / description，用于记录命中情况）
+        candidates: 候选列表，每项是选择器字符串，或者 (名称, Locator)
+        timeout: 最长等待时间（毫秒）
+        variant: 页面版本（默认按页面路径区分）
+        log: 输出日志的 logger（默认通用 logger）
+
+    Returns:
+        第一个可见的元素（Locator），都没有找到时返回 None
+    """
+    log = log or logger
+    variant = variant or page_variant(page)
+    locators = {}
+    for candidate in candidates:
+        name, locator = (candidate, page.locator(candidate)) if isinstance(candidate, str) else candidate
+        locators[name] = locator.first
+    names = list(locators)
+    order = selector_cache.rank(platform, variant, group, names)
+
+    start = time.perf_counter()
+    # 先看当前已经可见的（同时可见时按优先顺序），都不可见再竞速等待
+    shown = await asyncio.gather(*(_visible_now(locators[name]) for name in order))
+    visible = [name for name, is_shown in zip(order, shown) if is_shown]
+    missed = []
+    if visible:
+        winner, visible = visible[0], visible[1:]
+    else:
+        winner, visible, missed = await _race(locators, order, timeout)
+    elapsed = time.perf_counter() - start
+
+    wait_recorder.record(platform, group, elapsed, winner is not None)
+    # 写入命中记录（文件锁 + JSON 读写）放到线程里，不阻塞事件循环
+    await asyncio.to_thread(selector_cache.record, platform, variant, group, winner, visible, missed)
+    if winner is None:
+        log.warning(f"  [-] 未找到{group}（{len(names)} 个候选，{elapsed:.2f}s）")
+        return None
+    log.debug(f"  [-] 找到{group}: {winner}（{elapsed:.2f}s）")
+    return locators[winner]
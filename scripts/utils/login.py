@@ -1,14 +1,14 @@
 import asyncio
-import base64
-import sqlite3
 import uuid
 from pathlib import Path
 
-from playwright.async_api import async_playwright
+from utils.playwright_runtime import shared_playwright
 from conf import LOCAL_CHROME_PATH
 
-from myUtils.auth import check_cookie
-from utils.base_social_media import set_init_script
+from utils.auth import check_cookie, tiktok_waits
+from utils.account_store import STATUS_ACTIVE, account_store
+from utils.base_social_media import TIKTOK_LOGIN_FORM, TIKTOK_UPLOAD_SURFACE, set_init_script
+from utils.qr_login import capture_qr_image
 from conf import BASE_DIR
 
 # 抖音登录
@@ -18,7 +18,7 @@ async def douyin_cookie_gen(id,status_queue):
         # 检查是否是主框架的变化
         if page.url != original_url:
             url_changed_event.set()
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'headless': False
         }
@@ -68,14 +68,10 @@ async def douyin_cookie_gen(id,status_queue):
         await page.close()
         await context.close()
         await browser.close()
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO user_info (type, filePath, userName, status)
-                                VALUES (?, ?, ?, ?)
-                                ''', (3, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        # 登记到账号库（Cookie 文件按 uuid 命名，账号名为 id）
+        account_store.upsert("douyin", str(id), cookies_dir / f"{uuid_v1}.json", status=STATUS_ACTIVE,
+                             source="login")
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 
@@ -87,7 +83,7 @@ async def get_tencent_cookie(id,status_queue):
         if page.url != original_url:
             url_changed_event.set()
 
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB'
@@ -149,14 +145,10 @@ async def get_tencent_cookie(id,status_queue):
         await context.close()
         await browser.close()
 
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO user_info (type, filePath, userName, status)
-                                VALUES (?, ?, ?, ?)
-                                ''', (2, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        # 登记到账号库（Cookie 文件按 uuid 命名，账号名为 id）
+        account_store.upsert("tencent", str(id), cookies_dir / f"{uuid_v1}.json", status=STATUS_ACTIVE,
+                             source="login")
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 # 快手登录
@@ -166,7 +158,7 @@ async def get_ks_cookie(id,status_queue):
         # 检查是否是主框架的变化
         if page.url != original_url:
             url_changed_event.set()
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB'
@@ -225,14 +217,10 @@ async def get_ks_cookie(id,status_queue):
         await context.close()
         await browser.close()
 
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                        INSERT INTO user_info (type, filePath, userName, status)
-                                        VALUES (?, ?, ?, ?)
-                                        ''', (4, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        # 登记到账号库（Cookie 文件按 uuid 命名，账号名为 id）
+        account_store.upsert("kuaishou", str(id), cookies_dir / f"{uuid_v1}.json", status=STATUS_ACTIVE,
+                             source="login")
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 # 小红书登录
@@ -244,7 +232,7 @@ async def xiaohongshu_cookie_gen(id,status_queue):
         if page.url != original_url:
             url_changed_event.set()
 
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB'
@@ -301,14 +289,10 @@ async def xiaohongshu_cookie_gen(id,status_queue):
         await context.close()
         await browser.close()
 
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                           INSERT INTO user_info (type, filePath, userName, status)
-                           VALUES (?, ?, ?, ?)
-                           ''', (1, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        # 登记到账号库（Cookie 文件按 uuid 命名，账号名为 id）
+        account_store.upsert("xhs", str(id), cookies_dir / f"{uuid_v1}.json", status=STATUS_ACTIVE,
+                             source="login")
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 async def tiktok_cookie_gen(id, status_queue):
@@ -318,55 +302,7 @@ async def tiktok_cookie_gen(id, status_queue):
         if page.url != original_url:
             url_changed_event.set()
 
-    async def capture_qr_image(target_page):
-        # 依次尝试常见的 QR 选择器
-        selectors = [
-            "canvas[data-e2e='qr-code']",
-            "div[data-e2e='qr-code'] canvas",
-            "div[data-e2e='qr-code'] img",
-            "canvas",
-            "img[alt*='QR']",
-            "img[src*='data:image']",
-        ]
-
-        async def screenshot_from_locator(locator):
-            try:
-                await locator.wait_for(state="visible", timeout=5000)
-                # 优先尝试直接从 canvas 中获取 dataURL，避免截图时二维码尚未渲染
-                if await locator.evaluate("node => node.tagName === 'CANVAS' && !!node.toDataURL"):
-                    data_url = await locator.evaluate("node => node.toDataURL('image/png')")
-                    if data_url and data_url.startswith("data:image"):
-                        return data_url
-                return await locator.screenshot()
-            except Exception:
-                return None
-
-        # 页面级别先尝试
-        for selector in selectors:
-            selector_locator = target_page.locator(selector)
-            if await selector_locator.count():
-                locator = selector_locator.first
-                shot = await screenshot_from_locator(locator)
-                if shot:
-                    return shot
-
-        # 再尝试 iframe 内部
-        for frame in target_page.frames:
-            for selector in selectors:
-                selector_locator = frame.locator(selector)
-                if await selector_locator.count():
-                    locator = selector_locator.first
-                    shot = await screenshot_from_locator(locator)
-                    if shot:
-                        return shot
-
-        # 兜底：截取登录容器
-        container_locator = target_page.locator("div[data-e2e='qr-code']")
-        if await container_locator.count():
-            return await screenshot_from_locator(container_locator.first)
-        return None
-
-    async with async_playwright() as playwright:
+    async with shared_playwright() as playwright:
         options = {
             'args': [
                 '--lang en-GB'
@@ -381,7 +317,11 @@ async def tiktok_cookie_gen(id, status_queue):
         context = await set_init_script(context)
         page = await context.new_page()
         await page.goto("https://www.tiktok.com/login?lang=en")
-        await page.wait_for_load_state('networkidle')
+        # 等待登录方式列表、登录表单或上传区域（已登录时跳转）出现（代替 networkidle）
+        await tiktok_waits.locator(
+            page.locator("div[data-e2e='channel-item']")
+            .or_(page.locator(TIKTOK_LOGIN_FORM)).or_(page.locator(TIKTOK_UPLOAD_SURFACE)),
+            name="登录表单或上传区域", kind="navigation", required=False)
         # 优先直接跳转二维码登录页
         if "/login/qrcode" not in page.url:
             try:
@@ -427,13 +367,9 @@ async def tiktok_cookie_gen(id, status_queue):
             print("等待 TikTok 二维码绘制完成超时:", e)
 
         try:
-            qr_png = await capture_qr_image(page)
-            if not qr_png:
+            qr_code = await capture_qr_image(page)
+            if not qr_code:
                 raise RuntimeError("未找到TikTok二维码区域")
-            if isinstance(qr_png, str):
-                qr_code = qr_png if qr_png.startswith("data:image") else f"data:image/png;base64,{qr_png}"
-            else:
-                qr_code = "data:image/png;base64," + base64.b64encode(qr_png).decode()
             status_queue.put(qr_code)
         except Exception as e:
             print("获取TikTok二维码失败:", e)
@@ -473,14 +409,10 @@ async def tiktok_cookie_gen(id, status_queue):
         await context.close()
         await browser.close()
 
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                           INSERT INTO user_info (type, filePath, userName, status)
-                           VALUES (?, ?, ?, ?)
-                           ''', (5, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ TikTok 用户状态已记录")
+        # 登记到账号库（Cookie 文件按 uuid 命名，账号名为 id）
+        account_store.upsert("tiktok", str(id), cookies_dir / f"{uuid_v1}.json", status=STATUS_ACTIVE,
+                             source="login")
+        print("✅ TikTok 用户状态已记录")
         status_queue.put("200")
 
 # a = asyncio.run(xiaohongshu_cookie_gen(4,None))
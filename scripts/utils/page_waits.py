@@ -0,0 +1,205 @@
+"""
+页面等待
+上传器里原来到处是固定等待（asyncio.sleep / wait_for_timeout / networkidle），每次上传累计十几秒纯等待，
+页面慢的时候又可能等不够。这里把每个等待写成明确的就绪条件（元素状态、URL、响应、属性、页面函数），
+条件满足立即继续；超时时间按平台取 WAIT_PROFILES 中的配置，并记录每个等待实际用了多久。
+"""
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from conf import WAIT_TIMEOUT_SCALE
+from .log import logger
+
+
+# 各平台的超时配置（毫秒），按等待的类型区分；没有配置的类型使用 default
+#   ui: 点击后出现的下拉框 / 输入框等；dialog: 弹窗打开 / 关闭、图片处理；
+#   navigation: 页面跳转和页面主体加载；network: 等待接口响应
+WAIT_PROFILES = {
+    "default": {"ui": 5000, "dialog": 10000, "navigation": 30000, "network": 15000},
+    "tencent": {"dialog": 15000},
+    # TikTok 在海外，使用 Firefox，页面加载明显更慢
+    "tiktok": {"ui": 8000, "dialog": 15000, "navigation": 45000, "network": 30000},
+}
+
+
+class WaitRecorder:
+    """记录每个等待实际花费的时间"""
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, platform: str, name: str, elapsed: float, ok: bool):
+        stats = self._stats.setdefault((platform, name), {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0})
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        if not ok:
+            stats["timeouts"] += 1
+
+    def summary(self) -> list:
+        """
+        等待统计（按累计时间从多到少）
+
+        Returns:
+            [{platform, name, count, total, avg, max, timeouts}]，时间单位为秒
+        """
+        rows = []
+        for (platform, name), stats in self._stats.items():
+            rows.append({
+                "platform": platform,
+                "name": name,
+                "count": stats["count"],
+                "total": round(stats["total"], 3),
+                "avg": round(stats["total"] / stats["count"], 3),
+                "max": round(stats["max"], 3),
+                "timeouts": stats["timeouts"],
+            })
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def log_summary(self, limit: int = 5):
+        """输出累计耗时最多的几个等待"""
+        for row in self.summary()[:limit]:
+            logger.info(f"[等待] {row['platform']} {row['name']}: {row['count']} 次，平均 {row['avg']}s，"
+                        f"最长 {row['max']}s，超时 {row['timeouts']} 次")
+
+    def reset(self):
+        self._stats = {}
+
+
+# 全局记录实例
+wait_recorder = WaitRecorder()
+
+_ATTRIBUTE_CHECK = """([element, attribute, includes, excludes]) => {
+    const value = element.getAttribute(attribute) || '';
+    return (includes === null || value.includes(includes)) && (excludes === null || !value.includes(excludes));
+}"""
+
+
+class PageWaits:
+    """一个平台的等待条件"""
+
+    def __init__(self, platform: str, log=None):
+        """
+        初始化
+
+        Args:
+            platform: 平台名称（WAIT_PROFILES 的键，没有配置时使用 default）
+            log: 输出日志的 logger（默认通用 logger）
+        """
+        self.platform = platform
+        self.log = log or logger
+        self.profile = {**WAIT_PROFILES["default"], **WAIT_PROFILES.get(platform, {})}
+
+    def timeout(self, kind: str) -> float:
+        """某类等待的超时时间（毫秒）"""
+        return self.profile[kind] * WAIT_TIMEOUT_SCALE
+
+    async def _run(self, name: str, kind: str, required: bool, awaitable):
+        """
+        执行一个等待并记录耗时
+
+        Returns:
+            等待的结果；required 为 False 时超时返回 None
+        """
+        start = time.perf_counter()
+        try:
+            result = await awaitable
+        except PlaywrightTimeoutError:
+            elapsed = time.perf_counter() - start
+            wait_recorder.record(self.platform, name, elapsed, False)
+            if required:
+                raise
+            self.log.debug(f"  [-] 等待{name}超时（{elapsed:.2f}s，{kind}），继续执行")
+            return None
+        elapsed = time.perf_counter() - start
+        wait_recorder.record(self.platform, name, elapsed, True)
+        self.log.debug(f"  [-] 等待{name}: {elapsed:.2f}s")
+        return True if result is None else result
+
+    async def locator(self, locator, state: str = "visible", name: str = None, kind: str = "ui",
+                      required: bool = True) -> bool:
+        """
+        等待元素达到指定状态
+
+        Args:
+            locator: Playwright Locator（匹配多个元素时使用第一个）
+            state: visible / hidden / attached / detached
+            name: 等待的名称（用于日志和统计，默认使用选择器）
+            kind: 超时类型（WAIT_PROFILES 中的键）
+            required: 超时时是否抛出异常（False 时返回 False）
+
+        Returns:
+            是否在超时前达到状态
+        """
+        name = name or f"{locator} {state}"
+        result = await self._run(name, kind, required,
+                                 locator.first.wait_for(state=state, timeout=self.timeout(kind)))
+        return bool(result)
+
+    async def selector(self, target, selector: str, state: str = "visible", name: str = None, kind: str = "ui",
+                       required: bool = True) -> bool:
+        """等待 target（Page / Frame / Locator / FrameLocator）中的选择器达到指定状态，参数同 locator"""
+        return await self.locator(target.locator(selector), state, name or selector, kind, required)
+
+    async def url(self, page, url, name: str = None, kind: str = "navigation", required: bool = True) -> bool:
+        """等待页面地址匹配 url（字符串 / glob / 正则 / 函数）"""
+        result = await self._run(name or f"跳转到 {url}", kind, required,
+                                 page.wait_for_url(url, timeout=self.timeout(kind)))
+        return bool(result)
+
+    async def function(self, target, expression: str, arg=None, name: str = None, kind: str = "ui",
+                       required: bool = True) -> bool:
+        """等待页面中的 JS 表达式 / 函数返回真值（target 为 Page / Frame）"""
+        result = await self._run(name or expression, kind, required,
+                                 target.wait_for_function(expression, arg=arg, timeout=self.timeout(kind)))
+        return bool(result)
+
+    async def attribute(self, locator, attribute: str, includes: str = None, excludes: str = None,
+                        name: str = None, kind: str = "ui", required: bool = True) -> bool:
+        """
+        等待元素的属性满足条件（如 class 不再包含 disabled）
+
+        Args:
+            locator: Playwright Locator（使用第一个元素）
+            attribute: 属性名
+            includes: 属性值需要包含的文本
+            excludes: 属性值不能包含的文本（属性不存在视为满足）
+            其他参数同 locator
+        """
+        name = name or f"{locator} [{attribute}]"
+        timeout = self.timeout(kind)
+
+        async def wait():
+            handle = await locator.first.element_handle(timeout=timeout)
+            try:
+                frame = await handle.owner_frame()
+                await frame.wait_for_function(_ATTRIBUTE_CHECK, arg=[handle, attribute, includes, excludes],
+                                              timeout=timeout)
+            finally:
+                await handle.dispose()
+
+        return bool(await self._run(name, kind, required, wait()))
+
+    @asynccontextmanager
+    async def response(self, page, url_or_predicate, name: str = None, kind: str = "network"):
+        """
+        等待在代码块中触发的接口响应（超时抛出异常）
+
+            async with waits.response(page, "**/api/publish**") as response:
+                await button.click()
+            result = await (await response.value).json()
+        """
+        name = name or f"响应 {url_or_predicate}"
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with page.expect_response(url_or_predicate, timeout=self.timeout(kind)) as info:
+                yield info
+            await info.value
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - start
+            wait_recorder.record(self.platform, name, elapsed, ok)
+            self.log.debug(f"  [-] 等待{name}: {elapsed:.2f}s")
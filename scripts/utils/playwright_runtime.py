@@ -0,0 +1,100 @@
+"""
+进程级 Playwright 运行时
+整个进程共享一个 Playwright 驱动（Node 进程），第一次使用时才启动，进程退出前统一关闭。
+各模块用 shared_playwright() 代替 async_playwright()，校验 Cookie → 上传的整个流程只启动一次驱动。
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from playwright.async_api import Playwright, async_playwright
+
+from .browser_pool import browser_pool
+from .cookie_check import http_cookie_checker
+from .log import logger
+from .state_persistence import state_writer
+from .warm_pool import warm_pool
+
+
+class PlaywrightRuntime:
+    """进程级 Playwright 运行时"""
+
+    def __init__(self):
+        self._manager = None
+        self._playwright = None
+        self._loop = None
+        self._lock = None
+
+    def _bind_loop(self):
+        """驱动与事件循环绑定；换了事件循环（例如多次 asyncio.run）后旧驱动已不可用，重新启动"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._playwright is not None:
+                logger.warning("[Playwright] 事件循环已变化，丢弃旧驱动")
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._manager = None
+            self._playwright = None
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def get(self) -> Playwright:
+        """获取共享的 Playwright 实例（第一次调用时启动驱动）"""
+        self._bind_loop()
+        if self._playwright is None:
+            async with self._lock:
+                if self._playwright is None:
+                    manager = async_playwright()
+                    self._playwright = await manager.start()
+                    self._manager = manager
+                    logger.info("[Playwright] 驱动已启动")
+        return self._playwright
+
+    async def stop(self):
+        """写入延迟保存的 storage_state，关闭预热池、浏览器池、HTTP 校验客户端和驱动"""
+        await state_writer.flush_all()
+        if self._loop is not asyncio.get_running_loop() or self._playwright is None:
+            return
+        await warm_pool.close()
+        await browser_pool.close()
+        await http_cookie_checker.close()
+        manager, self._manager, self._playwright = self._manager, None, None
+        try:
+            await manager.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"[Playwright] 关闭驱动出错: {e}")
+        else:
+            logger.info("[Playwright] 驱动已关闭")
+
+    def run(self, coro):
+        """
+        asyncio.run() 的替代：执行入口协程，结束后（包括出错或 Ctrl+C）关闭共享驱动
+
+        Args:
+            coro: 入口协程
+
+        Returns:
+            协程的返回值
+        """
+        async def main():
+            try:
+                return await coro
+            finally:
+                await self.stop()
+
+        return asyncio.run(main())
+
+
+# 全局运行时实例
+playwright_runtime = PlaywrightRuntime()
+
+
+@asynccontextmanager
+async def shared_playwright():
+    """
+    async_playwright() 的替代：返回共享驱动，退出时不关闭驱动
+
+    在 async with 块中启动的浏览器必须自行关闭（或使用浏览器池），驱动不会再替你清理
+    """
+    yield await playwright_runtime.get()
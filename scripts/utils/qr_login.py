@@ -0,0 +1,529 @@
+"""
+扫码登录服务
+批量接入新账号时，同时为多个账号打开无头浏览器登录页，把二维码推送到本地网页（和终端 / PNG 文件），
+用手机依次扫码即可；检测到某个账号登录成功后立即保存 Cookie 并登记到账号库。
+
+接口（--login-port 不为 0 时）：
+    GET  /                 扫码页面（每秒刷新二维码和状态）
+    GET  /logins           列出所有登录会话（包括二维码 data URL）
+    POST /logins           新增登录会话（JSON：{"platform": ..., "account": ...}）
+    GET  /logins/{id}/qr   当前二维码图片（PNG）
+"""
+import asyncio
+import base64
+import json
+import time
+import uuid
+from datetime import datetime
+from http import HTTPStatus
+
+from playwright.async_api import Error as PlaywrightError, Page
+
+from conf import CACHE_DIR, LOCAL_CHROME_PATH
+from .account_lock import account_locks
+from .account_store import STATUS_ACTIVE
+from .auth_parking import auth_parking
+from .base_social_media import set_init_script
+from .browser_pool import browser_pool
+from .cookie_check import AUTH_COOKIES
+from .cookie_manager import cookie_manager
+from .log import logger
+from .playwright_runtime import playwright_runtime
+from .state_persistence import save_storage_state
+from .verify_cache import verification_cache
+
+
+# 通用的二维码选择器（平台专用的定位失败时依次尝试，包括 iframe 内部）
+QR_SELECTORS = (
+    "canvas[data-e2e='qr-code']",
+    "div[data-e2e='qr-code'] canvas",
+    "div[data-e2e='qr-code'] img",
+    "canvas",
+    "img[alt*='QR']",
+    "img[alt*='二维码']",
+    "img[src*='data:image']",
+)
+
+# 登录会话结束状态
+FINISHED_STATES = ("saved", "failed", "timeout", "cancelled")
+
+
+async def _open_kuaishou_qr(page: Page):
+    await page.get_by_role("link", name="立即登录").click()
+    await page.get_by_text("扫码登录").click()
+
+
+async def _open_xhs_qr(page: Page):
+    await page.locator("img.css-wemwzq").click()
+
+
+async def _open_tiktok_qr(page: Page):
+    if "/login/qrcode" not in page.url:
+        await page.goto("https://www.tiktok.com/login/qrcode")
+        await page.wait_for_url("**/login/qrcode*", timeout=10000)
+
+
+# 各平台的登录页、浏览器内核、显示二维码的操作和二维码定位
+QR_LOGIN_FLOWS = {
+    "douyin": {
+        "url": "https://creator.douyin.com/",
+        "engine": "chromium",
+        "prepare": None,
+        "qr": lambda page: page.get_by_role("img", name="二维码"),
+    },
+    "kuaishou": {
+        "url": "https://cp.kuaishou.com",
+        "engine": "chromium",
+        "prepare": _open_kuaishou_qr,
+        "qr": lambda page: page.get_by_role("img", name="qrcode"),
+    },
+    "tencent": {
+        "url": "https://channels.weixin.qq.com",
+        "engine": "chromium",
+        "prepare": None,
+        "qr": lambda page: page.frame_locator("iframe").first.get_by_role("img").first,
+    },
+    "xhs": {
+        "url": "https://creator.xiaohongshu.com/",
+        "engine": "chromium",
+        "prepare": _open_xhs_qr,
+        "qr": lambda page: page.get_by_role("img").nth(2),
+    },
+    "tiktok": {
+        "url": "https://www.tiktok.com/login?lang=en",
+        "engine": "chromium",
+        "prepare": _open_tiktok_qr,
+        "qr": lambda page: page.locator("canvas[data-e2e='qr-code'], div[data-e2e='qr-code'] canvas"),
+    },
+}
+
+
+async def _qr_from_locator(locator, timeout: float = 5000) -> str:
+    """从元素取二维码：canvas 直接导出，图片优先使用 data URL 的 src，否则截图；失败返回 None"""
+    try:
+        await locator.wait_for(state="visible", timeout=timeout)
+        tag = await locator.evaluate("node => node.tagName")
+        if tag == "CANVAS":
+            # 直接从 canvas 导出，避免截图时二维码尚未渲染
+            data_url = await locator.evaluate("node => node.toDataURL('image/png')")
+            if data_url and data_url.startswith("data:image") and len(data_url) > 1000:
+                return data_url
+        elif tag == "IMG":
+            src = await locator.get_attribute("src")
+            if src and src.startswith("data:image"):
+                return src
+        return "data:image/png;base64," + base64.b64encode(await locator.screenshot()).decode()
+    except Exception:
+        return None
+
+
+async def capture_qr_image(page: Page, locator=None) -> str:
+    """
+    获取页面上的二维码图片
+
+    Args:
+        page: 登录页
+        locator: 平台专用的二维码定位（优先尝试）
+
+    Returns:
+        二维码图片的 data URL，找不到时返回 None
+    """
+    if locator is not None:
+        qr = await _qr_from_locator(locator.first)
+        if qr:
+            return qr
+    # 页面级别先尝试，再尝试 iframe 内部
+    for frame in [page.main_frame] + [frame for frame in page.frames if frame is not page.main_frame]:
+        for selector in QR_SELECTORS:
+            selector_locator = frame.locator(selector)
+            if await selector_locator.count():
+                qr = await _qr_from_locator(selector_locator.first, timeout=1000)
+                if qr:
+                    return qr
+    # 兜底：截取登录容器
+    container = page.locator("div[data-e2e='qr-code']")
+    if await container.count():
+        return await _qr_from_locator(container.first)
+    return None
+
+
+def data_url_to_png(data_url: str) -> bytes:
+    """二维码 data URL 转成图片字节"""
+    return base64.b64decode(data_url.split(",", 1)[1])
+
+
+def has_auth_cookies(platform: str, cookies: list, now: float = None) -> bool:
+    """是否已经拿到平台的登录态 Cookie（存在且未过期）"""
+    names = AUTH_COOKIES.get(platform)
+    if not names:
+        return True
+    now = time.time() if now is None else now
+    return any(cookie.get("name") in names and cookie.get("value")
+               and (cookie.get("expires", -1) in (None, -1) or cookie["expires"] > now)
+               for cookie in cookies)
+
+
+class LoginSession:
+    """一个账号的扫码登录会话"""
+
+    def __init__(self, platform: str, account: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.platform = platform
+        self.account = account
+        self.status = "starting"
+        self.qr = None
+        self.qr_updated_at = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.events = []
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    async def emit(self, event: str, message: str = ""):
+        """记录一条进度事件并唤醒所有订阅者"""
+        self.events.append({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "event": event,
+            "message": message,
+        })
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_event(self, seen: int):
+        """等待新事件（事件数量超过 seen 或会话结束）"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.events) > seen or self.finished)
+
+    def to_dict(self, include_qr: bool = False) -> dict:
+        data = {
+            "id": self.id,
+            "platform": self.platform,
+            "account": self.account,
+            "status": self.status,
+            "error": self.error,
+            "qr_updated_at": self.qr_updated_at.isoformat(timespec="seconds") if self.qr_updated_at else None,
+            "duration": round(((self.finished_at or datetime.now()) - self.created_at).total_seconds(), 3),
+        }
+        if include_qr:
+            data["qr"] = self.qr if not self.finished else None
+        return data
+
+
+class QRLoginService:
+    """并发扫码登录服务"""
+
+    def __init__(self, concurrency: int = 8, timeout: float = 200, qr_dir=None, poll_interval: float = 1.0,
+                 qr_refresh: float = 5.0):
+        """
+        初始化扫码登录服务
+
+        Args:
+            concurrency: 同时打开的登录页数量
+            timeout: 每个账号等待扫码的最长时间（秒）
+            qr_dir: 二维码 PNG 的保存目录（默认 CACHE_DIR/qr），便于在终端中打开
+            poll_interval: 检查是否已登录的间隔（秒）
+            qr_refresh: 重新读取二维码的间隔（秒），平台刷新二维码后推送新的图片
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.qr_dir = qr_dir or CACHE_DIR / "qr"
+        self.poll_interval = poll_interval
+        self.qr_refresh = qr_refresh
+        self.sessions = {}
+        self.playwright = None
+        self._slots = None
+
+    # ---------------------------------------------------------------- 会话
+
+    def submit(self, platform: str, account: str = "default") -> LoginSession:
+        """
+        新增一个登录会话（同一账号已有进行中的会话时直接返回该会话）
+
+        Args:
+            platform: 平台名称
+            account: 账号名称
+
+        Returns:
+            登录会话
+        """
+        if platform not in QR_LOGIN_FLOWS:
+            raise ValueError(f"不支持扫码登录的平台: {platform}")
+        for session in self.sessions.values():
+            if (session.platform, session.account) == (platform, account) and not session.finished:
+                return session
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        session = LoginSession(platform, account)
+        self.sessions[session.id] = session
+        session.task = asyncio.get_running_loop().create_task(self._run(session))
+        logger.info(f"[扫码登录] 新增 {platform} 账号 {account}（会话 {session.id}）")
+        return session
+
+    async def login_all(self, accounts: list) -> list:
+        """
+        为一批账号并发扫码登录，全部结束后返回结果
+
+        Args:
+            accounts: [(platform, account)]
+
+        Returns:
+            每个会话的结果（to_dict 格式）
+        """
+        sessions = [self.submit(platform, account) for platform, account in accounts]
+        await asyncio.gather(*(session.task for session in sessions), return_exceptions=True)
+        return [session.to_dict() for session in sessions]
+
+    async def cancel_all(self):
+        """取消所有未结束的会话"""
+        tasks = [session.task for session in self.sessions.values() if session.task and not session.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _publish_qr(self, session: LoginSession, qr: str):
+        session.qr = qr
+        session.qr_updated_at = datetime.now()
+        session.status = "waiting_scan"
+        qr_file = self.qr_dir / f"{session.platform}_{session.account}.png"
+        try:
+            self.qr_dir.mkdir(parents=True, exist_ok=True)
+            qr_file.write_bytes(data_url_to_png(qr))
+        except (OSError, ValueError) as e:
+            logger.warning(f"[扫码登录] 保存二维码图片失败: {e}")
+        logger.info(f"[扫码登录] {session.platform} 账号 {session.account} 的二维码已更新，请扫码: {qr_file}")
+        await session.emit("qr", str(qr_file))
+
+    async def _run(self, session: LoginSession):
+        try:
+            async with self._slots:
+                await self._login(session)
+        except asyncio.CancelledError:
+            session.status = "cancelled"
+            raise
+        except Exception as e:
+            session.status = "failed"
+            session.error = str(e)
+            logger.error(f"[扫码登录] {session.platform} 账号 {session.account} 登录出错: {e}")
+        finally:
+            session.finished_at = datetime.now()
+            await session.emit(session.status, session.error or "")
+
+    async def _login(self, session: LoginSession):
+        """打开无头登录页，推送二维码，检测到登录后立即保存 Cookie"""
+        flow = QR_LOGIN_FLOWS[session.platform]
+        playwright = self.playwright or await playwright_runtime.get()
+        executable_path = LOCAL_CHROME_PATH if flow["engine"] == "chromium" else None
+        async with browser_pool.context(playwright, flow["engine"], headless=True,
+                                        executable_path=executable_path or None) as context:
+            context = await set_init_script(context)
+            page = await context.new_page()
+            await page.goto(flow["url"], wait_until="domcontentloaded")
+            if flow["prepare"] is not None:
+                await flow["prepare"](page)
+            original_url = page.url
+
+            # 主框架跳转说明可能已扫码成功（也可能只是二维码页刷新 / 单页应用内跳转），唤醒检查；
+            # 第一次跳转之后每轮都检查登录 Cookie，直到确认登录
+            navigated = asyncio.Event()
+            page.on("framenavigated",
+                    lambda frame: navigated.set() if frame == page.main_frame and page.url != original_url else None)
+
+            qr = await capture_qr_image(page, flow["qr"](page))
+            if not qr:
+                raise RuntimeError("未找到二维码")
+            await self._publish_qr(session, qr)
+
+            deadline = time.monotonic() + self.timeout
+            next_refresh = time.monotonic() + self.qr_refresh
+            check_cookies = False
+            while True:
+                if navigated.is_set():
+                    navigated.clear()
+                    check_cookies = True
+                if check_cookies and has_auth_cookies(session.platform, await context.cookies()):
+                    break
+                if time.monotonic() >= deadline:
+                    session.status = "timeout"
+                    session.error = f"{self.timeout:g} 秒内未扫码"
+                    logger.warning(f"[扫码登录] {session.platform} 账号 {session.account} 等待扫码超时")
+                    return
+                try:
+                    await asyncio.wait_for(navigated.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                # 没有确认登录之前一直刷新二维码（跳转后的页面上可能是新的二维码）
+                if time.monotonic() >= next_refresh:
+                    next_refresh = time.monotonic() + self.qr_refresh
+                    try:
+                        qr = await capture_qr_image(page, flow["qr"](page))
+                    except PlaywrightError as e:
+                        # 页面正在跳转，下一轮再取
+                        logger.debug(f"[扫码登录] 刷新二维码时页面发生变化: {e}")
+                        qr = None
+                    if qr and qr != session.qr:
+                        await self._publish_qr(session, qr)
+
+            session.status = "scanned"
+            await session.emit("scanned")
+            cookie_path = cookie_manager.get_cookie_path(session.platform, session.account)
+            async with account_locks.hold(cookie_path):
+                await save_storage_state(context, cookie_path, session.platform)
+
+        # 登录页已关闭，再用 HTTP 快速确认一次（无法判断时以登录 Cookie 为准）
+        verification_cache.invalidate(session.platform, session.account)
+        cookie_manager.store.upsert(session.platform, session.account, cookie_path, status=STATUS_ACTIVE,
+                                    source="login")
+        result = await cookie_manager.check_cookie(session.platform, session.account, use_cache=False,
+                                                   browser_fallback=False)
+        if result["valid"] is False:
+            session.status = "failed"
+            session.error = "登录后 Cookie 校验失败"
+            logger.error(f"[扫码登录] {session.platform} 账号 {session.account} 登录后 Cookie 校验失败")
+            return
+        if result["valid"] is None:
+            verification_cache.record(session.platform, session.account, cookie_path, source="login")
+        session.status = "saved"
+        auth_parking.notify(session.platform, session.account)
+        logger.success(f"[扫码登录] {session.platform} 账号 {session.account} 登录成功，Cookie 已保存到 {cookie_path}")
+
+    # ---------------------------------------------------------------- HTTP
+
+    async def serve(self, accounts: list, host: str = "127.0.0.1", port: int = 8766) -> list:
+        """
+        启动扫码页面，为一批账号（以及页面上新增的账号）并发登录，全部结束后关闭页面并返回结果
+
+        Args:
+            accounts: [(platform, account)]
+            host: 监听地址
+            port: 监听端口（0 表示不启动页面，只在终端输出二维码图片路径）
+
+        Returns:
+            每个会话的结果（to_dict 格式）
+        """
+        self.playwright = await playwright_runtime.get()
+        server = None
+        if port:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info(f"[扫码登录] 请在浏览器中打开 http://{host}:{port}/ 扫码")
+        try:
+            await self.login_all(accounts)
+            # 页面上新增的会话也等待结束
+            while pending := [session.task for session in self.sessions.values() if not session.task.done()]:
+                await asyncio.gather(*pending, return_exceptions=True)
+            return [session.to_dict() for session in self.sessions.values()]
+        finally:
+            await self.cancel_all()
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = b""
+            if int(headers.get("content-length", 0)):
+                body = await reader.readexactly(int(headers["content-length"]))
+            await self._route(method.upper(), target.split("?", 1)[0].rstrip("/"), body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.exception(f"[扫码登录] 处理请求出错: {e}")
+            await self._send(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = [part for part in path.split("/") if part]
+
+        if not parts and method == "GET":
+            return await self._send(writer, HTTPStatus.OK, LOGIN_PAGE.encode("utf-8"), "text/html; charset=utf-8")
+
+        if parts == ["logins"]:
+            if method == "GET":
+                return await self._send(writer, HTTPStatus.OK,
+                                        [session.to_dict(include_qr=True) for session in self.sessions.values()])
+            if method == "POST":
+                try:
+                    data = json.loads(body or b"{}")
+                    if not isinstance(data, dict) or not data.get("platform"):
+                        raise ValueError("请求体必须是包含 platform 的 JSON 对象")
+                    session = self.submit(data["platform"], data.get("account") or "default")
+                except ValueError as e:
+                    return await self._send(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)})
+                return await self._send(writer, HTTPStatus.ACCEPTED, session.to_dict())
+
+        if len(parts) == 3 and parts[0] == "logins" and parts[2] == "qr" and method == "GET":
+            session = self.sessions.get(parts[1])
+            if session is None or not session.qr or session.finished:
+                return await self._send(writer, HTTPStatus.NOT_FOUND, {"error": "没有可用的二维码"})
+            return await self._send(writer, HTTPStatus.OK, data_url_to_png(session.qr), "image/png")
+
+        await self._send(writer, HTTPStatus.NOT_FOUND, {"error": f"未知接口: {method} {path}"})
+
+    async def _send(self, writer: asyncio.StreamWriter, status: HTTPStatus, data,
+                    content_type: str = "application/json; charset=utf-8"):
+        payload = data if isinstance(data, bytes) else json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Cache-Control: no-store\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>扫码登录</title>
+<style>
+body { font-family: sans-serif; margin: 16px; background: #f5f5f5; }
+#sessions { display: flex; flex-wrap: wrap; gap: 12px; }
+.card { background: #fff; border-radius: 8px; padding: 12px; width: 220px; text-align: center; }
+.card img { width: 200px; height: 200px; object-fit: contain; }
+.saved { color: #2e7d32; } .failed, .timeout, .cancelled { color: #c62828; }
+</style>
+</head>
+<body>
+<h2>扫码登录</h2>
+<div id="sessions"></div>
+<script>
+async function refresh() {
+  try {
+    const sessions = await (await fetch("/logins")).json();
+    document.getElementById("sessions").innerHTML = sessions.map(s => `
+      <div class="card">
+        <div><b>${s.platform}</b> / ${s.account}</div>
+        ${s.qr ? `<img src="${s.qr}">` : ""}
+        <div class="${s.status}">${s.status}${s.error ? "：" + s.error : ""}</div>
+      </div>`).join("");
+  } catch (e) {}
+}
+refresh();
+setInterval(refresh, 1000);
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,191 @@
+"""
+登录态保活
+不常用的账号在两次上传之间登录态过期，上传时就会卡在扫码登录上。保活任务定期找出即将过期
+（或很久没有使用）的账号，用无头浏览器带着 Cookie 打开一个轻量的已登录页面，让平台续期 Cookie，
+然后保存新的 storage_state。
+
+可以在常驻服务中后台运行（--refresh-interval），也可以由 cron 定时执行一次（--refresh-sessions）。
+同时刷新的账号数有上限，每个账号开始前随机等待一段时间，避免瞬间打开大量页面。
+"""
+import asyncio
+import random
+import time
+
+from playwright.async_api import Playwright
+
+from .base_social_media import set_init_script
+from .browser_pool import browser_pool
+from .cookie_check import auth_cookies_expired
+from .cookie_expiry import EXPIRY_EXPIRED, EXPIRY_EXPIRING
+from .cookie_manager import cookie_manager
+from .log import logger
+from .playwright_runtime import playwright_runtime
+from .state_persistence import state_writer
+from .verify_cache import verification_cache
+
+
+# 各平台用于保活的已登录页面（尽量选择轻量的首页）和浏览器内核
+KEEPALIVE_PAGES = {
+    "douyin": ("https://creator.douyin.com/creator-micro/home", "chromium"),
+    "kuaishou": ("https://cp.kuaishou.com/profile", "chromium"),
+    "tencent": ("https://channels.weixin.qq.com/platform", "chromium"),
+    "tiktok": ("https://www.tiktok.com/tiktokstudio", "firefox"),
+    "xhs": ("https://creator.xiaohongshu.com/new/home", "chromium"),
+}
+
+# 落地页地址包含这些关键字时视为已跳转到登录页
+_LOGIN_MARKERS = ("login", "passport")
+
+
+class SessionRefresher:
+    """登录态保活任务"""
+
+    def __init__(self, refresh_hours: float = 48, idle_hours: float = 72, concurrency: int = 2,
+                 jitter: float = 30, timeout: float = 30000):
+        """
+        初始化保活任务
+
+        Args:
+            refresh_hours: 登录 Cookie 在多少小时内过期的账号需要保活
+            idle_hours: Cookie 文件超过多少小时没有更新的账号也需要保活（平台可能按闲置时间让会话失效）
+            concurrency: 同时保活的账号数上限
+            jitter: 每个账号开始前随机等待的最长时间（秒）
+            timeout: 打开保活页面的超时时间（毫秒）
+        """
+        self.refresh_hours = refresh_hours
+        self.idle_hours = idle_hours
+        self.concurrency = max(1, concurrency)
+        self.jitter = max(0, jitter)
+        self.timeout = timeout
+
+    def due_accounts(self, platforms: list = None, now: float = None) -> list:
+        """
+        找出需要保活的账号（离线，根据 Cookie 过期时间索引）
+
+        Args:
+            platforms: 只检查这些平台（默认全部支持保活的平台）
+            now: 当前时间戳（默认 time.time()）
+
+        Returns:
+            [(platform, account, reason)]，reason 为 expiring / idle；已过期的账号只能重新登录，不在其中
+        """
+        now = time.time() if now is None else now
+        index = cookie_manager.expiry_index
+        due = []
+        for entry in sorted(index.refresh().values(), key=lambda item: (item["platform"], item["account"])):
+            platform, account = entry["platform"], entry["account"]
+            if platform not in KEEPALIVE_PAGES or (platforms is not None and platform not in platforms):
+                continue
+            status = index.status_of(entry, self.refresh_hours, now)
+            if status == EXPIRY_EXPIRED:
+                logger.warning(f"[保活] {platform} 账号 {account} 的登录 Cookie 已过期，需要重新登录")
+            elif status == EXPIRY_EXPIRING:
+                due.append((platform, account, "expiring"))
+            elif now - entry["mtime_ns"] / 1e9 > self.idle_hours * 3600:
+                due.append((platform, account, "idle"))
+        return due
+
+    async def refresh_account(self, platform: str, account_name: str, playwright: Playwright = None) -> dict:
+        """
+        为一个账号保活：打开已登录页面，仍处于登录状态时保存续期后的 storage_state
+
+        Args:
+            platform: 平台名称
+            account_name: 账号名称
+            playwright: Playwright 实例（默认使用进程共享的驱动）
+
+        Returns:
+            {platform, account, status, expires_before, expires_after, error, duration}，
+            status 为 refreshed / logged_out / error
+        """
+        url, engine = KEEPALIVE_PAGES[platform]
+        cookie_path = cookie_manager.get_cookie_path(platform, account_name)
+        before = cookie_manager.get_cookie_expiry(platform, account_name) or {}
+        result = {"platform": platform, "account": account_name, "status": "error",
+                  "expires_before": before.get("expires_at"), "expires_after": None, "error": None}
+        start = time.perf_counter()
+        playwright = playwright or await playwright_runtime.get()
+        try:
+            storage_state = cookie_manager.store.storage_state(cookie_path)
+            async with browser_pool.context(playwright, engine, headless=True,
+                                            storage_state=storage_state) as context:
+                context = await set_init_script(context)
+                page = await context.new_page()
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout)
+                landing_url = page.url
+                state = await context.storage_state()
+
+            if any(marker in landing_url for marker in _LOGIN_MARKERS) or \
+                    auth_cookies_expired(platform, state.get("cookies", [])):
+                # 保留原文件，交给重新登录流程处理
+                logger.warning(f"[保活] {platform} 账号 {account_name} 已退出登录，需要重新登录")
+                verification_cache.invalidate(platform, account_name)
+                result["status"] = "logged_out"
+            else:
+                await state_writer.save(cookie_path, state, platform)
+                cookie_manager.store.upsert(platform, account_name, cookie_path)
+                verification_cache.record(platform, account_name, cookie_path, source="refresh")
+                after = cookie_manager.get_cookie_expiry(platform, account_name) or {}
+                result.update(status="refreshed", expires_after=after.get("expires_at"))
+                logger.success(f"[保活] {platform} 账号 {account_name} 的登录态已刷新")
+        except Exception as e:
+            logger.error(f"[保活] {platform} 账号 {account_name} 保活失败: {e}")
+            result["error"] = str(e)
+        result["duration"] = round(time.perf_counter() - start, 3)
+        return result
+
+    async def run_once(self, playwright: Playwright = None, platforms: list = None, limiter=None) -> list:
+        """
+        为所有需要保活的账号执行一轮保活
+
+        Args:
+            playwright: Playwright 实例（默认使用进程共享的驱动）
+            platforms: 只处理这些平台（默认全部）
+            limiter: 并发限制器（常驻服务中传入，保活与同一账号的上传任务不会同时进行）
+
+        Returns:
+            每个账号的保活结果（格式同 refresh_account）
+        """
+        due = self.due_accounts(platforms)
+        if not due:
+            logger.info("[保活] 没有需要保活的账号")
+            return []
+        playwright = playwright or await playwright_runtime.get()
+        # 同时打开的上下文不超过单个浏览器的上限
+        concurrency = max(1, min(self.concurrency, browser_pool.max_contexts_per_browser))
+        slots = asyncio.Semaphore(concurrency)
+        logger.info(f"[保活] 共 {len(due)} 个账号需要保活（并发 {concurrency}，随机延迟 0-{self.jitter:g} 秒）")
+
+        async def refresh(platform, account_name, reason):
+            await asyncio.sleep(random.uniform(0, self.jitter))
+            async with slots:
+                logger.info(f"[保活] {platform} 账号 {account_name}（{reason}）")
+                if limiter is None:
+                    result = await self.refresh_account(platform, account_name, playwright)
+                else:
+                    async with limiter.slot(platform, account_name):
+                        result = await self.refresh_account(platform, account_name, playwright)
+            result["reason"] = reason
+            return result
+
+        return await asyncio.gather(*(refresh(*item) for item in due))
+
+    async def run_forever(self, interval: float, playwright: Playwright = None, limiter=None):
+        """
+        后台定期保活（常驻服务中使用）
+
+        Args:
+            interval: 两轮保活之间的间隔（秒），实际间隔会加上随机延迟
+            playwright: Playwright 实例
+            limiter: 并发限制器
+        """
+        while True:
+            await asyncio.sleep(interval + random.uniform(0, self.jitter))
+            try:
+                await self.run_once(playwright, limiter=limiter)
+            except Exception as e:
+                logger.error(f"[保活] 保活出错: {e}")
+
+
+# 全局保活任务实例
+session_refresher = SessionRefresher()
@@ -0,0 +1,115 @@
+"""
+storage_state 压缩
+每次上传结束都会保存 storage_state，时间久了文件里会堆积几十个第三方域名的 Cookie 和 localStorage，
+每次 new_context(storage_state=...) 都要解析、安装全部内容。压缩只保留该平台登录需要的域名下的
+Cookie 和 origin，并去掉已经过期的 Cookie。
+
+保存 storage_state 时超过 STATE_COMPACT_THRESHOLD 会自动压缩；也可以用 upload.py --compact-cookies
+手动压缩所有账号并查看压缩前后的文件大小和创建上下文的耗时。
+"""
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from conf import STATE_COMPACT_THRESHOLD
+from .log import logger
+
+
+# 各平台登录需要保留的域名（包括子域名）
+AUTH_DOMAINS = {
+    "douyin": ("douyin.com", "iesdouyin.com"),
+    "kuaishou": ("kuaishou.com",),
+    "tencent": ("weixin.qq.com",),
+    "tiktok": ("tiktok.com", "tiktokv.com"),
+    "xhs": ("xiaohongshu.com",),
+}
+
+
+def _matches(host: str, domains: tuple) -> bool:
+    host = host.lower().lstrip(".")
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+def platform_of(cookie_path) -> str:
+    """根据文件名（platform_account.json）推断平台，无法推断时返回 None"""
+    platform = Path(cookie_path).stem.split("_", 1)[0]
+    return platform if platform in AUTH_DOMAINS else None
+
+
+def state_size(state: dict) -> int:
+    """storage_state 序列化后的字节数"""
+    return len(json.dumps(state, ensure_ascii=False).encode("utf-8"))
+
+
+def compact_state(platform: str, state: dict, now: float = None) -> dict:
+    """
+    只保留平台登录域名下未过期的 Cookie 和 origin
+
+    Args:
+        platform: 平台名称
+        state: storage_state
+        now: 当前时间戳（默认 time.time()）
+
+    Returns:
+        压缩后的 storage_state（不支持的平台原样返回）
+    """
+    domains = AUTH_DOMAINS.get(platform)
+    if domains is None:
+        return state
+    now = time.time() if now is None else now
+    cookies = [cookie for cookie in state.get("cookies", [])
+               if _matches(cookie.get("domain", ""), domains)
+               and (cookie.get("expires", -1) in (None, -1) or cookie["expires"] > now)]
+    origins = [origin for origin in state.get("origins", [])
+               if _matches(urlsplit(origin.get("origin", "")).hostname or "", domains)]
+    return dict(state, cookies=cookies, origins=origins)
+
+
+def compaction_stats(before: dict, after: dict) -> dict:
+    """压缩前后的大小和数量对比"""
+    return {
+        "bytes_before": state_size(before),
+        "bytes_after": state_size(after),
+        "cookies_before": len(before.get("cookies", [])),
+        "cookies_after": len(after.get("cookies", [])),
+        "origins_before": len(before.get("origins", [])),
+        "origins_after": len(after.get("origins", [])),
+    }
+
+
+def write_state(cookie_path, state: dict):
+    """写入临时文件后原子替换，读取方不会看到写了一半的文件"""
+    cookie_path = Path(cookie_path)
+    tmp_file = cookie_path.with_name(f"{cookie_path.name}.{os.getpid()}.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_file, cookie_path)
+
+
+def maybe_compact(platform: str, state: dict, threshold: int = None) -> dict:
+    """
+    序列化后超过阈值时压缩（保存 storage_state 前调用）
+
+    Args:
+        platform: 平台名称（None 时不压缩）
+        state: storage_state
+        threshold: 字节数阈值（默认 STATE_COMPACT_THRESHOLD，0 表示不自动压缩）
+
+    Returns:
+        压缩后的（或原来的）storage_state
+    """
+    threshold = STATE_COMPACT_THRESHOLD if threshold is None else threshold
+    if platform is None or threshold <= 0:
+        return state
+    size = state_size(state)
+    if size <= threshold:
+        return state
+    compacted = compact_state(platform, state)
+    stats = compaction_stats(state, compacted)
+    logger.info(f"[Cookie] {platform} storage_state 超过 {threshold // 1024}KB，已压缩: "
+                f"{stats['bytes_before'] // 1024}KB → {stats['bytes_after'] // 1024}KB，"
+                f"Cookie {stats['cookies_before']} → {stats['cookies_after']}，"
+                f"origin {stats['origins_before']} → {stats['origins_after']}")
+    return compacted
@@ -0,0 +1,181 @@
+"""
+storage_state 持久化
+上传结束后保存 storage_state 时，先与已保存的内容比较，没有变化就不写文件；
+有变化时写入临时文件再原子替换（持有账号锁），其他进程不会读到写了一半的文件。
+
+上传后的保存可以延迟合并（debounce）：同一账号连续上传时，只在最后一次保存后
+STATE_SAVE_DEBOUNCE 秒写一次文件。等待写入期间，本进程读取该账号的 storage_state
+（账号库 / 创建上下文）拿到的是内存中最新的内容；进程退出前（playwright_runtime.stop）全部写入。
+"""
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+
+from conf import STATE_SAVE_DEBOUNCE
+from .account_lock import account_locks
+from .log import logger
+from .state_compaction import maybe_compact, platform_of, write_state
+
+
+def state_digest(state: dict) -> str:
+    """storage_state 的规范化哈希（与 Cookie / origin 的顺序无关）"""
+    cookies = sorted(state.get("cookies", []),
+                     key=lambda cookie: (cookie.get("domain", ""), cookie.get("path", ""), cookie.get("name", "")))
+    origins = sorted(
+        ({"origin": origin.get("origin"),
+          "localStorage": sorted(origin.get("localStorage", []), key=lambda item: item.get("name", ""))}
+         for origin in state.get("origins", [])),
+        key=lambda origin: origin["origin"] or "")
+    canonical = json.dumps({"cookies": cookies, "origins": origins}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class StateWriter:
+    """storage_state 写入器：有变化才写、原子替换、可延迟合并"""
+
+    def __init__(self, debounce: float = STATE_SAVE_DEBOUNCE):
+        """
+        初始化写入器
+
+        Args:
+            debounce: 延迟合并的等待时间（秒），0 表示总是立即写入
+        """
+        self.debounce = debounce
+        self._digests = {}
+        self._pending = {}
+        self._timers = {}
+        self._callbacks = {}
+        self._loop = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 旧事件循环中的定时器已经失效，未写入的内容直接同步写入
+            for key, (state, _) in self._pending.items():
+                write_state(key, state)
+            self._loop = loop
+            self._pending = {}
+            self._timers = {}
+            self._callbacks = {}
+
+    def pending(self, cookie_path) -> dict:
+        """等待写入的 storage_state（没有时返回 None）"""
+        entry = self._pending.get(str(cookie_path))
+        return entry[0] if entry else None
+
+    def _saved_digest(self, key: str) -> str:
+        """当前文件内容的哈希（文件被其他进程改写过时重新计算）"""
+        path = Path(key)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        cached = self._digests.get(key)
+        if cached and cached[1:] == (stat.st_mtime_ns, stat.st_size):
+            return cached[0]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                digest = state_digest(json.load(f))
+        except (OSError, ValueError):
+            return None
+        self._digests[key] = (digest, stat.st_mtime_ns, stat.st_size)
+        return digest
+
+    async def save(self, cookie_path, state: dict, platform: str = None, debounce: bool = False) -> bool:
+        """
+        保存 storage_state（超过阈值时先压缩）
+
+        Args:
+            cookie_path: Cookie 文件路径
+            state: storage_state
+            platform: 平台名称（默认根据文件名推断）
+            debounce: 是否延迟合并写入（上传后的保存使用；登录后需要立即校验时不要使用）
+
+        Returns:
+            内容是否有变化（False 表示与已保存的内容相同，没有写入）
+        """
+        self._bind_loop()
+        key = str(cookie_path)
+        state = maybe_compact(platform or platform_of(key), state)
+        digest = state_digest(state)
+        current = self._pending[key][1] if key in self._pending else self._saved_digest(key)
+        if digest == current:
+            logger.debug(f"[Cookie] {Path(key).name} 没有变化，跳过写入")
+            return False
+
+        if debounce and self.debounce > 0:
+            self._pending[key] = (state, digest)
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            self._timers[key] = self._loop.create_task(self._flush_later(key))
+            return True
+
+        self._pending.pop(key, None)
+        await self._write(key, state, digest)
+        return True
+
+    def after_flush(self, cookie_path, callback):
+        """文件写入后执行 callback()；没有等待写入的内容时立即执行"""
+        key = str(cookie_path)
+        if key in self._pending:
+            self._callbacks.setdefault(key, []).append(callback)
+        else:
+            callback()
+
+    async def _write(self, key: str, state: dict, digest: str):
+        timer = self._timers.pop(key, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        async with account_locks.hold(key):
+            write_state(key, state)
+            stat = Path(key).stat()
+        self._digests[key] = (digest, stat.st_mtime_ns, stat.st_size)
+        for callback in self._callbacks.pop(key, []):
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[Cookie] 写入 {Path(key).name} 后的回调出错: {e}")
+
+    async def _flush_later(self, key: str):
+        await asyncio.sleep(self.debounce)
+        try:
+            await self.flush(key)
+        except Exception as e:
+            logger.error(f"[Cookie] 写入 {Path(key).name} 失败: {e}")
+
+    async def flush(self, cookie_path):
+        """立即写入等待中的内容"""
+        self._bind_loop()
+        key = str(cookie_path)
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            await self._write(key, *entry)
+
+    async def flush_all(self):
+        """写入所有等待中的内容（进程退出前调用）"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for key in list(self._pending):
+            await self.flush(key)
+
+
+# 全局写入器实例
+state_writer = StateWriter()
+
+
+async def save_storage_state(context, cookie_path, platform: str = None, debounce: bool = False) -> bool:
+    """
+    保存浏览器上下文的 storage_state：有变化才写入，原子替换，同一个 Cookie 文件的写入不会交错
+
+    Args:
+        context: Playwright 浏览器上下文
+        cookie_path: Cookie 文件路径
+        platform: 平台名称（默认根据文件名推断）
+        debounce: 是否延迟合并写入（同一账号连续上传时只写一次）
+
+    Returns:
+        内容是否有变化
+    """
+    return await state_writer.save(cookie_path, await context.storage_state(), platform, debounce)
@@ -0,0 +1,175 @@
+"""
+文本输入
+以前标题和话题是逐个字符模拟键盘输入，每个话题后再固定等待 0.2~2 秒让话题联想弹窗出来，长标题加 8 个话题要 20 多秒。
+这里用 keyboard.insert_text 一次插入整段文本（触发编辑器的 input 事件，普通输入框和 Draft.js 等富文本编辑器都能处理），
+插入后检查焦点输入框的内容确实变了，编辑器不接受时退回逐字输入；每个话题输入后只等到编辑器和话题联想弹窗不再变化就继续。
+
+各平台的话题格式、确认按键和等待时间见 TEXT_ENTRY_PROFILES。
+"""
+import time
+
+from conf import WAIT_TIMEOUT_SCALE
+from .log import logger
+from .page_waits import wait_recorder
+
+
+# 各平台的话题输入方式，没有配置的项使用 default
+#   tag: 话题文本格式；before / confirm / cleanup: 插入前 / 插入后 / 联想弹窗稳定后按的键
+#   bulk_tags: 话题是纯文本（发布时由平台识别），所有话题一次插入，不需要等联想弹窗
+#   quiet: 编辑器和联想弹窗多少毫秒没有变化视为稳定；limit: 最长等待（毫秒，乘以 WAIT_TIMEOUT_SCALE）
+TEXT_ENTRY_PROFILES = {
+    "default": {"tag": "#{tag} ", "before": (), "confirm": (), "cleanup": (), "bulk_tags": False,
+                "quiet": 400, "limit": 3000},
+    "tencent": {"bulk_tags": True},
+    # 原流程：插入 "#话题 " 后再按空格确认联想结果，弹窗消失后删掉多出的空格
+    "tiktok": {"before": ("End",), "confirm": ("Space",), "cleanup": ("Backspace", "End"), "quiet": 600,
+               "limit": 5000},
+}
+
+# 焦点输入框（穿过同源 iframe）的文本，拿不到时返回 null
+_FOCUSED_TEXT = """() => {
+    let element = document.activeElement;
+    try {
+        while (element && element.contentDocument) element = element.contentDocument.activeElement;
+    } catch (e) {
+        return null;
+    }
+    if (!element) return null;
+    return element.value !== undefined ? element.value : element.innerText;
+}"""
+
+# 等待焦点编辑器和话题联想弹窗稳定：编辑器内的变化，以及编辑器外包含话题文本的节点（联想列表）的变化，
+# quiet 毫秒内都没有发生时返回 true，超过 limit 毫秒返回 false；上传进度等无关的页面变化不计入
+_SETTLE_SCRIPT = """async ([quiet, limit, text]) => {
+    let doc = document;
+    try {
+        while (doc.activeElement && doc.activeElement.contentDocument) doc = doc.activeElement.contentDocument;
+    } catch (e) {}
+    const editor = doc.activeElement;
+    const related = (node) => {
+        if (!node) return false;
+        if (editor && editor !== doc.body && editor.contains(node)) return true;
+        return !!text && (node.textContent || '').includes(text);
+    };
+    return await new Promise((resolve) => {
+        let idle = null;
+        let deadline = null;
+        let observer = null;
+        const finish = (settled) => {
+            observer.disconnect();
+            clearTimeout(idle);
+            clearTimeout(deadline);
+            resolve(settled);
+        };
+        observer = new MutationObserver((mutations) => {
+            const changed = mutations.some((mutation) => {
+                if (editor && editor !== doc.body && editor.contains(mutation.target)) return true;
+                if (mutation.type === 'characterData') return related(mutation.target);
+                return Array.from(mutation.addedNodes).some(related) || Array.from(mutation.removedNodes).some(related);
+            });
+            if (changed) {
+                clearTimeout(idle);
+                idle = setTimeout(() => finish(true), quiet);
+            }
+        });
+        observer.observe(doc.documentElement, {subtree: true, childList: true, characterData: true});
+        idle = setTimeout(() => finish(true), quiet);
+        deadline = setTimeout(() => finish(false), limit);
+    });
+}"""
+
+
+class TextEntry:
+    """一个平台的标题 / 话题输入"""
+
+    def __init__(self, platform: str, log=None):
+        """
+        初始化
+
+        Args:
+            platform: 平台名称（TEXT_ENTRY_PROFILES 的键，没有配置时使用 default）
+            log: 输出日志的 logger（默认通用 logger）
+        """
+        self.platform = platform
+        self.log = log or logger
+        self.profile = {**TEXT_ENTRY_PROFILES["default"], **TEXT_ENTRY_PROFILES.get(platform, {})}
+
+    async def _focused_text(self, page):
+        try:
+            return await page.evaluate(_FOCUSED_TEXT)
+        except Exception:
+            return None
+
+    async def insert(self, page, text: str) -> bool:
+        """
+        在焦点输入框的光标处输入文本（先整段插入，输入框内容没有变化时退回逐字输入）
+
+        Args:
+            page: Playwright Page 对象
+            text: 要输入的文本
+
+        Returns:
+            是否整段插入成功（False 表示使用了逐字输入）
+        """
+        if not text:
+            return True
+        before = await self._focused_text(page)
+        await page.keyboard.insert_text(text)
+        after = await self._focused_text(page)
+        # 拿不到输入框内容（跨域 iframe 等）时视为成功
+        if before is None or after is None or after != before:
+            return True
+        self.log.debug(f"  [-] 输入框不接受整段插入，改为逐字输入（{len(text)} 个字符）")
+        await page.keyboard.type(text)
+        return False
+
+    async def settle(self, page, text: str = None, name: str = "话题联想") -> bool:
+        """
+        等待焦点编辑器和联想弹窗稳定
+
+        Args:
+            page: Playwright Page 对象
+            text: 刚输入的话题（用于识别联想列表）
+            name: 等待的名称（用于日志和统计）
+
+        Returns:
+            是否在最长等待时间内稳定
+        """
+        start = time.perf_counter()
+        try:
+            limit = self.profile["limit"] * WAIT_TIMEOUT_SCALE
+            settled = await page.evaluate(_SETTLE_SCRIPT, [self.profile["quiet"], limit, text])
+        except Exception as e:
+            self.log.debug(f"  [-] 等待{name}时页面发生变化: {e}")
+            settled = False
+        elapsed = time.perf_counter() - start
+        wait_recorder.record(self.platform, name, elapsed, settled)
+        self.log.debug(f"  [-] 等待{name}: {elapsed:.2f}s")
+        return settled
+
+    async def add_tags(self, page, tags: list) -> int:
+        """
+        在焦点编辑器的光标处依次输入话题
+
+        Args:
+            page: Playwright Page 对象
+            tags: 话题列表（不带 #）
+
+        Returns:
+            输入的话题数量
+        """
+        if not tags:
+            return 0
+        if self.profile["bulk_tags"]:
+            await self.insert(page, "".join(self.profile["tag"].format(tag=tag) for tag in tags))
+            return len(tags)
+        for tag in tags:
+            for key in self.profile["before"]:
+                await page.keyboard.press(key)
+            await self.insert(page, self.profile["tag"].format(tag=tag))
+            for key in self.profile["confirm"]:
+                await page.keyboard.press(key)
+            await self.settle(page, tag)
+            for key in self.profile["cleanup"]:
+                await page.keyboard.press(key)
+        return len(tags)
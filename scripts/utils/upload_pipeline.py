@@ -0,0 +1,111 @@
+"""
+上传流程分阶段执行
+以前各平台都是先等视频传完再填标题、话题、封面、定时等信息（或者只有一部分在上传期间完成），大文件上传时
+这些操作都排在传输之后。这里把上传流程拆成声明了依赖关系的阶段：不依赖上传结果的阶段在视频传输的同时执行，
+依赖上传的阶段（平台根据视频生成的封面等）在上传完成后执行，发布在所有阶段完成后执行。
+
+操作页面的阶段（点击、输入）共用同一个键盘焦点，通过 UI 锁按添加顺序依次执行；等待上传完成的阶段只观察页面，
+不占用 UI 锁，与它们并发。
+"""
+import asyncio
+import time
+
+from .log import logger
+
+
+class Stage:
+    """上传流程中的一个阶段"""
+
+    def __init__(self, name: str, func, after=(), ui: bool = True):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.ui = ui
+        self.started = None
+        self.finished = None
+
+
+class UploadPipeline:
+    """按依赖关系执行上传流程的各个阶段"""
+
+    def __init__(self, platform: str, log=None):
+        """
+        初始化
+
+        Args:
+            platform: 平台名称（用于日志）
+            log: 输出日志的 logger（默认通用 logger）
+        """
+        self.platform = platform
+        self.log = log or logger
+        self.stages = {}
+        self.ui_lock = asyncio.Lock()
+
+    def add(self, name: str, func, after=(), ui: bool = True) -> "UploadPipeline":
+        """
+        添加阶段
+
+        Args:
+            name: 阶段名称
+            func: async 函数 func(page)
+            after: 依赖的阶段名称（不存在的阶段忽略，便于按条件添加阶段）；"*" 表示此前添加的所有阶段
+            ui: 是否操作页面（操作页面的阶段依次执行）
+
+        Returns:
+            self，可以链式调用
+        """
+        if after == "*":
+            after = list(self.stages)
+        self.stages[name] = Stage(name, func, after, ui)
+        return self
+
+    def exclusive(self, func):
+        """包装 func(page)，执行时持有 UI 锁（用于非 UI 阶段中需要操作页面的回调，如重新上传）"""
+        async def wrapper(page):
+            async with self.ui_lock:
+                return await func(page)
+        return wrapper
+
+    async def _run_stage(self, stage: Stage, page, done: dict):
+        for name in stage.after:
+            if name in done:
+                await done[name].wait()
+        if stage.ui:
+            async with self.ui_lock:
+                await self._execute(stage, page)
+        else:
+            await self._execute(stage, page)
+        done[stage.name].set()
+
+    async def _execute(self, stage: Stage, page):
+        stage.started = time.perf_counter()
+        self.log.debug(f"  [-] 开始阶段 {stage.name}")
+        await stage.func(page)
+        stage.finished = time.perf_counter()
+
+    async def run(self, page):
+        """
+        执行所有阶段，任一阶段出错时取消其余阶段并抛出该异常
+
+        Args:
+            page: Playwright Page 对象
+        """
+        done = {name: asyncio.Event() for name in self.stages}
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(self._run_stage(stage, page, done)) for stage in self.stages.values()]
+        try:
+            finished, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in finished:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.log.info(f"  [-] 各阶段耗时（秒）: {self.timeline(start)}，共 {time.perf_counter() - start:.1f}s")
+
+    def timeline(self, start: float) -> str:
+        """各阶段的开始 - 结束时间（相对流程开始）"""
+        return "，".join(f"{stage.name} {stage.started - start:.1f}-{stage.finished - start:.1f}"
+                        for stage in sorted(self.stages.values(), key=lambda stage: stage.started)
+                        if stage.finished is not None)
@@ -0,0 +1,296 @@
+"""
+上传进度跟踪
+以前上传时只有每 2 秒一条"正在上传视频中..."，看不出是传到了 95% 还是卡住了。这里监听上传页的网络请求
+（request / requestfinished / requestfailed），把发往平台上传地址（UPLOAD_URL_PATTERNS）、请求体较大的
+POST / PUT 视为上传请求（分片上传的每个分片，或者一次 PUT 整个文件），统计已发送的字节数、速度和预计剩余时间，
+输出到日志并通知回调。请求大小只取 Content-Length，不读取请求体。
+
+同时检测上传停滞：上传请求迟迟没有完成（超过 UPLOAD_STALL_TIMEOUT 秒，且按最低速度估算也早该完成），
+wait_for_upload 会立即调用上传器的 handle_upload_error 重新上传，不必等到平台页面报错。
+"""
+import asyncio
+import re
+import time
+from collections import deque
+from pathlib import Path
+
+from conf import UPLOAD_STALL_TIMEOUT
+from .log import logger
+
+
+# 请求体不小于该大小（字节）的 POST / PUT 视为上传请求
+UPLOAD_REQUEST_MIN_BYTES = 64 * 1024
+# 各平台视频上传请求的地址（正则，匹配任意一个即可）；页面上其他较大的 POST（埋点、日志上报等）不计入进度，
+# 也不会触发停滞重传。没有配置的平台统计所有较大的 POST / PUT
+_BYTEDANCE_VOD = r"//tos-[^/]*\.(snssdk|bytedance|douyinvod|tiktokv|byteoversea|ibyteimg)\.com/"
+UPLOAD_URL_PATTERNS = {
+    "douyin": (r"/upload/v1/", _BYTEDANCE_VOD),
+    "tiktok": (r"/upload/v1/", _BYTEDANCE_VOD),
+    "tiktok_studio": (r"/upload/v1/", _BYTEDANCE_VOD),
+    "kuaishou": (r"//upload[^/]*\.kuaishouzt\.com/", r"/api/upload/(fragment|resume)"),
+    "tencent": (r"//[^/]*(qq\.com|tencent-cloud\.com)/[^?]*upload",),
+}
+# 判断停滞时假定的最低上传速度（字节/秒）：大请求（整个文件一次 PUT）按该速度估算应当完成的时间
+UPLOAD_STALL_MIN_RATE = 128 * 1024
+# 计算上传速度的时间窗口（秒）
+_SPEED_WINDOW = 20
+
+# 进度监听函数（所有上传的进度都会通知），见 add_progress_listener
+_listeners = []
+# 正在跟踪的页面 {page: UploadProgressTracker}
+_trackers = {}
+
+
+def add_progress_listener(callback):
+    """注册进度监听函数 callback(snapshot)，snapshot 格式见 UploadProgressTracker.snapshot"""
+    _listeners.append(callback)
+
+
+def remove_progress_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def tracker_for(page):
+    """页面上正在运行的进度跟踪器（没有时返回 None）"""
+    return _trackers.get(page)
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.2f}GB"
+
+
+class UploadProgressTracker:
+    """一个页面上的视频上传进度"""
+
+    def __init__(self, page, platform: str, file_path, on_progress=None, log=None,
+                 stall_timeout: float = UPLOAD_STALL_TIMEOUT, log_interval: float = 10):
+        """
+        初始化跟踪器
+
+        Args:
+            page: Playwright Page 对象
+            platform: 平台名称
+            file_path: 上传的视频文件
+            on_progress: 进度变化时调用的函数 on_progress(snapshot)
+            log: 输出日志的 logger（默认通用 logger）
+            stall_timeout: 上传请求超过多少秒没有完成视为停滞，0 表示不检测
+            log_interval: 输出进度日志的最短间隔（秒）
+        """
+        self.page = page
+        self.platform = platform
+        self.file_path = str(file_path)
+        self.total = Path(file_path).stat().st_size
+        self.on_progress = on_progress
+        self.log = log or logger
+        self.stall_timeout = stall_timeout
+        self.log_interval = log_interval
+        self.stalled = asyncio.Event()
+        patterns = UPLOAD_URL_PATTERNS.get(platform)
+        self._url_pattern = re.compile("|".join(patterns)) if patterns else None
+        self._watchdog = None
+        self._handlers = []
+        self._reset()
+
+    def _reset(self):
+        self.sent = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self.started_at = None
+        self._requests = {}
+        self._samples = deque()
+        self._last_log = 0
+        self.stalled.clear()
+
+    async def start(self):
+        """开始监听页面请求（在选择视频文件之前调用）"""
+        handlers = [("request", self._on_request), ("requestfinished", self._on_finished),
+                    ("requestfailed", self._on_failed), ("close", lambda _: self.stop())]
+        for event, handler in handlers:
+            self.page.on(event, handler)
+        self._handlers = handlers
+        _trackers[self.page] = self
+        if self.stall_timeout > 0:
+            self._watchdog = asyncio.get_running_loop().create_task(self._watch_stall())
+        return self
+
+    def stop(self):
+        """停止监听"""
+        for event, handler in self._handlers:
+            self.page.remove_listener(event, handler)
+        self._handlers = []
+        if _trackers.get(self.page) is self:
+            del _trackers[self.page]
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+
+    def restart(self):
+        """重新上传后从头统计"""
+        self._reset()
+
+    # ---- 网络事件 ----
+
+    def is_upload_request(self, request) -> bool:
+        """是否可能是视频上传请求（大小在 _measure 中判断）"""
+        if request.method not in ("POST", "PUT"):
+            return False
+        return self._url_pattern is None or self._url_pattern.search(request.url) is not None
+
+    def _on_request(self, request):
+        if self.is_upload_request(request):
+            # 先登记再异步读取请求大小，请求很快完成时也不会漏掉
+            entry = {"size": None, "started": time.monotonic(), "finished": False}
+            self._requests[request] = entry
+            asyncio.get_running_loop().create_task(self._measure(request, entry))
+
+    async def _measure(self, request, entry: dict):
+        # 只用 Content-Length：读取 post_data_buffer 会把整个分片从驱动复制到 Python
+        try:
+            size = int(await request.header_value("content-length") or 0)
+        except Exception:
+            size = 0
+        if self._requests.get(request) is not entry:
+            return
+        if size < UPLOAD_REQUEST_MIN_BYTES:
+            del self._requests[request]
+            return
+        entry["size"] = size
+        if self.started_at is None:
+            self.started_at = entry["started"]
+            self._samples.append((entry["started"], self.sent))
+        if entry["finished"]:
+            self._complete(request, entry)
+
+    def _on_finished(self, request):
+        entry = self._requests.get(request)
+        if entry is None:
+            return
+        entry["finished"] = True
+        if entry["size"] is not None:
+            self._complete(request, entry)
+
+    def _complete(self, request, entry: dict):
+        del self._requests[request]
+        self.sent = min(self.total, self.sent + entry["size"])
+        self.requests += 1
+        now = time.monotonic()
+        self._samples.append((now, self.sent))
+        while len(self._samples) > 2 and now - self._samples[0][0] > _SPEED_WINDOW:
+            self._samples.popleft()
+        self._report()
+
+    def _on_failed(self, request):
+        entry = self._requests.pop(request, None)
+        if entry is not None and entry["size"] is not None:
+            # 平台通常会自动重传失败的分片
+            self.failed_requests += 1
+            self.log.warning(f"  [-] 上传请求失败: {request.failure}")
+
+    def _in_flight(self) -> list:
+        """正在上传的请求 [(size, started)]"""
+        return [(entry["size"], entry["started"]) for entry in self._requests.values()
+                if entry["size"] is not None and not entry["finished"]]
+
+    # ---- 进度 ----
+
+    @property
+    def speed(self) -> float:
+        """最近一段时间的上传速度（字节/秒）"""
+        if len(self._samples) < 2:
+            return 0.0
+        (start, start_sent), end_sent = self._samples[0], self._samples[-1][1]
+        # 计算到当前时间，没有新的分片完成时速度逐渐下降
+        elapsed = time.monotonic() - start
+        return (end_sent - start_sent) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        """
+        当前进度
+
+        Returns:
+            {platform, file, sent, total, percent, speed, eta, requests, in_flight, failed_requests, stalled}，
+            speed 为字节/秒，eta 为预计剩余秒数（无法估算时为 None）
+        """
+        speed = self.speed
+        remaining = max(0, self.total - self.sent)
+        return {
+            "platform": self.platform,
+            "file": self.file_path,
+            "sent": self.sent,
+            "total": self.total,
+            "percent": round(self.sent * 100 / self.total, 1) if self.total else 100.0,
+            "speed": round(speed),
+            "eta": round(remaining / speed) if speed > 0 else None,
+            "requests": self.requests,
+            "in_flight": len(self._in_flight()),
+            "failed_requests": self.failed_requests,
+            "stalled": self.stalled.is_set(),
+        }
+
+    def _report(self, force: bool = False):
+        snapshot = self.snapshot()
+        for callback in ([self.on_progress] if self.on_progress else []) + _listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                self.log.warning(f"  [-] 上传进度回调出错: {e}")
+        now = time.monotonic()
+        if force or now - self._last_log >= self.log_interval:
+            self._last_log = now
+            eta = f"，预计还需 {snapshot['eta']}s" if snapshot["eta"] is not None else ""
+            self.log.info(f"  [-] 已上传 {snapshot['percent']}%（{_format_size(self.sent)}/{_format_size(self.total)}，"
+                          f"{_format_size(snapshot['speed'])}/s{eta}）")
+
+    def summary(self) -> str:
+        """上传结束时的统计"""
+        if self.started_at is None:
+            return "未识别到上传请求"
+        elapsed = time.monotonic() - self.started_at
+        return (f"{_format_size(self.sent)}，{self.requests} 个请求，"
+                f"平均 {_format_size(self.sent / elapsed if elapsed > 0 else 0)}/s")
+
+    # ---- 停滞检测 ----
+
+    def _stall_reason(self, now: float) -> str:
+        """正在上传的请求中最早的一个超过预计时间仍未完成时返回原因"""
+        for size, started in self._in_flight():
+            elapsed = now - started
+            if elapsed > max(self.stall_timeout, size / UPLOAD_STALL_MIN_RATE):
+                return f"{_format_size(size)} 的上传请求 {elapsed:.0f}s 未完成"
+        return None
+
+    async def _watch_stall(self):
+        while True:
+            await asyncio.sleep(1)
+            if self.stalled.is_set():
+                continue
+            reason = self._stall_reason(time.monotonic())
+            if reason:
+                self.log.error(f"  [-] 上传停滞: {reason}")
+                self.stalled.set()
+                self._report(force=True)
+
+
+async def track_upload(page, platform: str, file_path, on_progress=None, log=None) -> UploadProgressTracker:
+    """
+    开始跟踪页面上的视频上传（在选择视频文件之前调用，wait_for_upload 结束时自动停止）
+
+    Args:
+        page: Playwright Page 对象
+        platform: 平台名称
+        file_path: 上传的视频文件
+        on_progress: 进度变化时调用的函数 on_progress(snapshot)
+        log: 输出日志的 logger
+
+    Returns:
+        进度跟踪器
+    """
+    previous = tracker_for(page)
+    if previous is not None:
+        previous.stop()
+    return await UploadProgressTracker(page, platform, file_path, on_progress, log).start()
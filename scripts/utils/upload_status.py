@@ -0,0 +1,245 @@
+"""
+上传完成检测
+以前各平台上传后每 2 秒轮询一次页面元素判断视频是否传完，平均要多等 1 秒，出错时也要等到下一轮才发现。
+这里在页面中注入 MutationObserver，按各平台的"完成 / 失败"信号判断，页面一变化就立即返回结果。
+
+各平台的信号定义在 UPLOAD_SIGNALS 中（页面中执行的 JS 表达式，可以使用 withText / pageText / all 辅助函数），
+与原来轮询时使用的选择器一致。
+"""
+import asyncio
+import time
+
+from playwright.async_api import Error as PlaywrightError
+
+from .log import logger
+from .upload_progress import tracker_for
+
+
+# 各平台上传完成 / 失败的信号
+#   done: 上传完成；failed: 上传出错（需要重新选择文件，为 None 表示没有失败信号）
+#   started: 上传已经开始（配置后，看到该信号之前不检查 failed，避免把选择文件前的页面误判为出错）
+#   frame: 上传表单所在的 iframe（不存在时使用主页面）
+#   timeout: 最长等待时间（秒），None 表示一直等待
+UPLOAD_SIGNALS = {
+    "douyin": {
+        "done": "withText('[class^=\"long-card\"] div', '重新上传')",
+        "failed": "withText('div.progress-div > div', '上传失败')",
+    },
+    "kuaishou": {
+        "done": "!pageText('上传中')",
+        "failed": None,
+        "timeout": 120,
+    },
+    "tencent": {
+        "done": "all('button').some(node => node.textContent.trim() === '发表'"
+                " && !node.className.includes('weui-desktop-btn_disabled'))",
+        "failed": "all('div.status-msg.error').length > 0"
+                  " && withText('div.media-status-content div.tag-inner', '删除')",
+    },
+    # "Select file" 按钮在选择文件前就存在，选择文件后被上传表单替换，出错时重新出现
+    "tiktok": {
+        "done": "all('div.btn-post > button').some(node => !node.hasAttribute('disabled'))",
+        "failed": "all('button[aria-label=\"Select file\"]').length > 0",
+        "started": "all('button[aria-label=\"Select file\"]').length === 0",
+        "frame": 'iframe[data-tt="Upload_index_iframe"]',
+    },
+    # TikTok Studio 上传页（main_chrome.py）
+    "tiktok_studio": {
+        "done": "all('div.button-group > button').some(node => node.textContent.includes('Post')"
+                " && !node.hasAttribute('disabled'))",
+        "failed": "all('button[aria-label=\"Select file\"]').length > 0",
+        "started": "all('button[aria-label=\"Select file\"]').length === 0",
+        "frame": 'iframe[data-tt="Upload_index_iframe"]',
+    },
+}
+
+# 在页面中等待信号：当前已满足时立即返回，否则监听 DOM 变化，超过 wait 毫秒返回 pending；
+# started 为 false 时不检查失败信号，出现开始信号时返回 started
+_WATCH_SCRIPT = """
+async ([wait, started]) => {
+    const all = (selector) => Array.from(document.querySelectorAll(selector));
+    const withText = (selector, text) => all(selector).some(node => (node.textContent || '').includes(text));
+    const pageText = (text) => {
+        const root = document.body || document.documentElement;
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT, {
+            acceptNode: (node) => ['SCRIPT', 'STYLE', 'NOSCRIPT'].includes(node.parentNode && node.parentNode.nodeName)
+                ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT,
+        });
+        while (walker.nextNode()) {
+            if (walker.currentNode.nodeValue.includes(text)) return true;
+        }
+        return false;
+    };
+    const check = () => {
+        if (__DONE__) return 'done';
+        if (!started) return (__STARTED__) ? 'started' : null;
+        if (__FAILED__) return 'failed';
+        return null;
+    };
+    const current = check();
+    if (current) return current;
+    return await new Promise((resolve) => {
+        let timer = null;
+        const observer = new MutationObserver(() => {
+            const state = check();
+            if (state) {
+                observer.disconnect();
+                clearTimeout(timer);
+                resolve(state);
+            }
+        });
+        observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true, characterData: true});
+        timer = setTimeout(() => {
+            observer.disconnect();
+            resolve(check() || 'pending');
+        }, wait);
+    });
+}
+"""
+
+# 单次监听的最长时间（毫秒）：到时返回 pending，重新定位 iframe 并输出进度日志后继续监听
+_WATCH_SLICE = 30000
+# 重新上传后等待失败提示消失的最长时间（毫秒）
+_FAILED_CLEAR_WAIT = 10000
+
+
+def watch_script(signals: dict) -> str:
+    """生成在页面中等待上传信号的脚本"""
+    return (_WATCH_SCRIPT
+            .replace("__DONE__", f"({signals['done']})")
+            .replace("__FAILED__", f"({signals.get('failed') or 'false'})")
+            .replace("__STARTED__", f"({signals.get('started') or 'true'})"))
+
+
+async def _signal_frame(page, signals: dict):
+    """上传表单所在的 frame"""
+    selector = signals.get("frame")
+    if selector:
+        element = await page.query_selector(selector)
+        if element is not None:
+            frame = await element.content_frame()
+            if frame is not None:
+                return frame
+    return page.main_frame
+
+
+async def _watch(page, signals: dict, script: str, wait: int, started: bool, progress) -> str:
+    """在页面中等待一次信号；有进度跟踪器时上传停滞也会立即返回 stalled"""
+    frame = await _signal_frame(page, signals)
+    if progress is None:
+        return await frame.evaluate(script, [wait, started])
+    watch = asyncio.ensure_future(frame.evaluate(script, [wait, started]))
+    stalled = asyncio.ensure_future(progress.stalled.wait())
+    try:
+        await asyncio.wait({watch, stalled}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stalled.cancel()
+    if watch.done():
+        return watch.result()
+    watch.cancel()
+    return "stalled"
+
+
+async def wait_for_upload(page, platform: str, on_failed=None, log=None, timeout: float = None,
+                          max_failures: int = 5) -> bool:
+    """
+    等待视频上传完成（页面出现完成信号时立即返回）
+
+    选择文件前用 upload_progress.track_upload 开始跟踪时，等待期间输出上传进度，
+    上传停滞时与失败信号一样调用 on_failed 重新上传；返回时停止跟踪。
+
+    Args:
+        page: Playwright Page 对象
+        platform: 平台名称（UPLOAD_SIGNALS 的键）
+        on_failed: 出现失败信号时调用的 async 函数 on_failed(page)（重新上传），为 None 时直接报错
+        log: 输出日志的 logger（默认通用 logger）
+        timeout: 最长等待时间（秒），默认使用平台定义，None 表示一直等待
+        max_failures: 最多重新上传的次数
+
+    Returns:
+        是否上传完成（False 表示等待超时）
+
+    Raises:
+        RuntimeError: 上传失败且无法重试
+    """
+    progress = tracker_for(page)
+    try:
+        return await _wait_for_upload(page, platform, on_failed, log or logger, timeout, max_failures, progress)
+    finally:
+        if progress is not None:
+            progress.stop()
+
+
+async def _wait_for_upload(page, platform, on_failed, log, timeout, max_failures, progress) -> bool:
+    signals = UPLOAD_SIGNALS[platform]
+    script = watch_script(signals)
+    # 重新上传后等待失败信号消失，避免对同一个失败提示重复重试
+    cleared_script = watch_script({"done": f"!({signals.get('failed') or 'false'})"})
+    if timeout is None:
+        timeout = signals.get("timeout")
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    failures = 0
+    # 没有开始信号的平台从一开始就检查失败信号
+    started = not signals.get("started")
+
+    log.info("  [-] 正在上传视频中...")
+    while True:
+        wait = _WATCH_SLICE
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            wait = min(wait, max(1, int(remaining * 1000)))
+
+        try:
+            state = await _watch(page, signals, script, wait, started, progress)
+        except PlaywrightError as e:
+            if page.is_closed():
+                raise
+            # 页面跳转 / iframe 重新加载时脚本上下文失效，稍后重新注入
+            log.debug(f"  [-] 检测上传状态时页面发生变化: {e}")
+            await asyncio.sleep(0.5)
+            continue
+
+        if state == "started":
+            started = True
+            continue
+        if state == "done":
+            stats = f"，{progress.summary()}" if progress is not None else ""
+            log.success(f"  [-]视频上传完毕（{time.monotonic() - start:.1f}s{stats}）")
+            return True
+        if state == "stalled":
+            failures += 1
+            if on_failed is None or failures > max_failures:
+                log.warning("  [-] 上传停滞，继续等待平台处理")
+            else:
+                log.error(f"  [-] 上传停滞... 准备重试（第 {failures} 次）")
+                try:
+                    await on_failed(page)
+                except Exception as e:
+                    # 页面上没有出错状态时重新上传的入口可能不存在，继续等待
+                    log.warning(f"  [-] 重新上传失败: {e}")
+            progress.restart()
+            continue
+        if state == "failed":
+            failures += 1
+            if on_failed is None or failures > max_failures:
+                raise RuntimeError(f"{platform} 视频上传失败")
+            log.error(f"  [-] 发现上传出错了... 准备重试（第 {failures} 次）")
+            try:
+                await on_failed(page)
+            except Exception as e:
+                # 重新上传的入口已经消失（上传其实在进行）等情况，继续等待
+                log.warning(f"  [-] 重新上传失败: {e}")
+            if progress is not None:
+                progress.restart()
+            try:
+                await (await _signal_frame(page, signals)).evaluate(cleared_script, [_FAILED_CLEAR_WAIT, True])
+            except PlaywrightError:
+                pass
+            # 重新上传后同样要等上传开始才检查失败信号
+            started = not signals.get("started")
+            continue
+        if progress is None or progress.started_at is None:
+            log.info(f"  [-] 正在上传视频中...（已等待 {time.monotonic() - start:.0f}s）")
@@ -0,0 +1,133 @@
+"""
+Cookie 校验结果缓存
+按 平台 + 账号 记录最近一次确认 Cookie 有效的时间，以及当时 Cookie 文件的 mtime / 大小 / 哈希。
+在有效期内且文件未变化时直接视为有效，跳过校验；上传成功后保存 storage_state 也算一次校验。
+
+缓存保存在磁盘上，多次运行 upload.py（以及多个进程）之间共享，读-改-写在文件锁（CACHE_DIR/locks）内进行，
+并发的进程不会覆盖彼此的记录。只缓存“有效”的结果：
+失效的 Cookie 会触发重新登录，登录后文件变化，旧记录自然作废。
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from conf import CACHE_DIR, COOKIE_VERIFY_TTL
+from .account_lock import file_lock
+from .log import logger
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+class VerificationCache:
+    """Cookie 校验结果缓存"""
+
+    def __init__(self, cache_file=None, ttl: float = COOKIE_VERIFY_TTL):
+        """
+        初始化缓存
+
+        Args:
+            cache_file: 缓存文件路径（默认 CACHE_DIR/cookie_verify.json）
+            ttl: 有效期（秒），0 表示不缓存
+        """
+        self.cache_file = Path(cache_file) if cache_file else CACHE_DIR / "cookie_verify.json"
+        self.lock_file = self.cache_file.parent / "locks" / f"{self.cache_file.name}.lock"
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(platform: str, account_name: str) -> str:
+        return f"{platform}:{account_name}"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: dict):
+        """写入临时文件后原子替换，其他进程不会读到写了一半的文件"""
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.cache_file)
+
+    def get(self, platform: str, account_name: str, cookie_path) -> bool:
+        """
+        查询缓存
+
+        Args:
+            platform: 平台名称
+            account_name: 账号名称
+            cookie_path: Cookie 文件路径
+
+        Returns:
+            在有效期内确认过有效、且 Cookie 文件内容没有变化时返回 True，否则返回 False（需要校验）
+        """
+        if self.ttl <= 0:
+            return False
+        entry = self._load().get(self._key(platform, account_name))
+        if not entry or time.time() - entry["verified_at"] > self.ttl:
+            return False
+        cookie_path = Path(cookie_path)
+        try:
+            stat = cookie_path.stat()
+        except OSError:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"] and stat.st_size == entry["size"]:
+            return True
+        # 文件被重写但内容未变（例如保存了相同的 storage_state）时按哈希比较
+        if stat.st_size == entry["size"] and _file_hash(cookie_path) == entry["sha1"]:
+            return True
+        return False
+
+    def record(self, platform: str, account_name: str, cookie_path, source: str = "verify"):
+        """
+        记录一次成功校验（source: verify 校验通过 / upload 上传成功后保存了 storage_state）
+
+        Args:
+            platform: 平台名称
+            account_name: 账号名称
+            cookie_path: Cookie 文件路径
+            source: 记录来源
+        """
+        if self.ttl <= 0:
+            return
+        cookie_path = Path(cookie_path)
+        try:
+            stat = cookie_path.stat()
+            sha1 = _file_hash(cookie_path)
+        except OSError:
+            return
+        entry = {
+            "verified_at": time.time(),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": sha1,
+            "source": source,
+        }
+        try:
+            with file_lock(self.lock_file):
+                entries = self._load()
+                entries[self._key(platform, account_name)] = entry
+                self._save(entries)
+        except OSError as e:
+            logger.warning(f"[Cookie] 写入校验缓存失败: {e}")
+
+    def invalidate(self, platform: str, account_name: str):
+        """删除一条缓存记录（例如 Cookie 被删除或校验失败）"""
+        try:
+            with file_lock(self.lock_file):
+                entries = self._load()
+                if entries.pop(self._key(platform, account_name), None) is not None:
+                    self._save(entries)
+        except OSError as e:
+            logger.warning(f"[Cookie] 写入校验缓存失败: {e}")
+
+
+# 全局缓存实例
+verification_cache = VerificationCache()
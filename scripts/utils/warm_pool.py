@@ -0,0 +1,290 @@
+"""
+预热页面池
+为有待执行任务的账号提前打开一个已登录、已停在平台上传页的页面，
+下一个任务拿到页面后可以直接选择视频文件，省去打开创作者中心的时间。
+空闲页面按 LRU 淘汰，并受页面数量和内存预算限制。
+
+未启用（configure 之前）时 page() 每次新建上下文、用完关闭，行为与不使用预热池相同。
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import BrowserContext, Page, Playwright
+
+from conf import LOCAL_CHROME_PATH
+from .account_store import account_store
+from .base_social_media import (SOCIAL_MEDIA_DOUYIN, SOCIAL_MEDIA_TIKTOK, UPLOAD_PAGES, LoginRequiredError,
+                                goto_upload_page, is_on_upload_page, set_init_script, upload_page_logged_in)
+from .browser_pool import browser_pool
+from .browser_setup import apply_anti_detection, get_context_options, get_launch_options
+from .log import logger
+
+
+async def open_upload_context(playwright: Playwright, platform: str, account_file: str,
+                              headless: bool = False) -> BrowserContext:
+    """
+    从浏览器池获取一个按平台上传要求配置好的浏览器上下文
+
+    抖音使用完整的指纹 / 反检测配置，快手和视频号使用本地 Chrome（Chromium 会有 H264 问题），
+    TikTok 使用 Firefox。用完后需要调用 browser_pool.release()。
+    storage_state 来自账号库的内存缓存，不需要每次读取 Cookie 文件。
+    """
+    storage_state = account_store.storage_state(account_file)
+    if platform == SOCIAL_MEDIA_DOUYIN:
+        context_options = dict(get_context_options(account_file, "zh-CN"), storage_state=storage_state)
+        context = await browser_pool.acquire(playwright, "chromium", headless,
+                                             launch_options=get_launch_options(headless, True),
+                                             **context_options)
+        await apply_anti_detection(context)
+        return context
+    if platform == SOCIAL_MEDIA_TIKTOK:
+        context = await browser_pool.acquire(playwright, "firefox", headless, storage_state=storage_state)
+    else:
+        context = await browser_pool.acquire(playwright, "chromium", headless,
+                                             executable_path=LOCAL_CHROME_PATH or None,
+                                             storage_state=storage_state)
+    return await set_init_script(context)
+
+
+@asynccontextmanager
+async def upload_context(playwright: Playwright, platform: str, account_file: str, headless: bool = False):
+    """open_upload_context / release 的上下文管理器形式"""
+    context = await open_upload_context(playwright, platform, account_file, headless)
+    try:
+        yield context
+    finally:
+        await browser_pool.release(context)
+
+
+class _WarmPage:
+    """池中的一个预热页面"""
+
+    def __init__(self, key, context: BrowserContext, page: Page):
+        self.key = key
+        self.context = context
+        self.page = page
+        self.last_used = time.monotonic()
+        self.memory = 0
+        self.warming = None
+
+
+class WarmPagePool:
+    """按账号预热的上传页面池"""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_pages = 0
+        self.memory_budget = 0
+        self.page_memory = 0
+        self.idle_ttl = 0
+        self.warm_timeout = 30000
+        self._idle = {}
+        self._demand = {}
+        self._scheduled = set()
+        self._loop = None
+
+    def configure(self, max_pages: int = 4, memory_budget_mb: int = 2048, page_memory_mb: int = 300,
+                  idle_ttl: float = 600, warm_timeout: float = 30000):
+        """
+        启用预热池
+
+        Args:
+            max_pages: 最多同时保持的空闲预热页面数
+            memory_budget_mb: 空闲预热页面的内存预算（MB），超出时淘汰最久未使用的页面
+            page_memory_mb: 无法读取页面实际内存（非 Chromium）时按每个页面占用多少 MB 估算
+            idle_ttl: 空闲页面最长保留时间（秒）
+            warm_timeout: 预热时等待上传页加载的超时时间（毫秒）
+        """
+        self.enabled = max_pages > 0
+        self.max_pages = max_pages
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.page_memory = page_memory_mb * 1024 * 1024
+        self.idle_ttl = idle_ttl
+        self.warm_timeout = warm_timeout
+        logger.info(f"[预热池] 已启用：最多 {max_pages} 个页面，内存预算 {memory_budget_mb} MB")
+
+    def _bind_loop(self):
+        """换了事件循环后旧页面已随旧驱动失效，直接丢弃"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._idle = {}
+            self._scheduled = set()
+
+    @staticmethod
+    def _make_key(platform: str, account_file) -> tuple:
+        return platform, str(account_file)
+
+    def expect(self, platform: str, account_file, playwright: Playwright = None, count: int = 1):
+        """
+        登记账号即将有任务执行
+
+        只有登记过、仍有待执行任务的账号才会在任务结束后保留预热页面；
+        传入 playwright 时立即在后台预热该账号的页面
+        """
+        key = self._make_key(platform, account_file)
+        self._demand[key] = self._demand.get(key, 0) + count
+        if self.enabled and playwright is not None:
+            self._bind_loop()
+            if (key not in self._idle and key not in self._scheduled
+                    and len(self._idle) + len(self._scheduled) < self.max_pages):
+                self._scheduled.add(key)
+                asyncio.get_running_loop().create_task(self._scheduled_prewarm(playwright, platform, account_file))
+
+    async def _scheduled_prewarm(self, playwright: Playwright, platform: str, account_file):
+        try:
+            await self.prewarm(playwright, platform, account_file)
+        finally:
+            self._scheduled.discard(self._make_key(platform, account_file))
+
+    async def prewarm(self, playwright: Playwright, platform: str, account_file):
+        """打开并预热一个页面放入池中（已有预热页面时跳过）"""
+        self._bind_loop()
+        key = self._make_key(platform, account_file)
+        if not self.enabled or key in self._idle:
+            return
+        try:
+            context = await open_upload_context(playwright, platform, str(account_file))
+            entry = _WarmPage(key, context, await context.new_page())
+        except Exception as e:
+            logger.warning(f"[预热池] {platform} 预热页面创建失败: {e}")
+            return
+        if key in self._idle:
+            await browser_pool.release(context)
+            return
+        self._idle[key] = entry
+        entry.warming = asyncio.get_running_loop().create_task(self._warm(entry))
+
+    async def _warm(self, entry: _WarmPage) -> bool:
+        """导航到上传页并确认仍处于登录状态；失败的页面从池中移除"""
+        platform = entry.key[0]
+        start = time.perf_counter()
+        try:
+            if not is_on_upload_page(entry.page, platform):
+                await entry.page.goto(UPLOAD_PAGES[platform][0])
+                await entry.page.wait_for_url(f"{UPLOAD_PAGES[platform][1]}**", timeout=self.warm_timeout)
+            await entry.page.wait_for_load_state("domcontentloaded")
+            entry.memory = await self._measure(entry.page)
+        except Exception as e:
+            logger.warning(f"[预热池] {platform} 上传页预热失败（可能需要重新登录）: {e}")
+            await self._discard(entry)
+            return False
+        entry.last_used = time.monotonic()
+        logger.info(f"[预热池] {platform} 上传页已就绪（{time.perf_counter() - start:.2f}s，"
+                    f"{entry.memory / 1024 / 1024:.0f} MB）")
+        await self._evict()
+        return True
+
+    async def _measure(self, page: Page) -> int:
+        """估算页面内存：JS 堆（仅 Chromium 可读）不含渲染进程的其他开销，取它与估算值中的较大者"""
+        try:
+            used = await page.evaluate("() => performance.memory ? performance.memory.usedJSHeapSize : 0")
+        except Exception:
+            used = 0
+        return max(int(used or 0), self.page_memory)
+
+    async def _discard(self, entry: _WarmPage):
+        if self._idle.get(entry.key) is entry:
+            del self._idle[entry.key]
+        await browser_pool.release(entry.context)
+
+    async def _evict(self):
+        """淘汰过期页面，再按 LRU 淘汰直到满足数量和内存预算"""
+        now = time.monotonic()
+        for entry in list(self._idle.values()):
+            if entry.warming is None or entry.warming.done():
+                if now - entry.last_used > self.idle_ttl:
+                    logger.info(f"[预热池] {entry.key[0]} 页面空闲超时，关闭")
+                    await self._discard(entry)
+        while self._idle and (len(self._idle) > self.max_pages
+                              or sum(entry.memory for entry in self._idle.values()) > self.memory_budget):
+            oldest = min(self._idle.values(), key=lambda item: item.last_used)
+            logger.info(f"[预热池] 超出预算，关闭最久未使用的 {oldest.key[0]} 页面")
+            if oldest.warming is not None and not oldest.warming.done():
+                oldest.warming.cancel()
+            await self._discard(oldest)
+
+    async def _checkout(self, key) -> _WarmPage:
+        """取出该账号的预热页面（正在预热时等待预热完成），没有可用页面时返回 None"""
+        entry = self._idle.get(key)
+        if entry is None:
+            return None
+        if entry.warming is not None and not entry.warming.done():
+            try:
+                ready = await asyncio.shield(entry.warming)
+            except asyncio.CancelledError:
+                if entry.warming.cancelled():
+                    return None
+                raise
+            if not ready:
+                return None
+        entry = self._idle.pop(key, None)
+        if entry is None or entry.page.is_closed() or not is_on_upload_page(entry.page, key[0]):
+            if entry is not None:
+                await browser_pool.release(entry.context)
+            return None
+        return entry
+
+    @asynccontextmanager
+    async def page(self, playwright: Playwright, platform: str, account_file, verify_login: bool = False):
+        """
+        获取一个用于上传的页面
+
+        有预热页面时直接返回（已停在上传页），否则新建上下文和页面。
+        任务成功结束且该账号还有待执行任务时，页面重新导航到上传页放回池中，否则关闭。
+
+        Args:
+            playwright: Playwright 实例
+            platform: 平台名称（douyin/kuaishou/tencent/tiktok）
+            account_file: Cookie 文件路径
+            verify_login: 交给调用方之前先打开上传页确认登录态，未登录时关闭页面并抛出 LoginRequiredError
+        """
+        self._bind_loop()
+        key = self._make_key(platform, account_file)
+        if self._demand.get(key):
+            self._demand[key] -= 1
+
+        entry = await self._checkout(key) if self.enabled else None
+        if entry is not None:
+            logger.info(f"[预热池] {platform} 使用预热页面")
+        else:
+            context = await open_upload_context(playwright, platform, str(account_file))
+            try:
+                entry = _WarmPage(key, context, await context.new_page())
+            except BaseException:
+                await browser_pool.release(context)
+                raise
+
+        try:
+            if verify_login:
+                # 上传页本身就是登录态校验，确认有效后同一个页面直接用于上传
+                await goto_upload_page(entry.page, platform)
+                if not await upload_page_logged_in(entry.page, platform):
+                    raise LoginRequiredError(f"{platform} 上传页显示未登录")
+                logger.info(f"[预热池] {platform} 上传页已确认登录")
+            yield entry.page
+        except BaseException:
+            await browser_pool.release(entry.context)
+            raise
+
+        if self.enabled and self._demand.get(key) and key not in self._idle and not entry.page.is_closed():
+            # 重新预热放在后台进行，不占用当前任务的并发槽位
+            self._idle[key] = entry
+            entry.warming = asyncio.get_running_loop().create_task(self._warm(entry))
+        else:
+            await browser_pool.release(entry.context)
+
+    async def close(self):
+        """关闭所有空闲页面"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for entry in list(self._idle.values()):
+            if entry.warming is not None and not entry.warming.done():
+                entry.warming.cancel()
+            await self._discard(entry)
+        self._demand = {}
+
+
+# 全局预热池实例
+warm_pool = WarmPagePool()
@@ -0,0 +1,14 @@
+"""
+测试配置
+scripts/ 是运行时的模块根目录（upload.py 所在目录），测试时同样把它加入 sys.path
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+# 运行时缓存写到临时目录，不污染仓库
+os.environ.setdefault("UPLOAD_CACHE_DIR", tempfile.mkdtemp(prefix="uploader-test-cache-"))
@@ -0,0 +1,102 @@
+"""HttpCookieChecker：请求本地替身服务，不访问真实平台（需要 Playwright 驱动，不需要浏览器）"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from playwright.async_api import async_playwright
+
+from utils.cookie_check import HttpCookieChecker, _check_douyin
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """模拟平台的登录态接口：/info 按 Cookie 返回 JSON，/redirect 跳转到登录页，/html 返回风控页面"""
+
+    requests = []
+
+    def do_GET(self):
+        cookie = self.headers.get("Cookie", "")
+        StandInHandler.requests.append((self.path, cookie))
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/login?next=/redirect")
+            self.end_headers()
+            return
+        if self.path == "/html":
+            body = b"<html>verify</html>"
+        elif "sessionid=good" in cookie:
+            body = json.dumps({"status_code": 0, "user": {"uid": "1"}}).encode()
+        else:
+            body = json.dumps({"status_code": 8, "status_msg": "用户未登录"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_requests():
+    StandInHandler.requests = []
+
+
+def write_state(tmp_path, value: str, expires: float = -1):
+    path = tmp_path / "douyin_default.json"
+    path.write_text(json.dumps({"cookies": [
+        {"name": "sessionid", "value": value, "domain": "127.0.0.1", "path": "/", "expires": expires},
+    ], "origins": []}))
+    return path
+
+
+def check(server: str, path: str, cookie_path):
+    checker = HttpCookieChecker(probes={
+        "douyin": {"method": "GET", "url": f"{server}{path}", "check": _check_douyin},
+    })
+
+    async def run():
+        async with async_playwright() as playwright:
+            try:
+                return await checker.check("douyin", cookie_path, playwright)
+            finally:
+                await checker.close()
+
+    return asyncio.run(run())
+
+
+def test_logged_in_marker(server, tmp_path):
+    assert check(server, "/info", write_state(tmp_path, "good")) is True
+    assert StandInHandler.requests == [("/info", "sessionid=good")]
+
+
+def test_logged_out_marker(server, tmp_path):
+    assert check(server, "/info", write_state(tmp_path, "stale")) is False
+
+
+def test_redirect_to_login_is_not_followed(server, tmp_path):
+    assert check(server, "/redirect", write_state(tmp_path, "good")) is False
+    # max_redirects=0：没有请求登录页
+    assert [path for path, _ in StandInHandler.requests] == ["/redirect"]
+
+
+def test_expired_auth_cookie_skips_request(server, tmp_path):
+    assert check(server, "/info", write_state(tmp_path, "good", expires=time.time() - 60)) is False
+    assert StandInHandler.requests == []
+
+
+def test_unrecognised_response_is_undecided(server, tmp_path):
+    assert check(server, "/html", write_state(tmp_path, "good")) is None
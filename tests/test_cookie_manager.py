@@ -0,0 +1,21 @@
+"""CookieManager.list_accounts：账号库与 Cookie 目录保持同步"""
+import json
+
+from utils.cookie_manager import CookieManager
+
+
+def write_cookie(cookies_dir, name: str):
+    (cookies_dir / f"{name}.json").write_text(json.dumps({"cookies": [], "origins": []}))
+
+
+def test_files_added_after_first_listing_are_listed(tmp_path):
+    write_cookie(tmp_path, "douyin_a1")
+    manager = CookieManager(cookies_dir=tmp_path)
+    assert manager.list_cookies() == {"douyin": ["a1"]}
+
+    # 上传器直接保存 / 手动放进目录的文件，不需要再执行 --migrate-accounts
+    write_cookie(tmp_path, "tiktok_a2")
+    assert manager.list_cookies() == {"douyin": ["a1"], "tiktok": ["a2"]}
+
+    (tmp_path / "douyin_a1.json").unlink()
+    assert manager.list_cookies() == {"tiktok": ["a2"]}
@@ -0,0 +1,50 @@
+"""常驻服务：已结束任务的保留和进度事件上限"""
+import asyncio
+from datetime import datetime, timedelta
+
+from utils import daemon as daemon_module
+from utils.daemon import DaemonJob, UploadDaemon
+
+
+def make_job(index: int) -> dict:
+    return {"id": f"job{index}", "platform": "douyin", "video": "v.mp4", "title": f"t{index}"}
+
+
+def finish(job: DaemonJob, seconds_ago: float):
+    job.status = "success"
+    job.finished_at = datetime.now() - timedelta(seconds=seconds_ago)
+
+
+def test_prune_by_age_and_count():
+    async def run():
+        daemon = UploadDaemon(None, ["douyin"], job_retention=60, max_finished_jobs=2)
+        jobs = [DaemonJob(make_job(index)) for index in range(5)]
+        for job in jobs:
+            daemon.jobs[job.id] = job
+        finish(jobs[0], 120)  # 超过保留时间
+        finish(jobs[1], 30)   # 超出数量上限（最早结束）
+        finish(jobs[2], 20)
+        finish(jobs[3], 10)
+        # jobs[4] 仍在执行
+        daemon.prune()
+        return sorted(daemon.jobs)
+
+    assert asyncio.run(run()) == ["job2", "job3", "job4"]
+
+
+def test_events_are_capped(monkeypatch):
+    monkeypatch.setattr(daemon_module, "MAX_JOB_EVENTS", 3)
+
+    async def run():
+        job = DaemonJob(make_job(0))
+        for index in range(5):
+            await job.emit("log", str(index))
+        return job
+
+    job = asyncio.run(run())
+    assert job.event_count == 5
+    assert [event["message"] for event in job.events] == ["2", "3", "4"]
+    # 订阅者看到的是还保留着的新事件
+    assert [event["message"] for event in job.events_since(1)] == ["2", "3", "4"]
+    assert [event["message"] for event in job.events_since(4)] == ["4"]
+    assert job.events_since(5) == []
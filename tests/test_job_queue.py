@@ -0,0 +1,143 @@
+"""JobQueue 的租约、重试、挂起逻辑（纯 SQLite，不需要浏览器）"""
+import time
+
+import pytest
+
+from job_queue.sqlite_queue import (
+    JobQueue, STATUS_DONE, STATUS_FAILED, STATUS_LEASED, STATUS_NEEDS_AUTH, STATUS_PENDING, make_job_key,
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(tmp_path / "queue.db")
+    yield queue
+    queue.close()
+
+
+def make_job(account="a1", video="v1.mp4", **fields):
+    return {"platform": "douyin", "account": account, "video": video, "title": video, **fields}
+
+
+def test_enqueue_deduplicates(queue):
+    first = queue.enqueue(make_job())
+    assert queue.enqueue(make_job()) == first
+    assert queue.enqueue(make_job(video="v2.mp4")) != first
+    assert queue.enqueue({**make_job(video="v3.mp4"), "key": "custom"}) == queue.enqueue(
+        {**make_job(video="v4.mp4"), "key": "custom"})
+    assert make_job_key({"key": "custom"}) == "custom"
+
+
+def test_one_lease_per_account(queue):
+    queue.enqueue(make_job(video="v1.mp4"))
+    queue.enqueue(make_job(video="v2.mp4"))
+    queue.enqueue(make_job(account="a2"))
+
+    first = queue.lease("w1")
+    second = queue.lease("w2")
+    assert first["status"] == STATUS_LEASED and first["attempts"] == 1
+    assert {first["account"], second["account"]} == {"a1", "a2"}
+    # a1 的第二个任务要等第一个完成
+    assert queue.lease("w3") is None
+
+    assert queue.ack(first["id"], "w1", {"ok": True})
+    assert queue.get(first["id"])["status"] == STATUS_DONE
+    assert queue.get(first["id"])["result"] == {"ok": True}
+    third = queue.lease("w3")
+    assert third["account"] == "a1" and third["payload"]["video"] == "v2.mp4"
+
+
+def test_ack_requires_lease_owner(queue):
+    job_id = queue.enqueue(make_job())
+    queue.lease("w1")
+    assert not queue.ack(job_id, "w2")
+    assert not queue.extend(job_id, "w2")
+    assert queue.extend(job_id, "w1")
+
+
+def test_expired_lease_is_reclaimed(queue):
+    job_id = queue.enqueue(make_job())
+    assert queue.lease("w1", lease_seconds=-1)["id"] == job_id
+
+    reclaimed = queue.lease("w2")
+    assert reclaimed["id"] == job_id
+    assert reclaimed["lease_owner"] == "w2" and reclaimed["attempts"] == 2
+    # 原 worker 的租约已经失效
+    assert not queue.ack(job_id, "w1")
+    assert queue.ack(job_id, "w2")
+
+
+def test_expired_lease_after_max_attempts_fails(queue):
+    job_id = queue.enqueue(make_job(), max_attempts=1)
+    queue.lease("w1", lease_seconds=-1)
+
+    assert queue.lease("w2") is None
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_FAILED and job["last_error"] == "lease expired"
+
+
+def test_fail_backs_off_then_fails_after_max_attempts(queue):
+    job_id = queue.enqueue(make_job(), max_attempts=2)
+
+    queue.lease("w1")
+    before = time.time()
+    assert queue.fail(job_id, "w1", "boom", backoff=60) == STATUS_PENDING
+    job = queue.get(job_id)
+    assert job["last_error"] == "boom" and job["available_at"] >= before + 60
+    # 退避期间不会被领取
+    assert queue.lease("w1") is None
+
+    queue.conn.execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+    assert queue.lease("w1")["attempts"] == 2
+    assert queue.fail(job_id, "w1", "boom again") == STATUS_FAILED
+    assert queue.lease("w1") is None
+
+
+def test_fail_without_retry(queue):
+    job_id = queue.enqueue(make_job(), max_attempts=3)
+    queue.lease("w1")
+    assert queue.fail(job_id, "w1", "bad input", retry=False) == STATUS_FAILED
+    assert queue.fail(job_id, "w1", "again") is None
+
+
+def test_release_does_not_count_attempt(queue):
+    job_id = queue.enqueue(make_job())
+    queue.lease("w1")
+    assert queue.release(job_id, "w1")
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_PENDING and job["attempts"] == 0
+
+
+def test_needs_auth_blocks_account_until_resumed(queue):
+    parked_id = queue.enqueue(make_job(video="v1.mp4"))
+    queue.enqueue(make_job(video="v2.mp4"))
+    other_id = queue.enqueue(make_job(account="a2"))
+
+    job = queue.lease("w1")
+    assert job["id"] == parked_id
+    assert queue.park(parked_id, "w1", "login required")
+    parked = queue.get(parked_id)
+    assert parked["status"] == STATUS_NEEDS_AUTH and parked["attempts"] == 0
+    assert [account for _, account, _ in queue.parked_accounts()] == ["a1"]
+
+    # a1 的其他任务被挂起任务阻塞，其他账号不受影响
+    assert queue.lease("w2")["id"] == other_id
+    assert queue.lease("w3") is None
+    assert queue.has_unfinished()
+
+    assert queue.resume_account("douyin", "a1") == 1
+    assert queue.parked_accounts() == []
+    resumed = queue.lease("w3")
+    assert resumed["account"] == "a1"
+    assert queue.get(parked_id)["status"] in (STATUS_PENDING, STATUS_LEASED)
+
+
+def test_list_jobs_and_stats(queue):
+    queue.enqueue(make_job(video="v1.mp4", publish_date="2026-01-01 10:00:00"))
+    queue.enqueue(make_job(account="a2", publish_date="2026-02-01 10:00:00"))
+    queue.lease("w1")
+
+    assert queue.stats() == {STATUS_LEASED: 1, STATUS_PENDING: 1}
+    assert len(queue.list_jobs(account="a2")) == 1
+    assert len(queue.list_jobs(publish_before="2026-01-15 00:00:00")) == 1
+    assert len(queue.list_jobs(publish_after="2026-01-15 00:00:00")) == 1
@@ -0,0 +1,32 @@
+"""SelectorCache：只有竞速超时的候选才计为未命中"""
+from utils.locator_race import DEMOTE_AFTER, SelectorCache
+
+
+def test_tie_losers_are_not_demoted(tmp_path):
+    cache = SelectorCache(tmp_path / "selectors.json")
+    for _ in range(DEMOTE_AFTER + 1):
+        cache.record("douyin", "/upload", "title", winner="a", visible=["b"])
+    # b 一直可见，只是没有被选中，不应排到未参与的 c 之后
+    assert cache.rank("douyin", "/upload", "title", ["c", "b", "a"]) == ["a", "c", "b"]
+
+
+def test_timed_out_candidates_are_demoted(tmp_path):
+    cache = SelectorCache(tmp_path / "selectors.json")
+    for _ in range(DEMOTE_AFTER):
+        cache.record("douyin", "/upload", "title", missed=["a"])
+    assert cache.rank("douyin", "/upload", "title", ["a", "b"]) == ["b", "a"]
+
+    # 命中一次后恢复
+    cache.record("douyin", "/upload", "title", winner="a")
+    assert cache.rank("douyin", "/upload", "title", ["b", "a"]) == ["a", "b"]
+
+
+def test_record_merges_writes_from_other_instances(tmp_path):
+    cache_file = tmp_path / "selectors.json"
+    first, second = SelectorCache(cache_file), SelectorCache(cache_file)
+    first.record("douyin", "/upload", "title", winner="a")
+    second.record("kuaishou", "/publish", "title", winner="b")
+    first.record("douyin", "/upload", "tags", winner="c")
+
+    entries = SelectorCache(cache_file)._load()
+    assert set(entries) == {"douyin:/upload:title", "kuaishou:/publish:title", "douyin:/upload:tags"}
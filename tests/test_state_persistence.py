@@ -0,0 +1,101 @@
+"""StateWriter：内容没有变化时不写文件，延迟合并写入"""
+import asyncio
+import json
+
+import pytest
+
+from utils import state_persistence
+from utils.state_persistence import StateWriter, state_digest
+
+
+def make_state(*names, value="1"):
+    return {"cookies": [{"name": name, "value": value, "domain": ".example.com", "path": "/"} for name in names],
+            "origins": []}
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """记录实际写文件的次数"""
+    calls = []
+    original = state_persistence.write_state
+
+    def write_state(path, state):
+        calls.append(json.loads(json.dumps(state)))
+        original(path, state)
+
+    monkeypatch.setattr(state_persistence, "write_state", write_state)
+    return calls
+
+
+def test_digest_ignores_order():
+    assert state_digest(make_state("a", "b")) == state_digest(make_state("b", "a"))
+    assert state_digest(make_state("a")) != state_digest(make_state("a", value="2"))
+
+
+def test_unchanged_state_is_not_written(tmp_path, writes):
+    cookie_path = tmp_path / "example_default.json"
+    writer = StateWriter(debounce=0)
+
+    async def run():
+        assert await writer.save(cookie_path, make_state("a", "b"))
+        assert not await writer.save(cookie_path, make_state("b", "a"))
+        assert await writer.save(cookie_path, make_state("a", "b", value="2"))
+
+    asyncio.run(run())
+    assert len(writes) == 2
+    assert json.loads(cookie_path.read_text())["cookies"][0]["value"] == "2"
+
+
+def test_file_changed_by_another_process(tmp_path, writes):
+    cookie_path = tmp_path / "example_default.json"
+    writer = StateWriter(debounce=0)
+
+    async def run():
+        await writer.save(cookie_path, make_state("a"))
+        cookie_path.write_text(json.dumps(make_state("other")))
+        # 文件被改写后按新内容比较，不能沿用旧的哈希
+        assert await writer.save(cookie_path, make_state("a"))
+
+    asyncio.run(run())
+    assert len(writes) == 2
+
+
+def test_debounce_coalesces_writes(tmp_path, writes):
+    cookie_path = tmp_path / "example_default.json"
+    writer = StateWriter(debounce=0.05)
+    flushed = []
+
+    async def run():
+        for value in ("1", "2", "3"):
+            assert await writer.save(cookie_path, make_state("a", value=value), debounce=True)
+        assert not cookie_path.exists()
+        assert writer.pending(cookie_path)["cookies"][0]["value"] == "3"
+        writer.after_flush(cookie_path, lambda: flushed.append(cookie_path.exists()))
+        # 与等待写入的内容相同，不需要再排队
+        assert not await writer.save(cookie_path, make_state("a", value="3"), debounce=True)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert len(writes) == 1 and writes[0]["cookies"][0]["value"] == "3"
+    assert flushed == [True]
+    assert writer.pending(cookie_path) is None
+
+
+def test_flush_all_writes_pending(tmp_path, writes):
+    paths = [tmp_path / f"example_{name}.json" for name in ("a", "b")]
+    writer = StateWriter(debounce=60)
+
+    async def run():
+        for path in paths:
+            await writer.save(path, make_state("a"), debounce=True)
+        assert writes == []
+        await writer.flush_all()
+
+    asyncio.run(run())
+    assert len(writes) == 2 and all(path.exists() for path in paths)
+
+
+def test_after_flush_runs_immediately_without_pending(tmp_path):
+    called = []
+    StateWriter().after_flush(tmp_path / "example_default.json", lambda: called.append(True))
+    assert called == [True]
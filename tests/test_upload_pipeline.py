@@ -0,0 +1,108 @@
+"""UploadPipeline：阶段依赖、UI 锁、出错时取消"""
+import asyncio
+
+import pytest
+
+from utils.upload_pipeline import UploadPipeline
+
+
+def recorder(events):
+    def stage(name, delay=0.0):
+        async def func(page):
+            events.append(("start", name))
+            await asyncio.sleep(delay)
+            events.append(("end", name))
+        return func
+    return stage
+
+
+def position(events, event):
+    return events.index(event)
+
+
+def test_dependencies_and_concurrent_upload():
+    events = []
+    stage = recorder(events)
+    pipeline = UploadPipeline("test")
+    pipeline.add("metadata", stage("metadata", 0.02))
+    pipeline.add("upload", stage("upload", 0.1), ui=False)
+    pipeline.add("schedule", stage("schedule", 0.02))
+    pipeline.add("cover", stage("cover"), after=["upload"])
+    pipeline.add("publish", stage("publish"), after="*")
+
+    asyncio.run(pipeline.run(None))
+
+    # 不依赖上传的阶段在上传完成之前执行完
+    assert position(events, ("end", "schedule")) < position(events, ("end", "upload"))
+    assert position(events, ("end", "upload")) < position(events, ("start", "cover"))
+    assert events[-2:] == [("start", "publish"), ("end", "publish")]
+
+
+def test_ui_stages_do_not_interleave():
+    events = []
+    stage = recorder(events)
+    pipeline = UploadPipeline("test")
+    for name in ("a", "b", "c"):
+        pipeline.add(name, stage(name, 0.01))
+
+    asyncio.run(pipeline.run(None))
+
+    # 操作页面的阶段按添加顺序依次执行
+    assert events == [(kind, name) for name in "abc" for kind in ("start", "end")]
+
+
+def test_exclusive_holds_ui_lock():
+    events = []
+    stage = recorder(events)
+    pipeline = UploadPipeline("test")
+    retry = pipeline.exclusive(stage("retry", 0.01))
+
+    async def upload(page):
+        await asyncio.sleep(0.005)
+        await retry(page)
+
+    pipeline.add("metadata", stage("metadata", 0.03))
+    pipeline.add("upload", upload, ui=False)
+
+    asyncio.run(pipeline.run(None))
+
+    # 重新上传要等正在执行的 UI 阶段结束
+    assert position(events, ("end", "metadata")) < position(events, ("start", "retry"))
+
+
+def test_unknown_dependencies_are_ignored():
+    events = []
+    pipeline = UploadPipeline("test")
+    pipeline.add("publish", recorder(events)("publish"), after=["schedule"])
+
+    asyncio.run(pipeline.run(None))
+    assert events == [("start", "publish"), ("end", "publish")]
+
+
+def test_failure_cancels_other_stages():
+    events = []
+    stage = recorder(events)
+    cancelled = []
+
+    async def upload(page):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("upload")
+            raise
+
+    async def broken(page):
+        raise ValueError("boom")
+
+    pipeline = UploadPipeline("test")
+    pipeline.add("upload", upload, ui=False)
+    pipeline.add("metadata", broken)
+    pipeline.add("publish", stage("publish"), after="*")
+
+    async def run():
+        with pytest.raises(ValueError, match="boom"):
+            await asyncio.wait_for(pipeline.run(None), timeout=1)
+
+    asyncio.run(run())
+    assert cancelled == ["upload"]
+    assert ("start", "publish") not in events
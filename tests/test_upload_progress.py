@@ -0,0 +1,101 @@
+"""UploadProgressTracker：只统计平台上传地址的请求，大小只取 Content-Length"""
+import asyncio
+import time
+
+from utils import upload_progress
+from utils.upload_progress import UploadProgressTracker
+
+UPLOAD_URL = "https://tos-d-x-hl.snssdk.com/upload/v1/video?partNumber=1"
+
+
+class FakePage:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.handlers[event].remove(handler)
+
+    def fire(self, event, request):
+        for handler in list(self.handlers.get(event, [])):
+            handler(request)
+
+
+class FakeRequest:
+    def __init__(self, url, size=None, method="POST"):
+        self.url = url
+        self.method = method
+        self.size = size
+        self.failure = "net::ERR_FAILED"
+
+    async def header_value(self, name):
+        return str(self.size) if name == "content-length" and self.size is not None else None
+
+    @property
+    def post_data_buffer(self):
+        raise AssertionError("请求体不应被读取")
+
+
+def run_requests(tmp_path, platform, requests, stall_timeout=0):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0" * (1024 * 1024))
+
+    async def run():
+        page = FakePage()
+        tracker = await UploadProgressTracker(page, platform, video, stall_timeout=stall_timeout).start()
+        for request in requests:
+            page.fire("request", request)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        for request in requests:
+            page.fire("requestfinished", request)
+        tracker.stop()
+        return tracker
+
+    return asyncio.run(run())
+
+
+def test_counts_only_platform_upload_urls(tmp_path):
+    tracker = run_requests(tmp_path, "douyin", [
+        FakeRequest(UPLOAD_URL, 256 * 1024),
+        FakeRequest(UPLOAD_URL.replace("partNumber=1", "partNumber=2"), 256 * 1024, method="PUT"),
+        FakeRequest("https://mcs.zijieapi.com/list", 512 * 1024),       # 埋点上报
+        FakeRequest(UPLOAD_URL, 1024),                                  # 上传前的小请求
+        FakeRequest(UPLOAD_URL, 256 * 1024, method="GET"),
+    ])
+    assert tracker.sent == 512 * 1024
+    assert tracker.requests == 2
+
+
+def test_requests_without_length_are_ignored(tmp_path):
+    tracker = run_requests(tmp_path, "douyin", [FakeRequest(UPLOAD_URL)])
+    assert tracker.sent == 0 and tracker.started_at is None
+
+
+def test_unknown_platform_counts_large_posts(tmp_path):
+    tracker = run_requests(tmp_path, "other", [FakeRequest("https://example.com/anything", 128 * 1024)])
+    assert tracker.sent == 128 * 1024
+
+
+def test_stall_ignores_unrelated_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_progress, "UPLOAD_STALL_MIN_RATE", 1024 * 1024 * 1024)
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0" * 1024)
+
+    async def run():
+        page = FakePage()
+        tracker = await UploadProgressTracker(page, "douyin", video, stall_timeout=0.01).start()
+        page.fire("request", FakeRequest("https://mcs.zijieapi.com/list", 512 * 1024))
+        await asyncio.sleep(0)
+        unrelated = tracker._stall_reason(time.monotonic() + 60)
+        page.fire("request", FakeRequest(UPLOAD_URL, 512 * 1024))
+        await asyncio.sleep(0)
+        stalled = tracker._stall_reason(time.monotonic() + 60)
+        tracker.stop()
+        return unrelated, stalled
+
+    unrelated, stalled = asyncio.run(run())
+    assert unrelated is None
+    assert stalled is not None
@@ -0,0 +1,64 @@
+"""wait_for_upload：看到开始信号后才检查失败信号，重新上传出错时继续等待"""
+import asyncio
+
+import pytest
+
+from utils.upload_status import wait_for_upload
+
+
+class FakeFrame:
+    """按顺序返回页面脚本的结果，记录每次传入的 started"""
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.started_args = []
+
+    async def evaluate(self, script, arg):
+        self.started_args.append(arg[1])
+        return self.states.pop(0)
+
+
+class FakePage:
+    def __init__(self, states):
+        self.main_frame = FakeFrame(states)
+
+    async def query_selector(self, selector):
+        return None
+
+    def is_closed(self):
+        return False
+
+
+def test_failed_signal_is_checked_only_after_upload_started():
+    page = FakePage(["pending", "started", "done"])
+
+    assert asyncio.run(wait_for_upload(page, "tiktok_studio"))
+    assert page.main_frame.started_args == [False, False, True]
+
+
+def test_platform_without_started_signal_checks_failures_from_the_start():
+    page = FakePage(["done"])
+
+    assert asyncio.run(wait_for_upload(page, "douyin"))
+    assert page.main_frame.started_args == [True]
+
+
+def test_retry_error_does_not_abort_and_waits_for_restart():
+    # started -> failed -> （等待失败提示消失）-> started -> done
+    page = FakePage(["started", "failed", "done", "started", "done"])
+    calls = []
+
+    async def on_failed(page):
+        calls.append(page)
+        raise RuntimeError("Select file button is gone")
+
+    assert asyncio.run(wait_for_upload(page, "tiktok", on_failed=on_failed))
+    assert len(calls) == 1
+    assert page.main_frame.started_args == [False, True, True, False, True]
+
+
+def test_failure_without_retry_raises():
+    page = FakePage(["failed"])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(wait_for_upload(page, "douyin"))
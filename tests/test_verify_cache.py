@@ -0,0 +1,40 @@
+"""VerificationCache：多个进程同时写入时不丢失记录"""
+import multiprocessing
+
+from utils.verify_cache import VerificationCache
+
+ACCOUNTS_PER_WORKER = 20
+
+
+def record_accounts(cache_file, cookie_path, worker):
+    cache = VerificationCache(cache_file, ttl=3600)
+    for index in range(ACCOUNTS_PER_WORKER):
+        cache.record("douyin", f"w{worker}_{index}", cookie_path)
+
+
+def test_record_and_invalidate(tmp_path):
+    cookie_path = tmp_path / "douyin_a.json"
+    cookie_path.write_text("{}")
+    cache = VerificationCache(tmp_path / "verify.json", ttl=3600)
+
+    cache.record("douyin", "a", cookie_path)
+    assert cache.get("douyin", "a", cookie_path)
+    cache.invalidate("douyin", "a")
+    assert not cache.get("douyin", "a", cookie_path)
+
+
+def test_concurrent_processes_keep_all_entries(tmp_path):
+    cookie_path = tmp_path / "douyin_a.json"
+    cookie_path.write_text("{}")
+    cache_file = tmp_path / "verify.json"
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=record_accounts, args=(cache_file, cookie_path, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    cache = VerificationCache(cache_file, ttl=3600)
+    assert all(cache.get("douyin", f"w{worker}_{index}", cookie_path)
+               for worker in range(4) for index in range(ACCOUNTS_PER_WORKER))